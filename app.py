@@ -1,51 +1,249 @@
+import io
 import os
 import json
-import numpy as np
-import sounddevice as sd
-import soundfile as sf
-import speech_recognition as sr
-from flask import Flask, render_template, jsonify
-from sentence_transformers import SentenceTransformer, util
+import time
 import wave
-import tempfile
+import hashlib
+import logging
+import threading
+from flask import Flask, Response, render_template, jsonify, request, send_file, abort
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.security import safe_join
+import audiocapture
+import audiodecode
+import corpus
+import embedindex
+import jobqueue
+import lexicalindex
+import metrics
+import querycache
+import virtualchunks
+import waveform
+import wavcache
 
 app = Flask(__name__)
 
-# Function to get relevant audio file paths
-def get_relevant_audio_files(query, json_file_path='translated_output.json', folder_path='audio_chunks_database', max_files=5):
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    audio_paths = list(data.keys())
-    transcripts = list(data.values())
+# Request-level diagnostics; silent unless logging is configured for DEBUG
+logger = logging.getLogger(__name__)
+
+# Upload limits for browser-recorded queries
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+MAX_UPLOAD_SECONDS = 30
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+# Search results point at chunks under CHUNK_FOLDER, served by serve_chunk.
+# Responses carry a content-hash ETag, so after max-age browsers revalidate
+# cheaply with If-None-Match; set USE_X_SENDFILE=1 behind nginx/Apache to
+# hand the file (and its ranges) to the front-end server.
+CHUNK_FOLDER = 'audio_chunks_database'
+CHUNK_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.webm')
+CHUNK_MAX_AGE = 7 * 24 * 3600
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+
+# Results also carry each chunk's precomputed waveform peaks (written at
+# ingest, see waveform.py) so the page draws them without fetching the
+# audio, and a low-bitrate preview URL when one was encoded
+PEAKS_FOLDER = waveform.PEAKS_FOLDER
+PREVIEW_FOLDER = waveform.PREVIEW_FOLDER
+
+# Virtual chunks (see virtualchunks.py) have no file of their own: their
+# results carry the URL of the decoded source (SOURCE_AUDIO_ROUTE/<content
+# hash>, for the sources in the manifest only) and the chunk's
+# start/end in seconds so the page seeks in it, and serve_chunk answers
+# the chunk's own URL from the memory-mapped PCM for older clients
+MANIFEST_FILE = virtualchunks.DEFAULT_MANIFEST_FILE
+SOURCE_AUDIO_ROUTE = 'source_audio'
+chunk_manifest = {"key": None, "manifest": None}
+chunk_manifest_lock = threading.Lock()
+
+# Result texts are read from the corpus store (see corpus.py), only for the
+# chunks returned; results have None texts when there is no store
+CORPUS_FILE = corpus.DEFAULT_CORPUS_FILE
+corpus_store = {"store": None}
+corpus_store_lock = threading.Lock()
+
+# Voice queries run as jobs on a bounded pool so slow recognition never holds
+# a request thread; submissions beyond MAX_QUEUED_JOBS get 429
+JOB_WORKERS = 4
+MAX_QUEUED_JOBS = 16
+JOB_RETRY_AFTER = 2
+JOB_EVENTS_KEEPALIVE = 15
+query_jobs = jobqueue.JobQueue(workers=JOB_WORKERS, max_queued=MAX_QUEUED_JOBS)
+
+# Ranking used for voice queries (see get_relevant_audio_files): 'hybrid'
+# (default), 'lexical' or 'dense'; the lexical index is built over KANNADA_FILE
+SEARCH_MODE = os.environ.get('SEARCH_MODE', 'hybrid')
+KANNADA_FILE = 'output.json'
+
+# Heavy dependencies (speech_recognition, the sentence-transformers model)
+# are imported on first use; warm_up() loads them and the indexes on a
+# background thread at start-up, and /readyz answers 503 until it is done so
+# the load balancer only routes to warmed workers. WARMUP=0 turns it off.
+WARMUP = os.environ.get('WARMUP', '1') != '0'
+WARMUP_RETRY_AFTER = 1
+warmup_state = {"status": "warming" if WARMUP else "disabled", "steps": {}, "error": None,
+                "startedAt": time.time(), "seconds": None}
+
+# Limits of /api/search-batch
+MAX_BATCH_QUERIES = 1000
+MAX_BATCH_TOP_K = 100
 
-    # Use SentenceTransformer model to encode the transcripts
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    transcript_embeddings = model.encode(transcripts, convert_to_tensor=True)
+# Normalised query text -> embedding, and (query, max_files, ...) -> ranked paths.
+# Ranked results are dropped whenever the transcript index version changes.
+query_embedding_cache = querycache.LRUCache(maxsize=2048, ttl=24 * 3600)
+query_result_cache = querycache.LRUCache(maxsize=1024, ttl=3600)
 
-    # Encode the query
-    query_embedding = model.encode(query, convert_to_tensor=True)
+# (chunk path, size, mtime) -> SHA-256 of its contents, so each chunk is hashed once
+chunk_etag_cache = querycache.LRUCache(maxsize=65536)
 
-    # Calculate similarity scores
-    similarity_scores = util.cos_sim(query_embedding, transcript_embeddings)[0]
+# (peaks path, mtime) -> inline peaks dict, so hot results skip the file read
+peaks_cache = querycache.LRUCache(maxsize=4096)
 
-    # Get indices of the top relevant audio files
-    top_indices = np.argsort(-similarity_scores.cpu().numpy())[:max_files]
+HTTP_REQUESTS = metrics.counter('speech_http_requests', "HTTP requests by route and status", ('route', 'status'))
+HTTP_SECONDS = metrics.histogram('speech_http_request_seconds', "HTTP request latency by route", ('route',))
+JOB_QUEUE = metrics.gauge('speech_job_queue', "Voice query jobs queued and running", ('state',))
+CACHE_LOOKUPS = metrics.gauge('speech_query_cache', "Query cache counters from LRUCache.stats()", ('cache', 'stat'))
+READY = metrics.gauge('speech_ready', "1 once the start-up warm-up has finished")
+
+# Function to get relevant audio file paths
+def get_relevant_audio_files(query, json_file_path='translated_output.json', folder_path=CHUNK_FOLDER, max_files=5,
+                             mode=SEARCH_MODE, kannada_file_path=KANNADA_FILE):
+    """
+    Rank chunks for a (Kannada) query: 'dense' embeds it and searches the
+    English transcript embeddings, 'lexical' runs BM25 over the Kannada
+    transcripts without encoding anything, and 'hybrid' scores the BM25
+    candidates densely and fuses the two. Without Kannada transcripts every
+    mode falls back to 'dense'.
+    """
+    # The indexes are built once and shared by every request
+    with metrics.stage('index_load'):
+        lexical = lexicalindex.get_lexical_index(kannada_file_path) if mode != 'dense' else None
+        if lexical is None:
+            mode = 'dense'
+        index = embedindex.get_index(json_file_path) if mode != 'lexical' else None
+    normalized = querycache.normalize_query(query)
+
+    # Ranked results are keyed by the versions of the indexes they came from
+    version = (index.index_dir, index.version) if index else None
+    if index is not None:
+        query_result_cache.sync_version(version)
+    lexical_version = lexical.version if lexical else None
+    result_key = (version, lexical_version, normalized, mode, json_file_path, folder_path, max_files)
+    cached = query_result_cache.get(result_key)
+    if cached is not None:
+        return list(cached)
+
+    if mode == 'lexical':
+        with metrics.stage('rank'):
+            paths = [path for path, _ in lexical.search(normalized, top_k=max_files)]
+    else:
+        query_embedding = query_embedding_cache.get(normalized)
+        if query_embedding is None:
+            with metrics.stage('encode'):
+                query_embedding = embedindex.encode(normalized)
+            query_embedding_cache.put(normalized, query_embedding)
+        with metrics.stage('rank'):
+            if mode == 'hybrid':
+                paths = [path for path, _ in lexicalindex.hybrid_search(lexical, index, normalized, query_embedding,
+                                                                        top_k=max_files)]
+            else:
+                paths = [path for path, _ in index.search_embedding(query_embedding, top_k=max_files)]
 
     # Prepend folder path to file names
-    relevant_audio_paths = [os.path.join(folder_path, audio_paths[i]) for i in top_indices]
+    relevant_audio_paths = [os.path.join(folder_path, path) for path in paths]
+    query_result_cache.put(result_key, tuple(relevant_audio_paths))
     return relevant_audio_paths
 
+# Function to get the virtual chunk manifest, reloaded when the file changes
+def get_chunk_manifest(manifest_file=MANIFEST_FILE):
+    """The ChunkManifest of manifest_file, or None if there is none"""
+    try:
+        stat = os.stat(manifest_file)
+    except OSError:
+        return None
+    key = (manifest_file, stat.st_size, stat.st_mtime_ns)
+    if chunk_manifest["key"] != key:
+        with chunk_manifest_lock:
+            if chunk_manifest["key"] != key:
+                chunk_manifest.update(manifest=virtualchunks.ChunkManifest(manifest_file), key=key)
+    return chunk_manifest["manifest"]
+
+# Function to get the shared corpus store, opened on first use
+def get_corpus_store(corpus_file=CORPUS_FILE):
+    """The CorpusStore of corpus_file, or None if there is none"""
+    if corpus_store["store"] is None and os.path.exists(corpus_file):
+        with corpus_store_lock:
+            if corpus_store["store"] is None:
+                corpus_store["store"] = corpus.CorpusStore(corpus_file)
+    return corpus_store["store"]
+
+# Function to attach texts, waveform peaks and preview URLs to result paths
+def describe_results(audio_paths, folder_path=CHUNK_FOLDER):
+    """
+    One dict per path: {"path", "kannada", "english", "preview", "peaks",
+    "peaksPerSecond", "duration", "source", "start", "end"}; peaks are
+    base64 int8 min/max pairs, and the peaks and preview fields are None
+    for chunks ingested without them. Virtual chunks have the URL of their
+    decoded source and their start/end in it (seconds); other chunks have
+    None there.
+    """
+    results = []
+    manifest = get_chunk_manifest()
+    store = get_corpus_store()
+    rows = {}
+    if store is not None:
+        with metrics.stage('corpus_lookup'):
+            rows = store.get_many(os.path.relpath(path, folder_path) for path in audio_paths)
+    with metrics.stage('peaks'):
+        for path in audio_paths:
+            relative = os.path.relpath(path, folder_path)
+            row = rows.get(relative, {})
+            result = {"path": path, "kannada": row.get("kannada"), "english": row.get("english"), "preview": None,
+                      "peaks": None, "peaksPerSecond": None, "duration": None, "source": None, "start": None,
+                      "end": None}
+
+            chunk = manifest.get(relative) if manifest is not None else None
+            if chunk is not None:
+                result.update(source=f"{SOURCE_AUDIO_ROUTE}/{chunk['sourceId']}",
+                              start=chunk["start"], end=chunk["end"], duration=chunk["end"] - chunk["start"])
+
+            peaks_path = waveform.derived_path(path, folder_path, PEAKS_FOLDER, waveform.PEAKS_SUFFIX)
+            try:
+                key = (peaks_path, os.stat(peaks_path).st_mtime_ns)
+            except OSError:
+                key = None
+            if key is not None:
+                inline = peaks_cache.get(key)
+                if inline is None:
+                    try:
+                        inline = waveform.load_inline_peaks(peaks_path)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Unreadable peaks file {peaks_path}: {e}")
+                    if inline is not None:
+                        peaks_cache.put(key, inline)
+                if inline is not None:
+                    result.update(inline)
+
+            preview = os.path.splitext(relative)[0] + '.' + waveform.PREVIEW_FORMAT
+            if os.path.isfile(os.path.join(PREVIEW_FOLDER, preview)):
+                result["preview"] = f"{PREVIEW_FOLDER}/{preview.replace(os.sep, '/')}"
+            results.append(result)
+    return results
+
 # Function to capture Kannada audio from the microphone and convert it to text
 def get_query_from_microphone():
+    import speech_recognition as sr
     recognizer = sr.Recognizer()
     with sr.Microphone() as source:
         print("Listening... Please ask your query in Kannada:")
-        recognizer.adjust_for_ambient_noise(source)
-        audio_data = recognizer.listen(source)
+        with metrics.stage('ambient_noise'):
+            recognizer.adjust_for_ambient_noise(source)
+        with metrics.stage('listen'):
+            audio_data = recognizer.listen(source)
         try:
             # Set the language to Kannada (kn-IN)
-            query = recognizer.recognize_google(audio_data, language="kn-IN")
+            with metrics.stage('recognize'):
+                query = recognizer.recognize_google(audio_data, language="kn-IN")
             print(f"Your Query (Kannada): {query}")
             return query
         except sr.UnknownValueError:
@@ -55,26 +253,150 @@ def get_query_from_microphone():
             print(f"Error with speech recognition service: {e}")
             return None
 
-# Function to record audio from the microphone and save it to a temporary file
-def record_audio(duration=10):
-    """Record audio from microphone for specified duration"""
+# Function to record one utterance from the microphone straight into memory
+def record_audio(max_duration=10, cancel_event=None):
+    """
+    Record from the microphone until the speaker stops (energy-based VAD),
+    max_duration seconds pass or cancel_event is set. Returns sr.AudioData,
+    or None if no speech was heard.
+    """
     try:
-        temp_wav_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        sample_rate = 16000  # Standard sample rate for speech recognition
-        
         print("Recording your query...")
-        with sd.InputStream(samplerate=sample_rate, channels=1, callback=lambda indata, frames, time, status: sf.write(temp_wav_file.name, indata, sample_rate)):
-            sd.sleep(duration * 1000)  # Convert to milliseconds
-            
-        print(f"Audio recorded and saved to: {temp_wav_file.name}")
-        return temp_wav_file.name
-        
+        with metrics.stage('record'):
+            recorder = audiocapture.capture_from_microphone(max_duration=max_duration, cancel_event=cancel_event)
+        return recorder.audio_data()
     except Exception as e:
         print(f"Error recording audio: {str(e)}")
-        if os.path.exists(temp_wav_file.name):
-            os.remove(temp_wav_file.name)
         return None
 
+# Time and count every request; a per-request stage breakdown is collected
+# for the JSON response when the route asks for it
+@app.before_request
+def start_request_timer():
+    request.metrics_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    if metrics.enabled():
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUESTS.inc(route=route, status=response.status_code)
+        HTTP_SECONDS.observe(time.perf_counter() - request.metrics_start, route=route)
+    return response
+
+def wants_timings():
+    return request.args.get('timings', '').lower() in ('1', 'true', 'yes')
+
+# Prometheus scrape endpoint
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    for name, cache in (('embeddings', query_embedding_cache), ('results', query_result_cache)):
+        for stat, value in cache.stats().items():
+            if stat != 'hit_rate':
+                CACHE_LOOKUPS.set(value, cache=name, stat=stat)
+    job_stats = query_jobs.stats()
+    JOB_QUEUE.set(job_stats["queued"], state='queued')
+    JOB_QUEUE.set(job_stats["running"], state='running')
+    return metrics.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+# API to run many text queries in one request (see batchsearch.py for files)
+@app.route("/api/search-batch", methods=["POST"])
+def search_batch():
+    """
+    Body: {"queries": [...], "topK": 5}. Uncached queries are encoded in
+    one batched call and all of them are scored with one matrix product
+    and a row-wise top-k; returns one {"query", "audioFiles", "scores"}
+    per query, in order.
+    """
+    body = request.get_json(silent=True) or {}
+    queries = body.get("queries")
+    top_k = body.get("topK", 5)
+    if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+        return jsonify({"error": "Expected a JSON body with a \"queries\" list of strings"}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per request"}), 413
+    # bool is an int subclass, so JSON true would otherwise pass as 1
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or not 1 <= top_k <= MAX_BATCH_TOP_K:
+        return jsonify({"error": f"topK must be an integer from 1 to {MAX_BATCH_TOP_K}"}), 400
+
+    with metrics.Breakdown() as timings:
+        with metrics.stage('index_load'):
+            index = embedindex.get_index()
+        normalized = [querycache.normalize_query(query) for query in queries]
+        embeddings = [query_embedding_cache.get(query) for query in normalized]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            with metrics.stage('encode'):
+                encoded = embedindex.encode([normalized[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                query_embedding_cache.put(normalized[i], embedding)
+                embeddings[i] = embedding
+        with metrics.stage('rank'):
+            found = index.search_paths(embeddings, top_k) if queries else []
+
+    results = [{
+        "query": query,
+        "audioFiles": [os.path.join(CHUNK_FOLDER, path) for path, _ in paths],
+        "scores": [score for _, score in paths],
+    } for query, paths in zip(queries, found)]
+    timings["totalMs"] = (time.perf_counter() - request.metrics_start) * 1000
+    return jsonify({"results": results, "count": len(results), "encoded": len(missing), "timings": timings}), 200
+
+# API to inspect the query caches
+@app.route("/api/cache-stats", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "queryEmbeddings": query_embedding_cache.stats(),
+        "queryResults": query_result_cache.stats(),
+    }), 200
+
+# Function to load the heavy parts before the first query needs them
+def warm_up(json_file_path='translated_output.json', kannada_file_path=KANNADA_FILE):
+    """
+    Import speech_recognition, load the embedding and lexical indexes and
+    run one encode (which loads the model). Progress is kept in
+    warmup_state for /readyz; returns True when everything loaded.
+    """
+    started = time.perf_counter()
+    steps = [
+        ('speechRecognition', lambda: __import__('speech_recognition')),
+        ('indexLoad', lambda: embedindex.get_index(json_file_path)),
+        ('lexicalIndexLoad', lambda: lexicalindex.get_lexical_index(kannada_file_path)),
+        ('modelLoad', lambda: embedindex.encode("warm up")),
+    ]
+    for name, step in steps:
+        step_start = time.perf_counter()
+        try:
+            with metrics.stage('warmup'):
+                step()
+        except Exception as e:
+            print(f"Warm-up step {name} failed: {e}")
+            warmup_state.update(status="failed", error=f"{name}: {e}", seconds=time.perf_counter() - started)
+            return False
+        warmup_state["steps"][name + "Ms"] = (time.perf_counter() - step_start) * 1000
+    seconds = time.perf_counter() - started
+    print(f"Warm-up finished in {seconds:.1f}s")
+    warmup_state.update(status="ready", seconds=seconds)
+    READY.set(1)
+    return True
+
+def start_warmup():
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+# Liveness: the process is up and serving requests
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok", "uptimeSeconds": time.time() - warmup_state["startedAt"]}), 200
+
+# Readiness: 200 once warm-up has finished (or is disabled), 503 while warming or after it failed
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    body = dict(warmup_state, steps=dict(warmup_state["steps"]))
+    if warmup_state["status"] in ("ready", "disabled"):
+        return jsonify(body), 200
+    return jsonify(body), 503, {'Retry-After': str(WARMUP_RETRY_AFTER)}
+
 # Route for rendering the frontend page
 @app.route("/")
 def home():
@@ -83,69 +405,311 @@ def home():
 # API to capture query from microphone and fetch relevant audio files
 @app.route("/api/query-microphone", methods=["GET"])
 def query_microphone():
-    audio_path = None
     try:
-        # Record audio
-        audio_path = record_audio()
-        print(f"Debug: Audio recorded at {audio_path}")
+        with metrics.Breakdown() as timings:
+            # Record audio
+            audio_data = record_audio()
+            if audio_data is None:
+                logger.info("No speech detected while recording")
+                return jsonify({"error": "No speech detected. Please speak clearly and try again."}), 400
+            logger.debug(f"Recorded {len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width):.2f}s of audio")
+            body, status = recognize_and_search(audio_data)
+        if wants_timings():
+            timings["totalMs"] = (time.perf_counter() - request.metrics_start) * 1000
+            body["timings"] = timings
+        return jsonify(body), status
+    except Exception as e:
+        logger.exception(f"Unexpected error: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+# Function to convert query speech to text and look up matching audio files
+def recognize_and_search(audio_data):
+    """Returns a (response body, status) pair; stages are timed through metrics"""
+    import speech_recognition as sr
+    recognizer = sr.Recognizer()
+    logger.debug("Converting speech to text...")
+
+    try:
+        # First attempt with show_all=True to get detailed response
+        with metrics.stage('recognize'):
+            raw_result = recognizer.recognize_google(
+                audio_data, 
+                language="kn-IN",
+                show_all=True
+            )
+        logger.debug(f"Raw recognition result: {raw_result}")
         
-        # Convert audio to text
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(audio_path) as source:
-            print("Debug: Reading audio file")
-            recognizer.adjust_for_ambient_noise(source, duration=1)  # Added duration parameter
-            print(f"Debug: Energy threshold set to {recognizer.energy_threshold}")
-            audio_data = recognizer.record(source)
-            print("Debug: Converting speech to text...")
-            
-            try:
-                # First attempt with show_all=True to get detailed response
-                raw_result = recognizer.recognize_google(
-                    audio_data, 
-                    language="kn-IN",
-                    show_all=True
-                )
-                print(f"Debug: Raw recognition result: {raw_result}")
-                
-                if not raw_result:
-                    print("Debug: No speech detected in the audio")
-                    return jsonify({"error": "No speech detected. Please speak clearly and try again."}), 400
-                
-                # Get the most confident result
-                query_text = raw_result['alternative'][0]['transcript'] if isinstance(raw_result, dict) else raw_result
-                print(f"Debug: Final converted text: {query_text}")
-                
-                # Get relevant files
-                print(f"Debug: Searching for relevant files with query: {query_text}")
-                relevant_files = get_relevant_audio_files(query_text)
-                
-                if not relevant_files:
-                    return jsonify({"error": "No matching audio files found"}), 404
-                
-                return jsonify({
-                    "message": "Audio files retrieved successfully",
-                    "audioFiles": relevant_files,
-                    "queryText": query_text
-                }), 200
-                    
-            except sr.UnknownValueError:
-                print("Debug: Could not understand the audio")
-                return jsonify({"error": "Could not understand the audio. Please speak clearly and try again."}), 400
-            except sr.RequestError as e:
-                print(f"Debug: Google Speech Recognition service error: {str(e)}")
-                return jsonify({"error": "Speech recognition service error. Please try again later."}), 503
+        if not raw_result:
+            logger.info("No speech detected in the audio")
+            return {"error": "No speech detected. Please speak clearly and try again."}, 400
+        
+        # Get the most confident result
+        query_text = raw_result['alternative'][0]['transcript'] if isinstance(raw_result, dict) else raw_result
+        logger.debug(f"Final converted text: {query_text}")
+        
+        # Get relevant files
+        logger.debug(f"Searching for relevant files with query: {query_text}")
+        with metrics.stage('search'):
+            relevant_files = get_relevant_audio_files(query_text)
+        
+        if not relevant_files:
+            return {"error": "No matching audio files found"}, 404
+        
+        return {
+            "message": "Audio files retrieved successfully",
+            "audioFiles": relevant_files,
+            "results": describe_results(relevant_files),
+            "queryText": query_text
+        }, 200
             
+    except sr.UnknownValueError:
+        logger.info("Could not understand the audio")
+        return {"error": "Could not understand the audio. Please speak clearly and try again."}, 400
+    except sr.RequestError as e:
+        logger.error(f"Google Speech Recognition service error: {str(e)}")
+        return {"error": "Speech recognition service error. Please try again later."}, 503
+
+# Function to get a chunk's strong ETag (content hash), cached per size and mtime
+def chunk_etag(path, stat):
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    etag = chunk_etag_cache.get(key)
+    if etag is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        etag = sha.hexdigest()
+        chunk_etag_cache.put(key, etag)
+    return etag
+
+# Function to send an audio file with byte ranges, ETag/Last-Modified revalidation and caching
+def send_audio(folder, filename):
+    # Only audio files inside folder; '..', absolute paths and symlinks out of it are refused
+    root = os.path.realpath(folder)
+    path = safe_join(root, filename)
+    if path is None or not filename.lower().endswith(CHUNK_EXTENSIONS):
+        abort(404)
+    path = os.path.realpath(path)
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        abort(404)
+    return send_audio_file(path)
+
+def send_audio_file(path, etag=None):
+    stat = os.stat(path)
+    if etag is None:
+        with metrics.stage('chunk_etag'):
+            etag = chunk_etag(path, stat)
+    # conditional=True answers Range with 206 and If-None-Match/If-Modified-Since with 304
+    response = send_file(path, conditional=True, etag=etag, last_modified=stat.st_mtime, max_age=CHUNK_MAX_AGE)
+    response.cache_control.public = True
+    return response
+
+# Function to send a virtual chunk as a WAV cut from its memory-mapped source
+def send_virtual_chunk(manifest, filename):
+    identity = manifest.identity(filename)
+    with metrics.stage('virtual_chunk'):
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(wavcache.TARGET_SAMPLE_WIDTH)
+            wav.setframerate(manifest.rate)
+            wav.writeframes(manifest.samples(filename).tobytes())
+        buffer.seek(0)
+    response = send_file(buffer, mimetype='audio/wav', conditional=True, etag=identity["sha256"].replace(':', '-'),
+                         max_age=CHUNK_MAX_AGE)
+    response.cache_control.public = True
+    return response
+
+# Route serving audio chunks
+@app.route(f"/{CHUNK_FOLDER}/<path:filename>", methods=["GET", "HEAD"])
+def serve_chunk(filename):
+    if not os.path.isfile(os.path.join(CHUNK_FOLDER, filename)):
+        manifest = get_chunk_manifest()
+        if manifest is not None and filename in manifest:
+            return send_virtual_chunk(manifest, filename)
+    return send_audio(CHUNK_FOLDER, filename)
+
+# Route serving the decoded copy of a recording that virtual chunks point into
+@app.route(f"/{SOURCE_AUDIO_ROUTE}/<source_id>", methods=["GET", "HEAD"])
+def serve_source_audio(source_id):
+    manifest = get_chunk_manifest()
+    entry = manifest.source_entry(source_id) if manifest is not None else None
+    if entry is None or not os.path.isfile(entry["pcm"]):
+        abort(404)
+    # The copy is determined by the source's content and the target format, so no need to hash it
+    etag = f"{entry['sha256']}-{wavcache.TARGET_FORMAT}"
+    return send_audio_file(os.path.abspath(entry["pcm"]), etag=etag)
+
+# Route serving the low-bitrate chunk previews
+@app.route(f"/{PREVIEW_FOLDER}/<path:filename>", methods=["GET", "HEAD"])
+def serve_preview(filename):
+    return send_audio(PREVIEW_FOLDER, filename)
+
+# Function to read the request body (raw or chunked) without exceeding the upload limit
+def read_upload_body():
+    if 'audio' in request.files:
+        data = request.files['audio'].read(MAX_UPLOAD_BYTES + 1)
+        content_type = request.files['audio'].mimetype
+    else:
+        # Chunked bodies carry no Content-Length, so enforce the limit while reading
+        parts, size = [], 0
+        while size <= MAX_UPLOAD_BYTES:
+            part = request.stream.read(64 * 1024)
+            if not part:
+                break
+            parts.append(part)
+            size += len(part)
+        data = b''.join(parts)
+        content_type = request.mimetype
+    if len(data) > MAX_UPLOAD_BYTES:
+        return None, content_type
+    return data, content_type
+
+# Function to read and decode an uploaded query within the upload limits
+def decode_upload(limits):
+    """Returns (pcm, duration, None), or (None, None, (error body, status))"""
+    with metrics.stage('upload'):
+        data, content_type = read_upload_body()
+    if data is None:
+        return None, None, ({"error": "Audio upload is too large", "limits": limits}, 413)
+
+    # Decode and resample to 16 kHz mono entirely in memory
+    with metrics.stage('decode'):
+        pcm = audiodecode.decode_to_pcm(data, content_type)
+    duration = len(pcm) / audiodecode.TARGET_RATE
+    if duration > MAX_UPLOAD_SECONDS:
+        return None, None, ({"error": f"Audio is longer than {MAX_UPLOAD_SECONDS} seconds", "limits": limits}, 413)
+    logger.debug(f"Received {len(data)} bytes ({content_type}), {duration:.2f}s of audio")
+    return pcm, duration, None
+
+# API to search with audio recorded in the browser (WAV/WebM/Opus body)
+@app.route("/api/query-audio", methods=["POST"])
+def query_audio():
+    limits = {"maxBytes": MAX_UPLOAD_BYTES, "maxSeconds": MAX_UPLOAD_SECONDS}
+    start = time.perf_counter()
+    try:
+        with metrics.Breakdown() as timings:
+            pcm, duration, error = decode_upload(limits)
+            if error:
+                return jsonify(error[0]), error[1]
+            body, status = recognize_and_search(audiodecode.to_audio_data(pcm))
+        timings["totalMs"] = (time.perf_counter() - start) * 1000
+        body["limits"] = limits
+        body["timings"] = timings
+        body["audioSeconds"] = duration
+        return jsonify(body), status
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Audio upload is too large", "limits": limits}), 413
+    except audiodecode.AudioDecodeError as e:
+        logger.warning(f"Could not decode uploaded audio: {str(e)}")
+        return jsonify({"error": "Could not decode the uploaded audio", "limits": limits}), 415
     except Exception as e:
-        print(f"Debug: Unexpected error: {str(e)}")
+        logger.exception(f"Unexpected error: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
-    finally:
-        # Clean up temporary file
-        if audio_path and os.path.exists(audio_path):
-            try:
-                os.remove(audio_path)
-                print(f"Debug: Cleaned up temporary file: {audio_path}")
-            except Exception as e:
-                print(f"Debug: Failed to clean up temporary file: {str(e)}")
+
+# Function to record from the server microphone and search, run on the job pool
+def run_microphone_job(job):
+    with metrics.Breakdown() as timings:
+        audio_data = record_audio(cancel_event=job.cancel_event)
+        if job.cancelled:
+            raise jobqueue.JobCancelled()
+        if audio_data is None:
+            return {"error": "No speech detected. Please speak clearly and try again."}, 400
+        body, status = recognize_and_search(audio_data)
+    timings["totalMs"] = (time.time() - job.created) * 1000
+    body["timings"] = timings
+    return body, status
+
+# Function to recognize and search an already decoded upload, run on the job pool
+def run_audio_job(job, pcm, duration, upload_timings):
+    with metrics.Breakdown() as timings:
+        body, status = recognize_and_search(audiodecode.to_audio_data(pcm))
+    timings["totalMs"] = (time.time() - job.created) * 1000
+    body["timings"] = dict(upload_timings, **timings)
+    body["audioSeconds"] = duration
+    return body, status
+
+def job_info(job):
+    info = job.to_dict()
+    info["statusUrl"] = f"/api/jobs/{job.id}"
+    info["eventsUrl"] = f"/api/jobs/{job.id}/events"
+    return info
+
+# Function to queue a job, answering 202 with its links or 429 when the queue is full
+def submit_job(fn, *args, kind):
+    try:
+        job = query_jobs.submit(fn, *args, kind=kind)
+    except jobqueue.QueueFull:
+        return jsonify({"error": "Too many queries in progress. Please try again shortly.",
+                        "queue": query_jobs.stats()}), 429, {"Retry-After": str(JOB_RETRY_AFTER)}
+    return jsonify(job_info(job)), 202, {"Location": f"/api/jobs/{job.id}"}
+
+# API to start a microphone query as a background job
+@app.route("/api/jobs/microphone", methods=["POST"])
+def submit_microphone_job():
+    return submit_job(run_microphone_job, kind='microphone')
+
+# API to start a query from browser-recorded audio as a background job
+@app.route("/api/jobs/audio", methods=["POST"])
+def submit_audio_job():
+    limits = {"maxBytes": MAX_UPLOAD_BYTES, "maxSeconds": MAX_UPLOAD_SECONDS}
+    try:
+        # Upload and decode stay on the request thread; only recognition and search are queued
+        with metrics.Breakdown() as timings:
+            pcm, duration, error = decode_upload(limits)
+        if error:
+            return jsonify(error[0]), error[1]
+        return submit_job(run_audio_job, pcm, duration, timings, kind='audio')
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Audio upload is too large", "limits": limits}), 413
+    except audiodecode.AudioDecodeError as e:
+        logger.warning(f"Could not decode uploaded audio: {str(e)}")
+        return jsonify({"error": "Could not decode the uploaded audio", "limits": limits}), 415
+
+# API to poll a job
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = query_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job_info(job)), 200
+
+# API to cancel a queued or running job
+@app.route("/api/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job = query_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job.status in (jobqueue.DONE, jobqueue.FAILED):
+        return jsonify(dict(job_info(job), error="Job already finished")), 409
+    return jsonify(job_info(job)), 200
+
+# API to follow a job with Server-Sent Events: one "status" event per change, ending with the final state
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    job = query_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    def stream():
+        version = None
+        while True:
+            current = job.wait_for_change(version, timeout=JOB_EVENTS_KEEPALIVE)
+            if current == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = current
+            info = job_info(job)
+            yield f"event: status\ndata: {json.dumps(info, ensure_ascii=False)}\n\n"
+            if info["status"] in jobqueue.FINAL_STATES:
+                return
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Under the debug reloader only the child process that serves requests warms up
+if WARMUP and (__name__ != "__main__" or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+    start_warmup()
 
 if __name__ == "__main__":
     app.run(debug=True)
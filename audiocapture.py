@@ -0,0 +1,204 @@
+import queue
+import numpy as np
+
+SAMPLE_RATE = 16000  # Standard sample rate for speech recognition
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+
+class RingBuffer:
+    """Preallocated int16 ring buffer; once full, the oldest samples are overwritten"""
+
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.end = 0  # Total samples ever written
+
+    def __len__(self):
+        return min(self.end, self.capacity)
+
+    def write(self, samples):
+        samples = samples[-self.capacity:]
+        start = self.end % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:len(samples) - first] = samples[first:]
+        self.end += len(samples)
+
+    def read(self):
+        """Buffered samples, oldest first"""
+        if self.end <= self.capacity:
+            return self.data[:self.end].copy()
+        start = self.end % self.capacity
+        return np.concatenate([self.data[start:], self.data[:start]])
+
+
+class EnergyVAD:
+    """
+    Frame-energy voice activity detector. The noise floor is estimated from
+    the first calibration_ms of input (like adjust_for_ambient_noise) and a
+    frame counts as speech when its RMS exceeds threshold_ratio times the
+    floor, and at least min_rms.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=30, calibration_ms=300, threshold_ratio=3.0, min_rms=300):
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.frame_ms = frame_ms
+        self.calibration_frames = max(1, calibration_ms // frame_ms)
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self._calibration = []
+        self.threshold = None
+
+    def frame_rms(self, frames):
+        """RMS of each row of a (n_frames, frame_len) int16 array"""
+        frames = frames.astype(np.float32)
+        return np.sqrt(np.mean(frames * frames, axis=1))
+
+    def classify(self, frames):
+        """Speech flags for a batch of whole frames"""
+        rms = self.frame_rms(frames)
+        if self.threshold is None:
+            needed = self.calibration_frames - len(self._calibration)
+            self._calibration.extend(rms[:needed].tolist())
+            if len(self._calibration) < self.calibration_frames:
+                return np.zeros(len(rms), dtype=bool)
+            floor = float(np.median(self._calibration))
+            self.threshold = max(self.min_rms, floor * self.threshold_ratio)
+            flags = np.zeros(len(rms), dtype=bool)
+            flags[needed:] = rms[needed:] > self.threshold
+            return flags
+        return rms > self.threshold
+
+
+class UtteranceRecorder:
+    """
+    Collects PCM blocks into a preallocated ring buffer and decides when
+    the utterance is over:
+
+    - end_silence_ms of non-speech after at least min_speech_ms of speech
+    - no speech at all within no_speech_timeout seconds (no utterance)
+    - max_duration seconds in total
+
+    Only pre_roll_ms of audio before the first speech frame is kept.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, max_duration=10, pre_roll_ms=300, end_silence_ms=700,
+                 min_speech_ms=150, no_speech_timeout=5, vad=None):
+        self.sample_rate = sample_rate
+        self.vad = vad or EnergyVAD(sample_rate)
+        frame_ms = self.vad.frame_ms
+        self.max_samples = int(max_duration * sample_rate)
+        self.pre_roll_frames = pre_roll_ms // frame_ms
+        self.end_silence_frames = max(1, end_silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.no_speech_frames = int(no_speech_timeout * 1000) // frame_ms
+
+        self.buffer = RingBuffer(self.max_samples)
+        self._pending = np.zeros(0, dtype=np.int16)
+        self.frames_seen = 0
+        self.speech_frames = 0
+        self.silence_run = 0
+        self.speech_start = None  # Sample offset of the first speech frame
+        self.done = False
+        self.reason = None
+
+    def feed(self, block):
+        """Add a block of int16 (or float in [-1, 1]) samples; returns True once the utterance is over"""
+        if self.done:
+            return True
+        block = np.asarray(block)
+        if block.ndim > 1:
+            block = block[:, 0]
+        if block.dtype.kind == 'f':
+            block = (np.clip(block, -1.0, 1.0) * 32767).astype(np.int16)
+        samples = np.concatenate([self._pending, block.astype(np.int16, copy=False)])
+
+        frame_len = self.vad.frame_len
+        n_frames = len(samples) // frame_len
+        self._pending = samples[n_frames * frame_len:]
+        if n_frames == 0:
+            return False
+        frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+        flags = self.vad.classify(frames)
+
+        for i, is_speech in enumerate(flags):
+            self.buffer.write(frames[i])
+            self.frames_seen += 1
+            if is_speech:
+                if self.speech_start is None:
+                    self.speech_start = (self.frames_seen - 1) * frame_len
+                self.speech_frames += 1
+                self.silence_run = 0
+            elif self.speech_start is not None:
+                self.silence_run += 1
+
+            if self.speech_frames >= self.min_speech_frames and self.silence_run >= self.end_silence_frames:
+                self._finish('end_of_speech')
+            elif self.speech_start is None and self.frames_seen >= self.no_speech_frames:
+                self._finish('no_speech')
+            elif self.frames_seen * frame_len >= self.max_samples:
+                self._finish('max_duration')
+            if self.done:
+                break
+        return self.done
+
+    def _finish(self, reason):
+        self.done = True
+        self.reason = reason
+
+    def samples(self):
+        """The utterance from pre-roll to the last frame, or None if no speech was heard"""
+        if self.speech_start is None:
+            return None
+        recorded = self.buffer.read()
+        first_kept = self.buffer.end - len(recorded)
+        start = max(first_kept, self.speech_start - self.pre_roll_frames * self.vad.frame_len)
+        return recorded[start - first_kept:]
+
+    def audio_data(self):
+        samples = self.samples()
+        if samples is None:
+            return None
+        # speech_recognition is only needed here; importing it lazily keeps app start-up fast
+        import speech_recognition as sr
+        return sr.AudioData(samples.tobytes(), self.sample_rate, SAMPLE_WIDTH)
+
+
+# Function to capture one utterance from any iterable of PCM blocks (e.g. synthetic audio)
+def capture_from_blocks(blocks, **recorder_options):
+    recorder = UtteranceRecorder(**recorder_options)
+    for block in blocks:
+        if recorder.feed(block):
+            break
+    else:
+        recorder._finish('end_of_input')
+    return recorder
+
+
+# Function to capture one utterance from the microphone without touching disk
+def capture_from_microphone(block_ms=30, cancel_event=None, **recorder_options):
+    import sounddevice as sd
+
+    sample_rate = recorder_options.get('sample_rate', SAMPLE_RATE)
+    blocks = queue.Queue()
+
+    def callback(indata, frames, time, status):
+        if status:
+            print(f"Audio input status: {status}")
+        blocks.put(indata[:, 0].copy())
+
+    def stream_blocks():
+        # Setting cancel_event (a threading.Event) stops the recording early
+        while cancel_event is None or not cancel_event.is_set():
+            try:
+                yield blocks.get(timeout=1.0)
+            except queue.Empty:
+                return
+
+    with sd.InputStream(samplerate=sample_rate, channels=1, dtype='int16',
+                        blocksize=sample_rate * block_ms // 1000, callback=callback):
+        recorder = capture_from_blocks(stream_blocks(), **recorder_options)
+    if cancel_event is not None and cancel_event.is_set():
+        recorder._finish('cancelled')
+    print(f"Recording stopped ({recorder.reason}) after {recorder.frames_seen * recorder.vad.frame_ms} ms")
+    return recorder
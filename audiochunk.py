@@ -1,10 +1,22 @@
 from pydub import AudioSegment
-from pydub.utils import make_chunks
+from pydub.utils import make_chunks, mediainfo
 import os
+import time
+import wave
+import tempfile
+import subprocess
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import metrics
+import segmentation
+import waveform
+import wavcache
+import virtualchunks
+
+SUPPORTED_FORMATS = ('.mp3', '.wav', '.flac')
 
 # Function to split the audio file into fixed-duration chunks
-def split_audio(file_path, chunk_duration_ms, output_dir):
+def split_audio(file_path, chunk_duration_ms, output_dir, peaks_dir=None, preview_dir=None):
     # Load the audio file
     print(f"Processing: {file_path}")
     audio = AudioSegment.from_file(file_path)
@@ -20,35 +32,264 @@ def split_audio(file_path, chunk_duration_ms, output_dir):
         chunk_name = os.path.join(output_dir, f"{Path(file_path).stem}_chunk_{i+1}.wav")
         chunk.export(chunk_name, format="wav")
         print(f"Exported: {chunk_name}")
+        if peaks_dir or preview_dir:
+            save_waveform(chunk_name, segmentation.segment_to_array(chunk), chunk.frame_rate, peaks_dir, preview_dir)
 
     print(f"Splitting completed for {file_path}! Files are saved in: {output_dir}")
+    return {"file": file_path, "chunks": len(chunks), "seconds": len(audio) / 1000}
+
+class PCMStream:
+    """
+    Sequential reader of a recording's raw PCM frames. PCM WAV files are
+    read directly; other formats (and WAVs the wave module cannot read,
+    e.g. WAVE_FORMAT_EXTENSIBLE or compressed) are decoded by ffmpeg into a
+    pipe, so only the frames being read are ever in memory.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._wav = None
+        self._process = None
+        self._stderr = None
+        self._eof = False
+        if file_path.lower().endswith('.wav'):
+            try:
+                self._wav = wave.open(file_path, 'rb')
+            except (wave.Error, EOFError):
+                self._wav = None
+        if self._wav is not None:
+            self.frame_rate = self._wav.getframerate()
+            self.channels = self._wav.getnchannels()
+            self.sample_width = self._wav.getsampwidth()
+        else:
+            # ffprobe only reads the headers
+            info = mediainfo(file_path)
+            self.frame_rate = int(info['sample_rate'])
+            self.channels = int(info['channels'])
+            self.sample_width = 2
+            # stderr goes to a file, so a chatty decoder cannot fill a pipe nobody reads
+            self._stderr = tempfile.TemporaryFile()
+            self._process = subprocess.Popen(
+                ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', file_path,
+                 '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1'],
+                stdout=subprocess.PIPE, stderr=self._stderr)
+
+    @property
+    def frame_width(self):
+        return self.channels * self.sample_width
+
+    def read(self, n_frames):
+        """Up to n_frames of raw PCM; fewer only at the end of the stream"""
+        if self._wav is not None:
+            return self._wav.readframes(n_frames)
+        wanted = n_frames * self.frame_width
+        parts, size = [], 0
+        while size < wanted:
+            part = self._process.stdout.read(wanted - size)
+            if not part:
+                self._eof = True
+                break
+            parts.append(part)
+            size += len(part)
+        return b''.join(parts)
+
+    def close(self):
+        """
+        Raises RuntimeError, with the end of ffmpeg's stderr, if the decode
+        was read to the end but ffmpeg failed (a corrupt or cut-short file)
+        """
+        if self._wav is not None:
+            self._wav.close()
+        if self._process is None:
+            return
+        if not self._eof:
+            # Stopped early: ffmpeg would only fail on the closed pipe
+            self._process.terminate()
+        self._process.stdout.close()
+        returncode = self._process.wait()
+        self._stderr.seek(0)
+        errors = self._stderr.read().decode(errors='replace').strip()
+        self._stderr.close()
+        self._process = None
+        if self._eof and returncode != 0:
+            raise RuntimeError(f"ffmpeg failed decoding {self.file_path} (exit {returncode}): {errors[-1000:]}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Function to write a chunk's waveform peaks (and optional preview) from its PCM
+def save_waveform(chunk_name, samples, sample_rate, peaks_dir=None, preview_dir=None):
+    """
+    Ingest step run on each chunk right after it is written, while its PCM
+    is still in memory: peaks go to peaks_dir/<chunk stem>.peaks and, with
+    preview_dir, a low-bitrate preview is encoded from the chunk file.
+    Failures are printed and do not stop the split.
+    """
+    stem = Path(chunk_name).stem
+    try:
+        if peaks_dir:
+            waveform.save_peaks(samples, sample_rate, os.path.join(peaks_dir, stem + waveform.PEAKS_SUFFIX))
+        if preview_dir:
+            waveform.encode_preview(chunk_name, os.path.join(preview_dir, f"{stem}.{waveform.PREVIEW_FORMAT}"))
+    except Exception as e:
+        print(f"Error making waveform data for {chunk_name}: {e}")
+
+# Function to cut a recording into fixed-duration chunk files while it is being decoded
+def iter_chunks_streaming(file_path, chunk_duration_ms, output_dir, peaks_dir=None, preview_dir=None):
+    """
+    Decode file_path one chunk at a time, write each chunk to output_dir as
+    soon as it is read and yield (chunk path, seconds). Peak memory is about
+    one chunk regardless of the file's length. Waveform data is written per
+    chunk as in save_waveform.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    count = 0
+    with PCMStream(file_path) as stream:
+        while True:
+            # Chunk boundaries on the same millisecond grid as pydub's make_chunks
+            start = count * chunk_duration_ms * stream.frame_rate // 1000
+            end = (count + 1) * chunk_duration_ms * stream.frame_rate // 1000
+            data = stream.read(end - start)
+            if not data:
+                break
+
+            count += 1
+            chunk_name = os.path.join(output_dir, f"{Path(file_path).stem}_chunk_{count}.wav")
+            with wave.open(chunk_name, 'wb') as chunk:
+                chunk.setnchannels(stream.channels)
+                chunk.setsampwidth(stream.sample_width)
+                chunk.setframerate(stream.frame_rate)
+                chunk.writeframes(data)
+            if peaks_dir or preview_dir:
+                save_waveform(chunk_name, waveform.pcm_to_array(data, stream.sample_width, stream.channels),
+                              stream.frame_rate, peaks_dir, preview_dir)
+            yield chunk_name, len(data) / (stream.frame_width * stream.frame_rate)
+
+# Function to split a recording into fixed-duration chunks while it is being decoded
+def split_audio_streaming(file_path, chunk_duration_ms, output_dir, peaks_dir=None, preview_dir=None):
+    """Same chunks and file names as split_audio, written by iter_chunks_streaming"""
+    print(f"Processing (streaming): {file_path}")
+    count = 0
+    seconds = 0.0
+    for chunk_name, chunk_seconds in iter_chunks_streaming(file_path, chunk_duration_ms, output_dir,
+                                                               peaks_dir, preview_dir):
+        print(f"Exported: {chunk_name}")
+        count += 1
+        seconds += chunk_seconds
+
+    print(f"Splitting completed for {file_path}! Files are saved in: {output_dir}")
+    return {"file": file_path, "chunks": count, "seconds": seconds}
+
+# Tasks may run in pool processes, whose metrics never reach this one, so
+# they return their duration and report() records it
+def _split_task(task):
+    file_path, chunk_duration_ms, output_dir, streaming, peaks_dir, preview_dir = task
+    split = split_audio_streaming if streaming else split_audio
+    started = time.perf_counter()
+    result = split(file_path, chunk_duration_ms, output_dir, peaks_dir, preview_dir)
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+def _virtual_task(task):
+    file_path, chunk_duration_ms, relative_dir, cache_dir, peaks_dir = task
+    print(f"Processing (virtual): {file_path}")
+    started = time.perf_counter()
+    plan = virtualchunks.plan_source(file_path, chunk_duration_ms, relative_dir, cache_dir, peaks_dir)
+    plan["elapsed"] = time.perf_counter() - started
+    return plan
 
 # Function to process all audio files in a folder
-def process_audio_folder(input_folder, chunk_duration_ms, output_base_dir):
-    # Walk through the folder and process all audio files
+def process_audio_folder(input_folder, chunk_duration_ms, output_base_dir, streaming=True, workers=1,
+                         peaks_base_dir=None, preview_base_dir=None, virtual=False,
+                         manifest_file=virtualchunks.DEFAULT_MANIFEST_FILE, wav_cache_dir=wavcache.DEFAULT_CACHE_DIR):
+    """
+    Split every supported file under input_folder. With workers > 1 the
+    files are spread over a process pool. Progress and throughput are
+    printed as files finish; the list of per-file results is returned.
+    Waveform peaks and previews, when their base dirs are given, mirror
+    the chunk folder layout.
+
+    With virtual=True no chunk files are written: each file is decoded once
+    into wav_cache_dir and its chunks are recorded in manifest_file as
+    (source, sample offset, length) under the names they would have had
+    (see virtualchunks.py). Previews need chunk files and are skipped.
+    """
+    manifest = virtualchunks.ChunkManifest(manifest_file) if virtual else None
+    # Walk through the folder and collect all audio files
+    tasks = []
     for root, _, files in os.walk(input_folder):
-        for file in files:
-            if file.lower().endswith(('.mp3', '.wav', '.flac')):  # Supported formats
+        for file in sorted(files):
+            if file.lower().endswith(SUPPORTED_FORMATS):  # Supported formats
                 input_file = os.path.join(root, file)
-                
+
                 # Create output directory structure mirroring the input folder
                 relative_path = os.path.relpath(root, input_folder)
+                peaks_dir = os.path.join(peaks_base_dir, relative_path) if peaks_base_dir else None
+                if virtual:
+                    tasks.append((input_file, chunk_duration_ms, relative_path, wav_cache_dir, peaks_dir))
+                    continue
                 output_dir = os.path.join(output_base_dir, relative_path)
-                
+                preview_dir = os.path.join(preview_base_dir, relative_path) if preview_base_dir else None
+                tasks.append((input_file, chunk_duration_ms, output_dir, streaming, peaks_dir, preview_dir))
+    task_fn = _virtual_task if virtual else _split_task
+
+    results = []
+    audio_seconds = 0.0
+    started = time.perf_counter()
+
+    def report(result):
+        nonlocal audio_seconds
+        metrics.STAGE_SECONDS.observe(result["elapsed"], stage='split_file')
+        if manifest is not None:
+            manifest.add(result)
+            result = {"file": result["source"], "chunks": len(result["chunks"]), "seconds": result["seconds"],
+                      "elapsed": result["elapsed"]}
+        results.append(result)
+        audio_seconds += result["seconds"]
+        elapsed = time.perf_counter() - started
+        print(f"[{len(results)}/{len(tasks)}] {result['file']}: {result['chunks']} chunks | "
+              f"{len(results) / elapsed:.2f} files/s, {audio_seconds / elapsed:.1f}x realtime")
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(task_fn, task): task for task in tasks}
+            for future in as_completed(futures):
                 # Split the audio file
                 try:
-                    split_audio(input_file, chunk_duration_ms, output_dir)
+                    report(future.result())
                 except Exception as e:
-                    print(f"Error processing {input_file}: {e}")
+                    print(f"Error processing {futures[future][0]}: {e}")
+    else:
+        for task in tasks:
+            # Split the audio file
+            try:
+                report(task_fn(task))
+            except Exception as e:
+                print(f"Error processing {task[0]}: {e}")
+
+    if manifest is not None:
+        manifest.save()
+        print(f"{len(manifest)} virtual chunks saved to: {manifest_file}")
+
+    elapsed = time.perf_counter() - started
+    print(f"Split {len(results)} of {len(tasks)} files ({audio_seconds / 3600:.2f} h of audio) in {elapsed:.1f}s")
+    return results
 
 def main():
     input_folder = "data"  # Replace with the folder containing audio files
     chunk_duration_ms = 30000  # Duration of each chunk in milliseconds (e.g., 30 seconds)
     output_base_dir = "audio_chunks_database"  # Base directory to save all chunks
+    workers = os.cpu_count() or 1  # Files split in parallel
+    peaks_base_dir = waveform.PEAKS_FOLDER  # Waveform peaks returned with search results
+    preview_base_dir = None  # Set to waveform.PREVIEW_FOLDER to also encode previews (needs ffmpeg)
+    virtual = False  # Set to True to record chunks in virtualchunks.DEFAULT_MANIFEST_FILE instead of exporting them
 
     # Process all audio files in the folder
-    process_audio_folder(input_folder, chunk_duration_ms, output_base_dir)
+    process_audio_folder(input_folder, chunk_duration_ms, output_base_dir, streaming=True, workers=workers,
+                         peaks_base_dir=peaks_base_dir, preview_base_dir=preview_base_dir, virtual=virtual)
 
 if __name__ == "__main__":
     main()
- 
\ No newline at end of file
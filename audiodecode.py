@@ -0,0 +1,104 @@
+import io
+import wave
+import subprocess
+import numpy as np
+
+TARGET_RATE = 16000  # Sample rate used for recognition
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+
+class AudioDecodeError(Exception):
+    """Raised when uploaded audio cannot be decoded"""
+
+
+def sniff_format(data, content_type=None):
+    """Guess the container from the magic bytes, falling back to the Content-Type"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WAVE':
+        return 'wav'
+    if data[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'
+    if data[:4] == b'OggS':
+        return 'ogg'
+    if content_type:
+        subtype = content_type.split(';')[0].strip().split('/')[-1].lower()
+        return {'x-wav': 'wav', 'wave': 'wav', 'opus': 'ogg', 'mpeg': 'mp3'}.get(subtype, subtype)
+    return None
+
+
+def resample(samples, src_rate, dst_rate=TARGET_RATE):
+    """
+    Resample a float32 signal by linear interpolation. When downsampling,
+    a moving-average low-pass over the rate ratio limits aliasing first.
+    """
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    if src_rate > dst_rate:
+        width = int(round(src_rate / dst_rate))
+        if width > 1:
+            samples = np.convolve(samples, np.ones(width, dtype=np.float32) / width, mode='same')
+    n_out = int(round(len(samples) * dst_rate / src_rate))
+    positions = np.arange(n_out, dtype=np.float64) * (src_rate / dst_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def decode_wav(data):
+    """Decode PCM WAV bytes to (float32 mono samples in [-1, 1], sample rate)"""
+    with wave.open(io.BytesIO(data), 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise AudioDecodeError(f"Unsupported WAV sample width: {width * 8} bits")
+
+    samples = samples[:len(samples) // channels * channels].reshape(-1, channels)
+    return samples.mean(axis=1), rate
+
+
+def decode_with_ffmpeg(data, fmt=None, rate=TARGET_RATE, timeout=30):
+    """Decode any ffmpeg-readable audio through pipes to int16 mono PCM at rate"""
+    command = ['ffmpeg', '-hide_banner', '-loglevel', 'error']
+    if fmt:
+        command += ['-f', fmt]
+    command += ['-i', 'pipe:0', '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(rate), 'pipe:1']
+    try:
+        result = subprocess.run(command, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is required to decode compressed audio")
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError("Timed out decoding audio")
+    if result.returncode != 0:
+        raise AudioDecodeError(f"ffmpeg could not decode audio: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype='<i2')
+
+
+def decode_to_pcm(data, content_type=None, rate=TARGET_RATE):
+    """
+    Decode WAV/WebM/Ogg-Opus bytes in memory to int16 mono PCM at rate.
+    PCM WAV is handled in NumPy; everything else goes through ffmpeg pipes.
+    """
+    if not data:
+        raise AudioDecodeError("Empty audio upload")
+    fmt = sniff_format(data, content_type)
+    if fmt == 'wav':
+        try:
+            samples, src_rate = decode_wav(data)
+        except (wave.Error, EOFError, AudioDecodeError):
+            return decode_with_ffmpeg(data, 'wav', rate)
+        samples = resample(samples, src_rate, rate)
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    # ffmpeg's matroska demuxer also reads WebM; anything else is probed by ffmpeg
+    return decode_with_ffmpeg(data, {'webm': 'matroska', 'ogg': 'ogg'}.get(fmt), rate)
+
+
+def to_audio_data(pcm, rate=TARGET_RATE):
+    """Wrap int16 mono PCM for the speech_recognition recognizers"""
+    import speech_recognition as sr
+    return sr.AudioData(np.ascontiguousarray(pcm, dtype=np.int16).tobytes(), rate, SAMPLE_WIDTH)
@@ -2,30 +2,19 @@ import speech_recognition as sr
 import os
 from pydub import AudioSegment
 from pydub.silence import split_on_silence
-import wave
-import contextlib
+import wavconvert
 
 class AudioTranscriber:
     def __init__(self):
         self.recognizer = sr.Recognizer()
         
     def get_audio_duration(self, audio_path):
-        """Get duration of audio file in seconds"""
-        with contextlib.closing(wave.open(audio_path, 'r')) as f:
-            frames = f.getnframes()
-            rate = f.getframerate()
-            duration = frames / float(rate)
-            return duration
+        """Get duration of audio file in seconds, from its headers"""
+        return wavconvert.get_audio_duration(audio_path)
 
-    def convert_to_wav(self, audio_path, output_path):
-        """Convert audio file to WAV format if needed"""
-        try:
-            audio = AudioSegment.from_file(audio_path)
-            audio.export(output_path, format="wav")
-            return output_path
-        except Exception as e:
-            print(f"Error converting audio: {str(e)}")
-            return None
+    def convert_to_wav(self, audio_path):
+        """16 kHz mono WAV of audio_path from the conversion cache"""
+        return wavconvert.convert_to_wav(audio_path)
 
     def transcribe_large_audio(self, path):
         """
@@ -43,33 +32,21 @@ class AudioTranscriber:
                 keep_silence=500
             )
             
-            folder_name = "audio-chunks"
-            if not os.path.isdir(folder_name):
-                os.mkdir(folder_name)
-            
             full_text = ""
             
-            # Process each chunk
+            # Process each chunk straight from its PCM buffer, no temp files
             for i, audio_chunk in enumerate(chunks, start=1):
-                chunk_filename = os.path.join(folder_name, f"chunk{i}.wav")
-                audio_chunk.export(chunk_filename, format="wav")
+                audio_chunk = audio_chunk.set_channels(1)
+                audio = sr.AudioData(audio_chunk.raw_data, audio_chunk.frame_rate, audio_chunk.sample_width)
                 
                 # Recognize chunk
-                with sr.AudioFile(chunk_filename) as source:
-                    audio = self.recognizer.record(source)
-                    try:
-                        text = self.recognizer.recognize_google(audio, language='kn-IN')
-                        full_text += text + " "
-                    except sr.UnknownValueError:
-                        print(f"Could not understand chunk {i}")
-                    except sr.RequestError as e:
-                        print(f"Error with chunk {i}: {str(e)}")
-                
-                # Clean up chunk file
-                os.remove(chunk_filename)
-            
-            # Clean up chunks directory
-            os.rmdir(folder_name)
+                try:
+                    text = self.recognizer.recognize_google(audio, language='kn-IN')
+                    full_text += text + " "
+                except sr.UnknownValueError:
+                    print(f"Could not understand chunk {i}")
+                except sr.RequestError as e:
+                    print(f"Error with chunk {i}: {str(e)}")
             
             return full_text.strip()
             
@@ -86,13 +63,10 @@ class AudioTranscriber:
             if not os.path.exists(audio_path):
                 raise FileNotFoundError(f"Audio file not found: {audio_path}")
             
-            # Convert to WAV if needed
-            file_ext = os.path.splitext(audio_path)[1].lower()
-            if file_ext != '.wav':
-                wav_path = os.path.splitext(audio_path)[0] + '.wav'
-                audio_path = self.convert_to_wav(audio_path, wav_path)
-                if not audio_path:
-                    raise Exception("Failed to convert audio to WAV format")
+            # Convert to 16 kHz mono WAV unless it already is (or was converted before)
+            audio_path = self.convert_to_wav(audio_path)
+            if not audio_path:
+                raise Exception("Failed to convert audio to WAV format")
             
             # Get audio duration
             duration = self.get_audio_duration(audio_path)
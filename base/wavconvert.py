@@ -1,14 +1,90 @@
 from pydub import AudioSegment
+from pydub.utils import mediainfo
 import os
+import wave
+import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
-def convert_to_wav(input_path, output_path=None):
+# Converted files are kept by the SHA-256 of their source, so a file is only
+# converted again when its content changes
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wav_cache')
+TARGET_RATE = 16000
+TARGET_FORMAT = f"{TARGET_RATE}hz-mono-s16"
+
+def source_hash(path):
+    """SHA-256 of the file contents"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def is_complete_wav(path):
+    """True if path is a whole 16 kHz mono 16-bit WAV (not a half-written one)"""
+    try:
+        with wave.open(path, 'rb') as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (TARGET_RATE, 1, 2):
+                return False
+            data_bytes = wav.getnframes() * 2
+    except (wave.Error, EOFError, OSError):
+        return False
+    return os.path.getsize(path) >= 44 + data_bytes
+
+def read_flac_duration(path):
+    """Duration from the FLAC STREAMINFO block, or None if it is not FLAC"""
+    with open(path, 'rb') as f:
+        header = f.read(4 + 4 + 18)
+    if len(header) < 26 or header[:4] != b'fLaC' or header[4] & 0x7F != 0:
+        return None
+    info = int.from_bytes(header[18:26], 'big')
+    rate = info >> 44
+    total_samples = info & ((1 << 36) - 1)
+    return total_samples / rate if rate and total_samples else None
+
+def get_audio_duration(audio_path):
     """
-    Convert any audio file to WAV format
-    
+    Get duration of audio file in seconds from its headers (WAV and FLAC
+    directly, anything else through ffprobe); the audio is only decoded
+    if no header gives it
+    """
+    try:
+        with wave.open(audio_path, 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError):
+        pass
+    duration = read_flac_duration(audio_path)
+    if duration is not None:
+        return duration
+    try:
+        # ffprobe only reads the headers
+        return float(mediainfo(audio_path)['duration'])
+    except (OSError, KeyError, ValueError):
+        return len(AudioSegment.from_file(audio_path)) / 1000.0
+
+def _place(cached_path, output_path):
+    """Make output_path a copy of cached_path (a hard link when possible)"""
+    if os.path.exists(output_path) and os.path.samefile(cached_path, output_path):
+        return
+    tmp_path = output_path + '.tmp'
+    try:
+        os.link(cached_path, tmp_path)
+    except OSError:
+        shutil.copyfile(cached_path, tmp_path)
+    os.replace(tmp_path, output_path)
+
+def convert_to_wav(input_path, output_path=None, cache_dir=CACHE_DIR):
+    """
+    Convert any audio file to 16 kHz mono WAV through the conversion cache
+
     Parameters:
     input_path (str): Path to input audio file
-    output_path (str): Path for output WAV file (optional)
-    
+    output_path (str): Path for output WAV file (optional; by default the
+                       cached WAV, or the input if it already is 16 kHz
+                       mono WAV, is returned)
+    cache_dir (str): Conversion cache folder
+
     Returns:
     str: Path to the converted WAV file
     """
@@ -16,67 +92,90 @@ def convert_to_wav(input_path, output_path=None):
         # Check if input file exists
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"Input file not found: {input_path}")
-        
-        # If output path is not specified, create one based on input file
-        if output_path is None:
-            output_path = os.path.splitext(input_path)[0] + '.wav'
-        
-        # Load audio file
-        audio = AudioSegment.from_file(input_path)
-        
-        # Export as WAV
-        audio.export(output_path, format='wav')
-        
-        print(f"Successfully converted {input_path} to {output_path}")
-        return output_path
-    
+
+        # Files already in the target format are used as they are, without hashing
+        if input_path.lower().endswith('.wav') and is_complete_wav(input_path):
+            wav_path, converted = input_path, False
+        else:
+            sha = source_hash(input_path)
+            wav_path = os.path.join(cache_dir, sha[:2], f"{sha}-{TARGET_FORMAT}.wav")
+            converted = not is_complete_wav(wav_path)
+        if converted:
+            os.makedirs(os.path.dirname(wav_path), exist_ok=True)
+            audio = AudioSegment.from_file(input_path).set_channels(1).set_frame_rate(TARGET_RATE).set_sample_width(2)
+            # Written under a unique name and renamed, so a crash never leaves a partial cache entry
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(wav_path))
+            os.close(fd)
+            try:
+                audio.export(tmp_path, format='wav')
+                os.replace(tmp_path, wav_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        if output_path is not None:
+            _place(wav_path, output_path)
+            wav_path = output_path
+
+        print(f"{'Converted' if converted else 'Reused'} {input_path} -> {wav_path}")
+        return wav_path
+
     except Exception as e:
         print(f"Error converting file: {str(e)}")
         return None
 
-def batch_convert_to_wav(input_folder, output_folder=None):
+def _convert_task(task):
+    return convert_to_wav(*task)
+
+def batch_convert_to_wav(input_folder, output_folder=None, cache_dir=CACHE_DIR, workers=None):
     """
-    Convert all audio files in a folder to WAV format
-    
+    Convert all audio files in a folder to 16 kHz mono WAV, in parallel.
+    Files whose content is already in the cache are not converted again.
+
     Parameters:
     input_folder (str): Path to folder containing audio files
     output_folder (str): Path to output folder for WAV files (optional)
+    cache_dir (str): Conversion cache folder
+    workers (int): Conversion processes (default: one per CPU)
+
+    Returns:
+    dict: {input path: WAV path}, for the files that converted
     """
     try:
         # Check if input folder exists
         if not os.path.exists(input_folder):
             raise FileNotFoundError(f"Input folder not found: {input_folder}")
-        
+
         # If output folder is not specified, create one based on input folder
         if output_folder is None:
             output_folder = os.path.join(input_folder, 'wav_converted')
-        
+
         # Create output folder if it doesn't exist
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder)
-        
-        # Process each file in the input folder
-        for filename in os.listdir(input_folder):
-            input_path = os.path.join(input_folder, filename)
-            
-            # Skip if it's a directory
-            if os.path.isdir(input_path):
-                continue
-            
-            # Create output path
-            output_path = os.path.join(output_folder, os.path.splitext(filename)[0] + '.wav')
-            
-            # Convert file
-            convert_to_wav(input_path, output_path)
-        
-        print(f"Batch conversion completed. WAV files saved in: {output_folder}")
-        
+        os.makedirs(output_folder, exist_ok=True)
+
+        tasks = [(os.path.join(input_folder, filename),
+                  os.path.join(output_folder, os.path.splitext(filename)[0] + '.wav'), cache_dir)
+                 for filename in sorted(os.listdir(input_folder))
+                 if not os.path.isdir(os.path.join(input_folder, filename))]
+
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outputs = list(executor.map(_convert_task, tasks))
+        else:
+            outputs = [_convert_task(task) for task in tasks]
+
+        converted = {task[0]: output for task, output in zip(tasks, outputs) if output}
+        print(f"Batch conversion completed: {len(converted)} files. WAV files saved in: {output_folder}")
+        return converted
+
     except Exception as e:
         print(f"Error during batch conversion: {str(e)}")
+        return {}
 
 # Example usage
 if __name__ == "__main__":
     # Convert a single file
     input_file = "kannada_audio.mp3"  # Replace with your audio file path
     converted_file = convert_to_wav(input_file)
-    
+
@@ -0,0 +1,118 @@
+"""
+Run many text queries against the chunk corpus in batches, streaming
+queries from a file and results to JSON lines.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import corpus
+import embedindex
+
+
+def read_queries(path):
+    """Yield query dicts from a text or JSON lines file, one line at a time"""
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                item = json.loads(line)
+                if "query" not in item:
+                    raise ValueError(f"JSON line without a \"query\" field: {line[:80]}")
+                yield item
+            else:
+                yield {"query": line}
+
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Function to search one batch of query dicts
+def search_batch(index, batch, top_k=5, with_text=True, store=None, json_file=None):
+    """
+    Returns (result dicts, encode seconds, score seconds). Texts come from
+    the corpus store, or json_file for chunks it does not have.
+    """
+    start = time.perf_counter()
+    embeddings = embedindex.encode([item["query"] for item in batch])
+    encoded = time.perf_counter()
+    # Rows are resolved through the view that scored them, even if a compaction swaps it meanwhile
+    view = index.view
+    found = index.search_embeddings(embeddings, top_k, view=view)
+    scored = time.perf_counter()
+
+    out = []
+    for item, results in zip(batch, found):
+        entry = dict(item)
+        entry["results"] = [{"path": view.audio_paths[row], "score": score} for row, score in results]
+        out.append(entry)
+    if with_text:
+        texts = corpus.lookup_texts({result["path"] for entry in out for result in entry["results"]},
+                                    'english', store, json_file)
+        for entry in out:
+            for result in entry["results"]:
+                result["text"] = texts.get(result["path"])
+    return out, encoded - start, scored - encoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('queries', help="Text file (one query per line) or JSON lines file")
+    parser.add_argument('--source', default=embedindex.DEFAULT_SOURCE_FILE, help="Transcripts the index is built from")
+    parser.add_argument('--index-dir', default=embedindex.DEFAULT_INDEX_DIR)
+    parser.add_argument('--output', default='batch_results.jsonl', help="JSON lines output ('-' for stdout)")
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--corpus', default=corpus.DEFAULT_CORPUS_FILE, help="Corpus store the texts are read from")
+    parser.add_argument('--no-text', action='store_true', help="Leave the transcripts out of the results")
+    parser.add_argument('--report-every', type=int, default=10, help="Batches between progress reports")
+    args = parser.parse_args()
+
+    index = embedindex.get_index(args.source, args.index_dir)
+    # Load the model before timing starts
+    embedindex.encode(["warm up"])
+
+    store = corpus.CorpusStore(args.corpus) if os.path.exists(args.corpus) else None
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    count = 0
+    encode_s = score_s = 0.0
+    started = time.perf_counter()
+    try:
+        for number, batch in enumerate(batches(read_queries(args.queries), args.batch_size), 1):
+            results, batch_encode_s, batch_score_s = search_batch(index, batch, args.top_k, not args.no_text,
+                                                                  store, args.source)
+            encode_s += batch_encode_s
+            score_s += batch_score_s
+            for result in results:
+                output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            count += len(batch)
+            if number % args.report_every == 0:
+                elapsed = time.perf_counter() - started
+                print(f"{count} queries, {count / elapsed:.1f} queries/s", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if store is not None:
+            store.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Searched {count} queries against {len(index)} chunks in {elapsed:.2f}s: "
+          f"{count / max(elapsed, 1e-9):.1f} queries/s (encode {encode_s:.2f}s, score {score_s:.2f}s)",
+          file=sys.stderr)
+    if output is not sys.stdout:
+        print(f"Results saved to: {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Recall@k vs. latency of the IVF search backend against the exact backend.
+
+Runs on a synthetic clustered corpus by default, or on a built transcript
+index with --index-dir.
+
+    python benchmarks/ann_report.py --rows 1000000 --nlist 4000
+    python benchmarks/ann_report.py --index-dir embedding_index --k 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import searchindex
+import embedindex
+
+
+# Function to generate normalised vectors grouped around random topics
+def synthetic_corpus(rows, dim, topics=256, noise=0.35, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    labels = rng.integers(0, topics, size=rows)
+    vectors = centers[labels] + noise * rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(truth, found):
+    hits = sum(len(set(t[t >= 0]) & set(f[f >= 0])) for t, f in zip(truth, found))
+    return hits / max(1, truth.size)
+
+
+def time_queries(backend, queries, k):
+    """Search one query at a time, as the Flask app does; returns (ids, latencies_ms)"""
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    latencies = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        found, _ = backend.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids[i, :found.shape[1]] = found[0]
+    return ids, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index-dir', help="Use the embeddings of a built transcript index")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--nlist', type=int, default=None)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.index_dir:
+        index = embedindex.EmbeddingIndex(args.index_dir)
+        view = index.view
+        embeddings = view.embeddings[np.flatnonzero(view.alive)]
+        rng = np.random.default_rng(1)
+        # Perturbed corpus rows stand in for real queries
+        queries = np.asarray(embeddings[rng.choice(len(embeddings), size=args.queries)], dtype=np.float32)
+        queries += 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    else:
+        corpus = synthetic_corpus(args.rows + args.queries, args.dim)
+        embeddings, queries = corpus[:args.rows], corpus[args.rows:]
+
+    print(f"Corpus: {len(embeddings)} x {embeddings.shape[1]}, {len(queries)} queries, k={args.k}")
+
+    exact = searchindex.create_backend('exact')
+    exact.build(embeddings)
+    truth, exact_ms = time_queries(exact, queries, args.k)
+
+    ivf = searchindex.create_backend('ivf', nlist=args.nlist)
+    start = time.perf_counter()
+    ivf.build(embeddings)
+    build_s = time.perf_counter() - start
+
+    report = {
+        "rows": len(embeddings),
+        "dim": int(embeddings.shape[1]),
+        "k": args.k,
+        "ivf_nlist": len(ivf.centroids),
+        "ivf_build_seconds": build_s,
+        "results": [{
+            "backend": "exact",
+            "recall": 1.0,
+            "p50_ms": float(np.percentile(exact_ms, 50)),
+            "p99_ms": float(np.percentile(exact_ms, 99)),
+        }],
+    }
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        found, ivf_ms = time_queries(ivf, queries, args.k)
+        report["results"].append({
+            "backend": f"ivf nprobe={nprobe}",
+            "recall": recall_at_k(truth, found),
+            "p50_ms": float(np.percentile(ivf_ms, 50)),
+            "p99_ms": float(np.percentile(ivf_ms, 99)),
+        })
+
+    print(f"IVF: nlist={report['ivf_nlist']}, build {build_s:.1f}s")
+    print(f"{'backend':<20}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for row in report["results"]:
+        print(f"{row['backend']:<20}{row['recall']:>10.3f}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+        print(f"Report saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
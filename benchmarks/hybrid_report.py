@@ -0,0 +1,146 @@
+"""
+Latency and retrieval quality of lexical-only, dense-only and hybrid search.
+
+Every mode gets the same Kannada query text, as app.py does with the
+recognised speech: 'lexical' is BM25 over output.json, 'dense' encodes the
+query and searches the English transcript embeddings, and 'hybrid' scores
+the BM25 candidates densely and fuses the scores (lexicalindex.hybrid_search).
+
+Without --queries, queries are spans of --span-words consecutive words cut
+from randomly chosen transcripts, and the chunk they were cut from is the
+relevant result. A --queries file has one JSON object per line:
+{"query": "...", "relevant": ["chunk.wav", ...]}.
+
+Reported per mode: recall@k (a relevant chunk is in the top k), MRR@k and
+p50/p99 latency per query, including the query encode for dense and hybrid.
+
+    python benchmarks/hybrid_report.py --k 5 --output hybrid_report.json
+    python benchmarks/hybrid_report.py --encoder synthetic --span-words 2
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import embedindex
+import lexicalindex
+
+
+def generated_queries(data, count, span_words, seed=0):
+    rng = random.Random(seed)
+    candidates = [(path, text.split()) for path, text in data.items() if len(text.split()) >= span_words]
+    queries = []
+    for path, words in rng.sample(candidates, min(count, len(candidates))):
+        start = rng.randrange(len(words) - span_words + 1)
+        queries.append({"query": ' '.join(words[start:start + span_words]), "relevant": [path]})
+    return queries
+
+
+def load_queries(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def evaluate(search, queries, k):
+    """Run search(query) -> [chunk path, ...] over the queries; recall@k, MRR@k and latency"""
+    latencies, hits, reciprocal_ranks = [], 0, 0.0
+    for item in queries:
+        start = time.perf_counter()
+        found = search(item["query"])[:k]
+        latencies.append((time.perf_counter() - start) * 1000)
+        relevant = set(item["relevant"])
+        rank = next((i for i, path in enumerate(found) if path in relevant), None)
+        if rank is not None:
+            hits += 1
+            reciprocal_ranks += 1 / (rank + 1)
+    return {
+        "recall": hits / max(1, len(queries)),
+        "mrr": reciprocal_ranks / max(1, len(queries)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(np.mean(latencies)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kannada', default=lexicalindex.DEFAULT_SOURCE_FILE, help="Kannada transcripts")
+    parser.add_argument('--english', default=embedindex.DEFAULT_SOURCE_FILE, help="English transcripts")
+    parser.add_argument('--index-dir', default=None, help="Embedding index (default: the app's, or a temp dir with --encoder synthetic)")
+    parser.add_argument('--queries', default=None, help="JSONL file of labelled queries")
+    parser.add_argument('--num-queries', type=int, default=200)
+    parser.add_argument('--span-words', type=int, default=3)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--candidates', type=int, default=lexicalindex.HYBRID_CANDIDATES)
+    parser.add_argument('--weight', type=float, default=lexicalindex.HYBRID_WEIGHT, help="BM25 weight in the fused score")
+    parser.add_argument('--encoder', choices=['auto', 'model', 'synthetic'], default='auto')
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.encoder == 'auto':
+        try:
+            import sentence_transformers  # noqa: F401
+            args.encoder = 'model'
+        except ImportError:
+            args.encoder = 'synthetic'
+    index_dir = args.index_dir
+    if args.encoder == 'synthetic':
+        from suite import use_synthetic_encoder
+        use_synthetic_encoder()
+        # Never let synthetic embeddings land in the app's index
+        index_dir = index_dir or tempfile.mkdtemp(prefix='hybrid_report_')
+    index_dir = index_dir or embedindex.DEFAULT_INDEX_DIR
+
+    with open(args.kannada, 'r', encoding='utf-8') as file:
+        kannada = json.load(file)
+    queries = load_queries(args.queries) if args.queries else generated_queries(kannada, args.num_queries, args.span_words)
+
+    start = time.perf_counter()
+    index = embedindex.get_index(args.english, index_dir)
+    dense_load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    lexical = lexicalindex.LexicalIndex.build(kannada)
+    lexical_build_s = time.perf_counter() - start
+    print(f"Corpus: {len(lexical)} Kannada / {len(index)} embedded transcripts, {len(lexical.vocabulary)} terms, "
+          f"{len(queries)} queries, k={args.k}, encoder={args.encoder}")
+
+    modes = {
+        'lexical': lambda query: [path for path, _ in lexical.search(query, args.k)],
+        'dense': lambda query: [path for path, _ in index.search_embedding(embedindex.encode(query), args.k)],
+        'hybrid': lambda query: [path for path, _ in lexicalindex.hybrid_search(
+            lexical, index, query, embedindex.encode(query), args.k, args.candidates, args.weight)],
+    }
+    # Warm up the encoder so model loading is not counted
+    embedindex.encode(queries[0]["query"] if queries else '')
+
+    report = {
+        "kannada": args.kannada,
+        "english": args.english,
+        "encoder": args.encoder,
+        "queries": len(queries),
+        "generated_span_words": None if args.queries else args.span_words,
+        "k": args.k,
+        "candidates": args.candidates,
+        "weight": args.weight,
+        "lexical_build_seconds": lexical_build_s,
+        "dense_load_seconds": dense_load_s,
+        "results": {mode: evaluate(search, queries, args.k) for mode, search in modes.items()},
+    }
+
+    print(f"{'mode':<10}{'recall@' + str(args.k):>10}{'MRR':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, row in report["results"].items():
+        print(f"{mode:<10}{row['recall']:>10.3f}{row['mrr']:>8.3f}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+        print(f"Report saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Recall@k loss and memory of float16 / int8 embedding storage against float32.
+
+Encodes the transcripts in --source (translated_output.json by default) and
+a set of queries, stores the embeddings at each precision the index
+supports (searchindex.quantize) and compares the exact top-k found on the
+quantized matrix with the float32 top-k. Queries are --queries (one per
+line) or spans of --query-words words cut from random transcripts.
+
+Reported per dtype: recall@k against float32, the largest score error,
+bytes per row and for the whole matrix, and p50 latency of a one-query
+scan and of a batched scan.
+
+    python benchmarks/quantization_report.py --k 5 --output quantization_report.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import searchindex
+import embedindex
+
+
+def span_queries(texts, count, words, seed=0):
+    rng = random.Random(seed)
+    candidates = [text.split() for text in texts if len(text.split()) >= words]
+    queries = []
+    for split in rng.sample(candidates, min(count, len(candidates))):
+        start = rng.randrange(len(split) - words + 1)
+        queries.append(' '.join(split[start:start + words]))
+    return queries
+
+
+def recall_at_k(truth, found):
+    hits = sum(len(set(t[t >= 0]) & set(f[f >= 0])) for t, f in zip(truth, found))
+    return hits / max(1, truth.size)
+
+
+def p50_ms(fn, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(latencies, 50))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=embedindex.DEFAULT_SOURCE_FILE, help="English transcripts")
+    parser.add_argument('--queries', default=None, help="Text file with one query per line")
+    parser.add_argument('--num-queries', type=int, default=500)
+    parser.add_argument('--query-words', type=int, default=5)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=50, help="Timed scans per dtype")
+    parser.add_argument('--encoder', choices=['auto', 'model', 'synthetic'], default='auto')
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.encoder == 'auto':
+        try:
+            import sentence_transformers  # noqa: F401
+            args.encoder = 'model'
+        except ImportError:
+            args.encoder = 'synthetic'
+    if args.encoder == 'synthetic':
+        from suite import use_synthetic_encoder
+        use_synthetic_encoder()
+
+    with open(args.source, 'r', encoding='utf-8') as file:
+        texts = list(json.load(file).values())
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as file:
+            queries = [line.strip() for line in file if line.strip()]
+    else:
+        queries = span_queries(texts, args.num_queries, args.query_words)
+
+    embeddings = embedindex.encode(texts)
+    query_embeddings = embedindex.encode(queries)
+    print(f"Corpus: {embeddings.shape[0]} x {embeddings.shape[1]} from {args.source}, "
+          f"{len(queries)} queries, k={args.k}, encoder={args.encoder}")
+
+    exact = searchindex.create_backend('exact')
+    exact.build(embeddings)
+    truth, _ = exact.search(query_embeddings, args.k)
+    full_scores = query_embeddings @ embeddings.T
+
+    report = {"source": args.source, "encoder": args.encoder, "rows": int(embeddings.shape[0]),
+              "dim": int(embeddings.shape[1]), "queries": len(queries), "k": args.k, "results": []}
+    for dtype in searchindex.DTYPES:
+        codes, scales = searchindex.quantize(embeddings, dtype)
+        matrix = codes if dtype == 'float32' else searchindex.QuantizedMatrix(codes, scales)
+        backend = searchindex.create_backend('exact')
+        backend.build(matrix)
+        found, _ = backend.search(query_embeddings, args.k)
+        scores = searchindex.inner_products(matrix, query_embeddings)
+        report["results"].append({
+            "dtype": dtype,
+            "recall": recall_at_k(truth, found),
+            "max_score_error": float(np.abs(scores - full_scores).max()),
+            "bytes_per_row": matrix.nbytes / max(1, len(matrix)),
+            "matrix_mb": matrix.nbytes / 1e6,
+            "single_p50_ms": p50_ms(lambda: backend.search(query_embeddings[0], args.k), args.repeats),
+            "batch_p50_ms": p50_ms(lambda: backend.search(query_embeddings, args.k), max(1, args.repeats // 10)),
+        })
+
+    print(f"{'dtype':<10}{'recall@' + str(args.k):>10}{'max err':>10}{'B/row':>8}{'MB':>9}"
+          f"{'1q p50 ms':>11}{'batch p50 ms':>14}")
+    for row in report["results"]:
+        print(f"{row['dtype']:<10}{row['recall']:>10.4f}{row['max_score_error']:>10.4f}{row['bytes_per_row']:>8.0f}"
+              f"{row['matrix_mb']:>9.2f}{row['single_p50_ms']:>11.3f}{row['batch_p50_ms']:>14.2f}")
+    rows_1m = {row['dtype']: row['bytes_per_row'] * 1e6 / 1e9 for row in report["results"]}
+    print("At 1M rows: " + ', '.join(f"{dtype} {gb:.2f} GB" for dtype, gb in rows_1m.items()))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+        print(f"Report saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
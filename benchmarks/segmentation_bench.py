@@ -0,0 +1,113 @@
+"""
+Equivalence check and speed benchmark of segmentation.py against
+pydub.silence.split_on_silence.
+
+The check runs randomised speech-like signals (several rates, mono and
+stereo, thresholds, seek steps and keep_silence values) through both and
+requires identical silent/non-silent ranges and identical chunk audio.
+pydub pads a chunk that ends past the data with up to 2 ms of silence;
+that padding is the only difference tolerated.
+
+The benchmark times the vectorised path on --hours of synthetic audio and
+pydub on --pydub-seconds of it (pydub is far too slow for an hour), then
+extrapolates pydub linearly.
+
+    python benchmarks/segmentation_bench.py --trials 50 --hours 1
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import segmentation
+from pydub import AudioSegment
+from pydub import silence
+
+
+# Function to generate speech-like audio: bursts of loud noise separated by quiet gaps
+def synthetic_speech(seconds, rate=16000, channels=1, seed=0):
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    envelope = np.empty(n, dtype=np.float32)
+    position = 0
+    while position < n:
+        loud = rng.random() < 0.6
+        length = int(rate * (rng.uniform(0.3, 3.0) if loud else rng.uniform(0.1, 1.5)))
+        envelope[position:position + length] = rng.uniform(2000, 12000) if loud else rng.uniform(10, 200)
+        position += length
+    noise = rng.standard_normal((n, channels)).astype(np.float32)
+    return np.clip(noise * envelope[:, None], -32768, 32767).astype(np.int16)
+
+
+def to_segment(samples, rate):
+    return AudioSegment(samples.tobytes(), frame_rate=rate, sample_width=2, channels=samples.shape[1])
+
+
+def check_equivalence(trials, seed=0):
+    rng = np.random.default_rng(seed)
+    failures = 0
+    for trial in range(trials):
+        rate = int(rng.choice([8000, 16000, 22050, 44100]))
+        channels = int(rng.choice([1, 2]))
+        samples = synthetic_speech(rng.uniform(0.5, 10), rate, channels, seed=trial)
+        sound = to_segment(samples, rate)
+        min_silence_len = int(rng.choice([100, 300, 700, 1000]))
+        silence_thresh = sound.dBFS - float(rng.choice([6, 14, 20]))
+        keep_silence = int(rng.choice([0, 100, 500]))
+        seek_step = int(rng.choice([1, 1, 5]))
+
+        expected_ranges = silence.detect_nonsilent(sound, min_silence_len, silence_thresh, seek_step)
+        ranges = segmentation.detect_nonsilent(samples, rate, min_silence_len, silence_thresh, seek_step)
+        expected = silence.split_on_silence(sound, min_silence_len, silence_thresh, keep_silence, seek_step)
+        offsets = segmentation.split_on_silence(samples, rate, min_silence_len, silence_thresh, keep_silence, seek_step)
+
+        same = ranges == expected_ranges and len(expected) == len(offsets)
+        for chunk, (start, end) in zip(expected, offsets):
+            data = samples[start:end].tobytes()
+            padding = chunk.raw_data[len(data):]
+            same = same and chunk.raw_data.startswith(data) and not padding.strip(b'\0') \
+                and len(padding) <= chunk.frame_count(ms=2) * chunk.frame_width
+        if not same:
+            failures += 1
+            print(f"Mismatch in trial {trial}: rate={rate} channels={channels} min_silence_len={min_silence_len} "
+                  f"seek_step={seek_step} keep_silence={keep_silence}")
+    print(f"Equivalence: {trials - failures}/{trials} trials identical to pydub")
+    return failures == 0
+
+
+def benchmark(hours, pydub_seconds, rate=16000):
+    samples = synthetic_speech(hours * 3600, rate)
+    threshold = segmentation.dbfs(samples) - 14
+
+    start = time.perf_counter()
+    offsets = segmentation.split_on_silence(samples, rate, min_silence_len=700, silence_thresh=threshold, keep_silence=500)
+    vectorised = time.perf_counter() - start
+    print(f"segmentation.split_on_silence: {hours:g} h in {vectorised:.2f}s ({len(offsets)} chunks)")
+
+    clip = samples[:int(pydub_seconds * rate)]
+    sound = to_segment(clip, rate)
+    start = time.perf_counter()
+    chunks = silence.split_on_silence(sound, min_silence_len=700, silence_thresh=threshold, keep_silence=500)
+    reference = time.perf_counter() - start
+    extrapolated = reference * hours * 3600 / pydub_seconds
+    print(f"pydub split_on_silence: {pydub_seconds:g} s in {reference:.2f}s ({len(chunks)} chunks), "
+          f"~{extrapolated:.0f}s extrapolated to {hours:g} h")
+    print(f"Speed-up: ~{extrapolated / vectorised:.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trials', type=int, default=50)
+    parser.add_argument('--hours', type=float, default=1.0)
+    parser.add_argument('--pydub-seconds', type=float, default=60.0)
+    args = parser.parse_args()
+
+    ok = check_equivalence(args.trials)
+    benchmark(args.hours, args.pydub_seconds)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
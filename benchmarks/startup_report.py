@@ -0,0 +1,147 @@
+"""
+Worker start-up cost: `import app` time and time to the first answered query.
+
+Each run is a fresh Python process started in a work directory holding
+copies of translated_output.json and output.json, with the embedding and
+lexical indexes already built, so loading is measured rather than
+building. A run:
+
+    1. imports app (timed inside the process),
+    2. polls /readyz until it stops answering 503, as a load balancer
+       would (trees without /readyz count as ready at once),
+    3. sends one query to /api/search-batch through the test client.
+
+Reported medians: import ms, spawn-to-ready ms, first query ms and
+spawn-to-first-answer ms. --baseline REV measures an earlier commit the
+same way (exported with git archive) for a before/after table.
+
+    python benchmarks/startup_report.py --runs 5 --baseline HEAD~1
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.join(ROOT, 'benchmarks')
+sys.path.insert(0, ROOT)
+
+# Runs in the child; options come in as JSON on argv
+CHILD = r'''
+import sys, json, time
+options = json.loads(sys.argv[1])
+sys.path[:0] = [options["tree"], options["benchmarks"]]
+if options["encoder"] == "synthetic":
+    from suite import use_synthetic_encoder
+    use_synthetic_encoder()
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+while client.get("/readyz").status_code == 503:
+    time.sleep(0.01)
+ready = time.perf_counter()
+response = client.post("/api/search-batch", json={"queries": [options["query"]], "topK": 5})
+answered = time.perf_counter()
+print("RESULT " + json.dumps({"import_ms": (imported - start) * 1000, "ready_ms": (ready - start) * 1000,
+                  "query_ms": (answered - ready) * 1000, "status": response.status_code}), flush=True)
+'''
+
+
+def export_tree(rev, folder):
+    """Write the files of commit rev into folder"""
+    archive = subprocess.run(['git', 'archive', rev], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', folder], input=archive, check=True)
+    return folder
+
+
+def prepare_workdir(folder, encoder):
+    """Copy the transcripts into folder and build both indexes there"""
+    for name in ('translated_output.json', 'output.json'):
+        shutil.copy(os.path.join(ROOT, name), folder)
+    if encoder == 'synthetic':
+        sys.path.insert(0, BENCHMARKS)
+        from suite import use_synthetic_encoder
+        use_synthetic_encoder()
+    import embedindex
+    import lexicalindex
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        embedindex.build_index('translated_output.json', embedindex.DEFAULT_INDEX_DIR)
+        lexicalindex.build_lexical_index('output.json', lexicalindex.DEFAULT_INDEX_FILE)
+    finally:
+        os.chdir(cwd)
+
+
+def measure(tree, workdir, encoder, query, runs):
+    # The tree's own benchmarks/suite.py, which puts that tree (not this one) first on sys.path
+    options = json.dumps({"tree": tree, "benchmarks": os.path.join(tree, 'benchmarks'), "encoder": encoder,
+                          "query": query})
+    samples = []
+    for _ in range(runs):
+        spawned = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', CHILD, options], cwd=workdir, capture_output=True,
+                                text=True)
+        finished = time.perf_counter()
+        if result.returncode != 0:
+            raise RuntimeError(f"Start-up run failed:\n{result.stderr[-2000:]}")
+        line = next(line for line in result.stdout.splitlines() if line.startswith('RESULT '))
+        sample = json.loads(line[len('RESULT '):])
+        # The child's clock starts after interpreter start-up; process_ms is the whole run as seen from here
+        sample["total_ms"] = sample["ready_ms"] + sample["query_ms"]
+        sample["process_ms"] = (finished - spawned) * 1000
+        samples.append(sample)
+    summary = {key: float(np.median([sample[key] for sample in samples]))
+               for key in ('import_ms', 'ready_ms', 'query_ms', 'total_ms', 'process_ms')}
+    summary["status"] = samples[-1]["status"]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--baseline', default=None, help="Commit to compare against, e.g. HEAD~1")
+    parser.add_argument('--query', default="coconut tree disease")
+    parser.add_argument('--encoder', choices=['auto', 'model', 'synthetic'], default='auto')
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.encoder == 'auto':
+        try:
+            import sentence_transformers  # noqa: F401
+            args.encoder = 'model'
+        except ImportError:
+            args.encoder = 'synthetic'
+
+    report = {"encoder": args.encoder, "runs": args.runs, "results": {}}
+    with tempfile.TemporaryDirectory(prefix='startup_report_') as tmp:
+        workdir = os.path.join(tmp, 'work')
+        os.makedirs(workdir)
+        prepare_workdir(workdir, args.encoder)
+        trees = {"current": ROOT}
+        if args.baseline:
+            baseline = os.path.join(tmp, 'baseline')
+            os.makedirs(baseline)
+            trees = {args.baseline: export_tree(args.baseline, baseline), **trees}
+        for name, tree in trees.items():
+            print(f"Measuring {name} ({args.runs} runs)...")
+            report["results"][name] = measure(tree, workdir, args.encoder, args.query, args.runs)
+
+    print(f"{'tree':<12}{'import ms':>11}{'ready ms':>10}{'query ms':>10}{'to answer ms':>14}{'process ms':>12}")
+    for name, row in report["results"].items():
+        print(f"{name:<12}{row['import_ms']:>11.0f}{row['ready_ms']:>10.0f}{row['query_ms']:>10.1f}"
+              f"{row['total_ms']:>14.0f}{row['process_ms']:>12.0f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+        print(f"Report saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
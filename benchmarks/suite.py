@@ -0,0 +1,375 @@
+"""
+Benchmark suite covering every ingest and query stage on synthetic data.
+
+For each corpus size (--sizes, in chunks) it generates speech-like WAVs
+and Kannada/English transcript corpora, then times:
+
+    split          audiochunk.split_audio and split_audio_streaming, per file
+    segmentation   segmentation.split_on_silence, per file
+    transcribe     AudioTranscriber.transcribe_audio with the stub recognizer, per chunk
+    translate      TranslationStage with the stub translator, per batch
+    index_build    embedindex.build_index over the whole English corpus
+    query          app.get_relevant_audio_files (dense), per query (distinct and repeated)
+
+Text stages run over the full corpus at every size. Audio stages run once,
+over --audio-files recordings and --transcribe-chunks chunks, because
+their latencies are per file or per chunk and do not depend on the corpus
+size (and writing a million WAVs would measure the disk, not the code).
+
+Every stage runs in a fresh process so its peak RSS is its own. Results
+(p50/p99/mean latency, throughput, peak RSS) are written as JSON together
+with the git commit, and --compare prints the change against an earlier
+results file.
+
+Without sentence-transformers (or with --encoder synthetic) texts are
+embedded by a fixed random projection of their words, so index and query
+timings exclude the model but keep its output shape.
+
+    python benchmarks/suite.py --sizes 1000 100000 --output bench_results.json
+    python benchmarks/suite.py --sizes 1000 --compare bench_results.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import wave
+import random
+import zlib
+import platform
+import argparse
+import contextlib
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from segmentation_bench import synthetic_speech
+
+EMBEDDING_DIM = 384
+WORDS = 5000
+TOPICS = 64
+
+
+def summarize(latencies_ms, items=None):
+    """p50/p99/mean of per-item latencies plus overall throughput"""
+    latencies = np.asarray(latencies_ms, dtype=np.float64)
+    if latencies.size == 0:
+        return {"count": 0}
+    total = float(latencies.sum()) / 1000
+    return {
+        "count": int(latencies.size),
+        "items": int(items if items is not None else latencies.size),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "total_s": total,
+        "items_per_s": (items if items is not None else latencies.size) / total if total > 0 else None,
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+# Function to make pseudo words for both languages from one vocabulary
+def vocabulary(seed=0):
+    rng = random.Random(seed)
+    latin = 'abcdefghijklmnopqrstuvwxyz'
+    kannada = [chr(c) for c in range(0x0C85, 0x0CB9)]
+    english = [''.join(rng.choice(latin) for _ in range(rng.randint(3, 9))) for _ in range(WORDS)]
+    kannada_words = [''.join(rng.choice(kannada) for _ in range(rng.randint(2, 6))) for _ in range(WORDS)]
+    return english, kannada_words
+
+
+# Function to write {chunk path: text} corpora whose texts cluster around topics
+def make_corpora(folder, chunks, seed=0):
+    english, kannada = vocabulary(seed)
+    rng = np.random.default_rng(seed)
+    topic_words = rng.integers(0, WORDS, size=(TOPICS, 40))
+    topics = rng.integers(0, TOPICS, size=chunks)
+    lengths = rng.integers(15, 45, size=chunks)
+    english_data, kannada_data = {}, {}
+    for i in range(chunks):
+        # Two thirds of the words come from the chunk's topic, the rest from anywhere
+        on_topic = topic_words[topics[i], rng.integers(0, 40, size=lengths[i])]
+        anywhere = rng.integers(0, WORDS, size=lengths[i])
+        ids = np.where(rng.random(lengths[i]) < 0.67, on_topic, anywhere)
+        path = f"synthetic_{i // 100}_chunk_{i % 100 + 1}.wav"
+        english_data[path] = ' '.join(english[j] for j in ids)
+        kannada_data[path] = ' '.join(kannada[j] for j in ids)
+
+    paths = {}
+    for name, data in (('output.json', kannada_data), ('translated_output.json', english_data)):
+        paths[name] = os.path.join(folder, name)
+        with open(paths[name], 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+    queries = [' '.join(english[j] for j in rng.choice(topic_words[t], size=4)) for t in rng.integers(0, TOPICS, 200)]
+    return paths, queries
+
+
+def make_recordings(folder, count, seconds, rate=16000):
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        samples = synthetic_speech(seconds, rate, seed=i)
+        with wave.open(os.path.join(folder, f"recording_{i + 1}.wav"), 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(samples.tobytes())
+
+
+def use_synthetic_encoder():
+    """Replace the sentence-transformers model with a word-hash random projection"""
+    import embedindex
+    table = np.random.default_rng(1).standard_normal((1 << 16, EMBEDDING_DIM), dtype=np.float32)
+
+    def encode(texts):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        out = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for i, text in enumerate(texts):
+            ids = [zlib.crc32(word.encode('utf-8')) & 0xFFFF for word in text.split()]
+            if ids:
+                out[i] = table[ids].sum(axis=0)
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+    embedindex.encode = encode
+
+
+def setup_encoder(encoder):
+    if encoder == 'synthetic':
+        use_synthetic_encoder()
+
+
+# Stage functions; each runs in its own process and returns its summary
+
+def stage_split(recordings, workdir, chunk_ms):
+    import audiochunk
+    files = sorted(os.path.join(recordings, name) for name in os.listdir(recordings))
+    result = {}
+    for mode, split in (('pydub', audiochunk.split_audio), ('streaming', audiochunk.split_audio_streaming)):
+        latencies, chunks = [], 0
+        for file_path in files:
+            start = time.perf_counter()
+            chunks += split(file_path, chunk_ms, os.path.join(workdir, f'chunks_{mode}'))["chunks"]
+            latencies.append((time.perf_counter() - start) * 1000)
+        result[mode] = summarize(latencies)
+        result[mode]["chunks"] = chunks
+    return result
+
+
+def stage_segmentation(recordings):
+    import segmentation
+    latencies, chunks = [], 0
+    for name in sorted(os.listdir(recordings)):
+        with wave.open(os.path.join(recordings, name), 'rb') as wav:
+            rate = wav.getframerate()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        start = time.perf_counter()
+        offsets = segmentation.split_on_silence(samples, rate, min_silence_len=700,
+                                                silence_thresh=segmentation.dbfs(samples) - 14, keep_silence=500)
+        latencies.append((time.perf_counter() - start) * 1000)
+        chunks += len(offsets)
+    result = summarize(latencies)
+    result["chunks"] = chunks
+    return result
+
+
+def stage_transcribe(chunk_folder, count):
+    import recognizers
+    from convertaudio import AudioTranscriber
+    transcriber = AudioTranscriber(backend=recognizers.create_backend('stub', latency=0.0))
+    chunks = sorted(os.path.join(chunk_folder, name) for name in os.listdir(chunk_folder))
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        transcriber.transcribe_audio(chunks[i % len(chunks)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+
+def stage_translate(kannada_file, batch_size):
+    import translators
+    from engtranslate import TranslationStage
+    with open(kannada_file, 'r', encoding='utf-8') as file:
+        texts = list(json.load(file).values())
+    stage = TranslationStage(backend=translators.create_backend('stub', latency=0.0), batch_size=batch_size, workers=1)
+    latencies = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        begin = time.perf_counter()
+        stage._translate_batch(batch)
+        latencies.append((time.perf_counter() - begin) * 1000)
+    result = summarize(latencies, items=len(texts))
+    result["batch_size"] = batch_size
+    return result
+
+
+def stage_index_build(workdir, english_file, encoder):
+    setup_encoder(encoder)
+    import embedindex
+    os.chdir(workdir)
+    start = time.perf_counter()
+    embedindex.build_index(english_file, embedindex.DEFAULT_INDEX_DIR)
+    elapsed = time.perf_counter() - start
+    result = summarize([elapsed * 1000], items=len(embedindex.EmbeddingIndex(embedindex.DEFAULT_INDEX_DIR)))
+    result["index_bytes"] = sum(os.path.getsize(os.path.join(embedindex.DEFAULT_INDEX_DIR, name))
+                                for name in os.listdir(embedindex.DEFAULT_INDEX_DIR))
+    return result
+
+
+def stage_query(workdir, english_file, queries, repeats, encoder):
+    setup_encoder(encoder)
+    os.chdir(workdir)
+    # The index load is measured below, not by a warm-up thread
+    os.environ['WARMUP'] = '0'
+    import app
+    start = time.perf_counter()
+    app.get_relevant_audio_files(queries[0], json_file_path=english_file, mode='dense')
+    load_ms = (time.perf_counter() - start) * 1000
+
+    result = {"index_load_ms": load_ms}
+    for mode, query_list in (('distinct', queries), ('repeated', queries[:10] * repeats)):
+        latencies = []
+        for query in query_list:
+            begin = time.perf_counter()
+            app.get_relevant_audio_files(query, json_file_path=english_file, mode='dense')
+            latencies.append((time.perf_counter() - begin) * 1000)
+        result[mode] = summarize(latencies)
+    return result
+
+
+def _in_child(fn, args):
+    # The stages' own progress prints would drown the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_stage(name, fn, *args):
+    """Run one stage in a fresh spawned process so peak RSS is per stage"""
+    print(f"  {name}...", flush=True)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        started = time.perf_counter()
+        result = executor.submit(_in_child, fn, args).result()
+    result["wall_s"] = time.perf_counter() - started
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_audio(args, recordings, workdir):
+    print("Audio stages", flush=True)
+    results = {}
+    results["split"] = run_stage('split', stage_split, recordings, workdir, args.chunk_ms)
+    results["segmentation"] = run_stage('segmentation', stage_segmentation, recordings)
+    results["transcribe"] = run_stage('transcribe', stage_transcribe, os.path.join(workdir, 'chunks_streaming'),
+                                      args.transcribe_chunks)
+    return results
+
+
+def benchmark_size(chunks, args, workdir):
+    folder = os.path.join(workdir, f"corpus_{chunks}")
+    os.makedirs(folder, exist_ok=True)
+    print(f"Corpus of {chunks} chunks", flush=True)
+    paths, queries = make_corpora(folder, chunks)
+    english_file = paths['translated_output.json']
+    results = {}
+    results["translate"] = run_stage('translate', stage_translate, paths['output.json'], args.translate_batch)
+    results["index_build"] = run_stage('index_build', stage_index_build, folder, english_file, args.encoder)
+    results["query"] = run_stage('query', stage_query, folder, english_file, queries, args.repeats, args.encoder)
+    return results
+
+
+def flatten(results, prefix=''):
+    """{'size/stage/metric': value} for the p50/p99 latencies and peak RSS"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}/"))
+        elif key in ('p50_ms', 'p99_ms', 'peak_rss_mb'):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(current, baseline_file):
+    with open(baseline_file, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    print(f"\nChange against {baseline_file} (commit {baseline.get('commit')}):")
+    for key in sorted(set(old) & set(new)):
+        if old[key]:
+            print(f"  {key:<45} {old[key]:10.2f} -> {new[key]:10.2f}  ({(new[key] / old[key] - 1) * 100:+6.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000], help="Corpus sizes in chunks, e.g. 1000 100000 1000000")
+    parser.add_argument('--audio-files', type=int, default=8, help="Synthetic recordings for the audio stages (0 skips them)")
+    parser.add_argument('--audio-seconds', type=float, default=120.0)
+    parser.add_argument('--chunk-ms', type=int, default=30000)
+    parser.add_argument('--transcribe-chunks', type=int, default=200)
+    parser.add_argument('--translate-batch', type=int, default=16)
+    parser.add_argument('--repeats', type=int, default=20, help="Passes over the repeated (cacheable) queries")
+    parser.add_argument('--encoder', choices=['auto', 'model', 'synthetic'], default='auto')
+    parser.add_argument('--workdir', default=None, help="Keep generated data here instead of a temp dir")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    if args.encoder == 'auto':
+        try:
+            import sentence_transformers  # noqa: F401
+            args.encoder = 'model'
+        except ImportError:
+            args.encoder = 'synthetic'
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "encoder": args.encoder,
+        "config": {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'workdir')},
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        if args.audio_files:
+            recordings = os.path.join(workdir, 'recordings')
+            make_recordings(recordings, args.audio_files, args.audio_seconds)
+            report["results"]["audio"] = benchmark_audio(args, recordings, workdir)
+        for chunks in args.sizes:
+            report["results"][str(chunks)] = benchmark_size(chunks, args, workdir)
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+
+    for size, stages in report["results"].items():
+        print(f"\n{size}" if size == 'audio' else f"\n{size} chunks")
+        for key, value in sorted(flatten(stages).items()):
+            print(f"  {key:<40} {value:10.2f}")
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Offline throughput of AudioTranscriber.transcribe_folder against the stub
+recognizer backend, for several worker counts.
+
+    python benchmarks/transcribe_bench.py --files 200 --latency 0.3 --workers 1 4 8 16
+"""
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recognizers
+from convertaudio import AudioTranscriber
+
+
+# Function to write short synthetic 16 kHz mono WAV files
+def make_wav_folder(folder, count, seconds=2.0, rate=16000, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        samples = (rng.standard_normal(int(seconds * rate)) * 2000).astype(np.int16)
+        with wave.open(os.path.join(folder, f"synthetic_chunk_{i + 1}.wav"), 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(samples.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.3, help="Stub recognizer latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=None, help="Stub backend requests per second")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        folder = os.path.join(workdir, 'chunks')
+        os.makedirs(folder)
+        make_wav_folder(folder, args.files)
+        output_file = os.path.join(workdir, 'transcriptions.json')
+        baseline = None
+        for workers in args.workers:
+            backend = recognizers.create_backend('stub', latency=args.latency, jitter=args.jitter,
+                                                 failure_rate=args.failure_rate, rate_limit=args.rate_limit)
+            transcriber = AudioTranscriber(backend=backend, workers=workers, retry_delay=0.05)
+            start = time.perf_counter()
+            transcriptions = transcriber.transcribe_folder(folder, output_file) or {}
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            with open(output_file, 'r', encoding='utf-8') as file:
+                ordered = list(json.load(file)) == sorted(transcriptions)
+            print(f"workers={workers:<3} {elapsed:7.2f}s  {args.files / elapsed:7.1f} files/s  "
+                  f"speedup {baseline / elapsed:5.1f}x  transcribed {len(transcriptions)}  calls {backend.calls}  "
+                  f"sorted output {ordered}")
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,47 @@
 import speech_recognition as sr
 import os
 import json
+import numpy as np
 from pydub import AudioSegment
-from pydub.silence import split_on_silence
-import wave
-import contextlib
+import segmentation
+import wavcache
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+import recognizers
+from transcriptjournal import TranscriptionJournal, journal_path_for
 
 class AudioTranscriber:
-    def __init__(self):
+    def __init__(self, backend=None, workers=1, retries=3, retry_delay=1.0, wav_cache_dir=wavcache.DEFAULT_CACHE_DIR):
+        """
+        backend: recognizer backend from recognizers.create_backend (Google by default)
+        workers: number of files transcribed concurrently by transcribe_folder
+        retries/retry_delay: exponential backoff on sr.RequestError
+        wav_cache_dir: where converted 16 kHz mono WAVs are kept (see wavcache)
+        """
         self.recognizer = sr.Recognizer()
+        self.backend = backend or recognizers.create_backend('google', language='kn-IN')
+        self.workers = workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.wav_cache_dir = wav_cache_dir
+
+    def recognize(self, audio):
+        """Recognize through the backend with rate limiting and retries"""
+        return recognizers.recognize_with_retry(self.backend, audio, retries=self.retries, base_delay=self.retry_delay)
         
     def get_audio_duration(self, audio_path):
-        """Get duration of audio file in seconds"""
-        with contextlib.closing(wave.open(audio_path, 'r')) as f:
-            frames = f.getnframes()
-            rate = f.getframerate()
-            duration = frames / float(rate)
-            return duration
+        """Get duration of audio file in seconds, from its headers"""
+        return wavcache.probe_duration(audio_path)
 
-    def convert_to_wav(self, audio_path, output_path):
-        """Convert audio file to WAV format if needed"""
+    def convert_to_wav(self, audio_path):
+        """
+        16 kHz mono WAV of audio_path from the conversion cache, converted
+        only if this content has not been converted before
+        """
         try:
-            audio = AudioSegment.from_file(audio_path)
-            audio.export(output_path, format="wav")
-            return output_path
+            with metrics.stage('convert'):
+                wav_path, _ = wavcache.convert(audio_path, self.wav_cache_dir)
+            return wav_path
         except Exception as e:
             print(f"Error converting audio: {str(e)}")
             return None
@@ -34,52 +52,60 @@ class AudioTranscriber:
         """
         try:
             sound = AudioSegment.from_wav(path)
-            chunks = split_on_silence(
-                sound,
-                min_silence_len=700,
-                silence_thresh=sound.dBFS-14,
-                keep_silence=500
-            )
-            
-            folder_name = "audio-chunks"
-            if not os.path.isdir(folder_name):
-                os.mkdir(folder_name)
-            
-            full_text = ""
-            
-            for i, audio_chunk in enumerate(chunks, start=1):
-                chunk_filename = os.path.join(folder_name, f"chunk{i}.wav")
-                audio_chunk.export(chunk_filename, format="wav")
-                
-                with sr.AudioFile(chunk_filename) as source:
-                    audio = self.recognizer.record(source)
-                    try:
-                        text = self.recognizer.recognize_google(audio, language='kn-IN')
-                        full_text += text + " "
-                    except sr.UnknownValueError:
-                        print(f"Could not understand chunk {i}")
-                    except sr.RequestError as e:
-                        print(f"Error with chunk {i}: {str(e)}")
-                
-                os.remove(chunk_filename)
-            
-            os.rmdir(folder_name)
-            return full_text.strip()
+            if sound.sample_width not in (1, 2, 4):
+                sound = sound.set_sample_width(2)
+            return self._transcribe_on_silence(segmentation.segment_to_array(sound), sound.frame_rate,
+                                               sound.sample_width)
         except Exception as e:
             print(f"Error processing large audio: {str(e)}")
             return None
 
+    def _transcribe_on_silence(self, samples, frame_rate, sample_width):
+        chunks = segmentation.split_on_silence(
+            samples,
+            frame_rate,
+            min_silence_len=700,
+            silence_thresh=segmentation.dbfs(samples)-14,
+            keep_silence=500
+        )
+        mono = segmentation.to_mono(samples)
+        
+        full_text = ""
+        
+        for i, (start, end) in enumerate(chunks, start=1):
+            audio = sr.AudioData(mono[start:end].tobytes(), frame_rate, sample_width)
+            try:
+                text = self.recognize(audio)
+                full_text += text + " "
+            except sr.UnknownValueError:
+                print(f"Could not understand chunk {i}")
+            except sr.RequestError as e:
+                print(f"Error with chunk {i}: {str(e)}")
+        
+        return full_text.strip()
+
+    def transcribe_samples(self, samples, frame_rate):
+        """
+        Transcribes int16 mono PCM already in memory (or memory-mapped, as
+        virtual chunks are); long audio is split on silence first
+        """
+        try:
+            if len(samples) / frame_rate > 60:
+                return self._transcribe_on_silence(samples, frame_rate, 2)
+            audio = sr.AudioData(np.ascontiguousarray(samples, dtype=np.int16).tobytes(), frame_rate, 2)
+            return self.recognize(audio)
+        except Exception as e:
+            print(f"Error transcribing samples: {str(e)}")
+            return None
+
     def transcribe_audio(self, audio_path):
         """
         Transcribes a single audio file to Kannada text
         """
         try:
-            file_ext = os.path.splitext(audio_path)[1].lower()
-            if file_ext != '.wav':
-                wav_path = os.path.splitext(audio_path)[0] + '.wav'
-                audio_path = self.convert_to_wav(audio_path, wav_path)
-                if not audio_path:
-                    raise Exception("Failed to convert audio to WAV format")
+            audio_path = self.convert_to_wav(audio_path)
+            if not audio_path:
+                raise Exception("Failed to convert audio to WAV format")
             
             duration = self.get_audio_duration(audio_path)
             
@@ -88,30 +114,57 @@ class AudioTranscriber:
             else:
                 with sr.AudioFile(audio_path) as source:
                     audio = self.recognizer.record(source)
-                    return self.recognizer.recognize_google(audio, language='kn-IN')
+                    return self.recognize(audio)
         except Exception as e:
             print(f"Error transcribing file {audio_path}: {str(e)}")
             return None
 
-    def transcribe_folder(self, folder_path, output_file="transcriptions.json"):
+    def list_audio_files(self, folder_path):
+        """All files under folder_path in a stable (sorted) order"""
+        audio_paths = []
+        for root, dirs, files in os.walk(folder_path):
+            dirs.sort()
+            for file in sorted(files):
+                audio_paths.append(os.path.join(root, file))
+        return audio_paths
+
+    def _transcribe_one(self, audio_path, journal=None):
+        print(f"Processing: {audio_path}")
+        with metrics.stage('transcribe_file'):
+            text = self.transcribe_audio(audio_path)
+        if text and journal is not None:
+            journal.record(audio_path, text)
+        return text
+
+    def transcribe_folder(self, folder_path, output_file="transcriptions.json", workers=None,
+                          journal_file=None, match='stat'):
         """
-        Transcribes all audio files in a folder and saves the output as JSON
+        Transcribes all audio files in a folder and saves the output as JSON.
+        Every finished file is appended to a JSONL journal right away, and
+        files already journaled (same path and size + mtime, or content hash
+        with match='hash') are skipped, so an interrupted run resumes where
+        it stopped. The output JSON is compacted from the journal at the end.
+        With workers > 1 files are transcribed concurrently; the output keeps
+        the sorted file order either way.
         """
         try:
             if not os.path.isdir(folder_path):
                 raise NotADirectoryError(f"Provided path is not a directory: {folder_path}")
             
-            transcriptions = {}
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    audio_path = os.path.join(root, file)
-                    print(f"Processing: {audio_path}")
-                    text = self.transcribe_audio(audio_path)
-                    if text:
-                        transcriptions[audio_path] = text
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(transcriptions, f, ensure_ascii=False, indent=4)
+            journal = TranscriptionJournal(journal_file or journal_path_for(output_file), match=match)
+            audio_paths = self.list_audio_files(folder_path)
+            pending = [audio_path for audio_path in audio_paths if not journal.is_done(audio_path)]
+            print(f"{len(audio_paths) - len(pending)} files already in {journal.journal_file}, {len(pending)} to transcribe")
+
+            workers = workers or self.workers
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    list(executor.map(lambda audio_path: self._transcribe_one(audio_path, journal), pending))
+            else:
+                for audio_path in pending:
+                    self._transcribe_one(audio_path, journal)
+
+            transcriptions = journal.compact(output_file, audio_paths)
             
             print(f"Transcriptions saved to {output_file}")
             return transcriptions
@@ -121,7 +174,7 @@ class AudioTranscriber:
 
 # Example usage
 if __name__ == "__main__":
-    transcriber = AudioTranscriber()
+    transcriber = AudioTranscriber(workers=8)
     
     # Replace with your folder path containing audio files
     audio_folder = "audio_chunks_database"  # Folder containing audio files
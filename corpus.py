@@ -0,0 +1,197 @@
+"""
+SQLite corpus store: one row per chunk with its source recording, offsets,
+Kannada and English text and the key of its embedding in the index.
+"""
+import os
+import re
+import json
+import sqlite3
+import argparse
+import threading
+
+DEFAULT_CORPUS_FILE = 'corpus.db'
+DEFAULT_CHUNK_MS = 30000
+
+# source_file is the recording's file name stem, as chunk names carry it
+COLUMNS = ('chunk_id', 'source_file', 'start_ms', 'end_ms', 'kannada', 'english', 'embedding_key')
+TEXT_COLUMNS = ('kannada', 'english')
+
+_CHUNK_NAME = re.compile(r'^(?P<stem>.+)_chunk_(?P<number>\d+)\.wav$')
+
+# SQLite's default limit on bound parameters per statement is 999
+_MAX_PARAMS = 900
+
+
+def parse_chunk_name(chunk_id, chunk_ms=DEFAULT_CHUNK_MS):
+    """
+    (source stem, start_ms, end_ms) of a '{stem}_chunk_{n}.wav' chunk cut
+    by audiochunk at chunk_ms, or (None, None, None) for other names. The
+    end of the last chunk of a recording may be past its real end.
+    """
+    match = _CHUNK_NAME.match(os.path.basename(chunk_id))
+    if not match:
+        return None, None, None
+    start = (int(match.group('number')) - 1) * chunk_ms
+    return match.group('stem'), start, start + chunk_ms
+
+
+# Function to look up the texts of a few chunks without loading a whole JSON file
+def lookup_texts(chunk_ids, column='english', store=None, json_file=None):
+    """
+    {chunk_id: text} for chunk_ids, read from store; chunks it lacks (all
+    of them without a store) are looked up in json_file, if given
+    """
+    chunk_ids = list(chunk_ids)
+    texts = {}
+    if store is not None:
+        texts = {chunk_id: row[column] for chunk_id, row in store.get_many(chunk_ids).items() if row[column]}
+    missing = [chunk_id for chunk_id in chunk_ids if chunk_id not in texts]
+    if missing and json_file and os.path.exists(json_file):
+        with open(json_file, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        texts.update((chunk_id, data[chunk_id]) for chunk_id in missing if chunk_id in data)
+    return texts
+
+
+class CorpusStore:
+    """Chunk table in a SQLite file, safe to share between threads"""
+
+    def __init__(self, db_file=DEFAULT_CORPUS_FILE):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY,
+                    chunk_id TEXT NOT NULL UNIQUE,
+                    source_file TEXT,
+                    start_ms INTEGER,
+                    end_ms INTEGER,
+                    kannada TEXT,
+                    english TEXT,
+                    embedding_key TEXT
+                )""")
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def __contains__(self, chunk_id):
+        return self.get(chunk_id) is not None
+
+    def upsert(self, rows):
+        """
+        Insert or update chunks from dicts holding 'chunk_id' and any of the
+        other columns; columns a dict leaves out (or sets to None) keep their
+        stored value. New chunks are appended in the order given.
+        """
+        statement = (
+            f"INSERT INTO chunks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+            f"ON CONFLICT(chunk_id) DO UPDATE SET "
+            + ', '.join(f"{column} = COALESCE(excluded.{column}, {column})" for column in COLUMNS[1:]))
+        values = [tuple(row.get(column) for column in COLUMNS) for row in rows]
+        with self._lock, self._conn:
+            self._conn.executemany(statement, values)
+        return len(values)
+
+    def get(self, chunk_id):
+        """One chunk as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_many(self, chunk_ids):
+        """{chunk_id: row dict} for the chunk ids that exist"""
+        chunk_ids = list(chunk_ids)
+        found = {}
+        with self._lock:
+            for start in range(0, len(chunk_ids), _MAX_PARAMS):
+                batch = chunk_ids[start:start + _MAX_PARAMS]
+                cursor = self._conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM chunks WHERE chunk_id IN ({', '.join('?' * len(batch))})", batch)
+                found.update((row['chunk_id'], dict(row)) for row in cursor)
+        return found
+
+    def texts(self, column='english'):
+        """Iterate (chunk_id, text) in insertion order, skipping chunks without that text"""
+        if column not in TEXT_COLUMNS:
+            raise ValueError(f"Unknown text column '{column}', expected one of: {', '.join(TEXT_COLUMNS)}")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT chunk_id, {column} FROM chunks WHERE {column} IS NOT NULL ORDER BY id").fetchall()
+        for row in rows:
+            yield row[0], row[1]
+
+    def import_json(self, kannada_file=None, english_file=None, chunk_ms=DEFAULT_CHUNK_MS):
+        """
+        Load {chunk path: text} JSON files (output.json, translated_output.json)
+        into the store; source and offsets are derived from the chunk names
+        """
+        rows = {}
+        for column, json_file in (('kannada', kannada_file), ('english', english_file)):
+            if not json_file:
+                continue
+            with open(json_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            for chunk_id, text in data.items():
+                row = rows.get(chunk_id)
+                if row is None:
+                    source, start_ms, end_ms = parse_chunk_name(chunk_id, chunk_ms)
+                    row = rows[chunk_id] = {"chunk_id": chunk_id, "source_file": source,
+                                            "start_ms": start_ms, "end_ms": end_ms}
+                row[column] = text
+        return self.upsert(rows.values())
+
+    def export_json(self, output_file, column='english'):
+        """Write one text column back out as the {chunk path: text} JSON the scripts use"""
+        data = dict(self.texts(column))
+        tmp_file = output_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=4)
+        os.replace(tmp_file, output_file)
+        return len(data)
+
+    def link_index(self, index):
+        """Record each live index entry's content key as its chunk's embedding_key"""
+        return self.upsert({"chunk_id": path, "embedding_key": key} for path, key in index.live_keys().items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['import', 'export', 'get', 'link', 'stats'])
+    parser.add_argument('chunk_ids', nargs='*', help="Chunks to print for 'get'")
+    parser.add_argument('--db', default=DEFAULT_CORPUS_FILE)
+    parser.add_argument('--kannada', default=None, help="Kannada JSON to import (e.g. output.json)")
+    parser.add_argument('--english', default=None, help="English JSON to import (e.g. translated_output.json)")
+    parser.add_argument('--chunk-ms', type=int, default=DEFAULT_CHUNK_MS, help="Chunk length used when splitting")
+    parser.add_argument('--column', default='english', choices=TEXT_COLUMNS, help="Text column to export")
+    parser.add_argument('--output', default=None, help="JSON file to export to")
+    parser.add_argument('--index-dir', default=None, help="Embedding index to link")
+    args = parser.parse_args()
+
+    store = CorpusStore(args.db)
+    if args.command == 'import':
+        print(f"Imported {store.import_json(args.kannada, args.english, args.chunk_ms)} chunks into {args.db}")
+    elif args.command == 'export':
+        output = args.output or ('output.json' if args.column == 'kannada' else 'translated_output.json')
+        print(f"Exported {store.export_json(output, args.column)} chunks to {output}")
+    elif args.command == 'get':
+        for chunk_id, row in store.get_many(args.chunk_ids).items():
+            print(json.dumps(row, ensure_ascii=False, indent=4))
+    elif args.command == 'link':
+        import embedindex
+        index = embedindex.EmbeddingIndex(args.index_dir or embedindex.DEFAULT_INDEX_DIR)
+        print(f"Linked {store.link_index(index)} chunks to {index.index_dir}")
+    print(f"{len(store)} chunks in {args.db}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,656 @@
+import os
+import json
+import hashlib
+import argparse
+import threading
+from collections import namedtuple
+import numpy as np
+import metrics
+import searchindex
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+DEFAULT_SOURCE_FILE = 'translated_output.json'
+DEFAULT_INDEX_DIR = 'embedding_index'
+DEFAULT_BACKEND = 'exact'
+
+META_FILE = 'meta.json'
+TOMBSTONES_FILE = 'tombstones.jsonl'
+SEGMENT_PREFIX = 'seg_'
+SCALES_SUFFIX = '.scale.npy'
+
+# Batched searches score at most this many (query, row) pairs at once (float32)
+MAX_BATCH_SCORES = 1 << 25
+
+# Background compaction starts once either limit is exceeded
+MAX_SEGMENTS = 8
+MAX_DEAD_FRACTION = 0.25
+
+# Everything one search reads, taken together: rows are resolved to paths
+# through the same load of the index that scored them. Between loads the
+# lists and the matrix only grow, and rows past len(alive) are invisible,
+# so a view stays valid while ingests run; compaction renumbers the rows
+# and swaps in a new view.
+IndexView = namedtuple('IndexView', ['backend', 'alive', 'embeddings', 'audio_paths', 'row_of_path'])
+
+_model = None
+_model_lock = threading.Lock()
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_model():
+    """Return the process-wide SentenceTransformer, loading it on first use"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                with metrics.stage('model_load'):
+                    _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+
+def encode(texts):
+    """Encode text(s) to L2-normalised float32 vectors"""
+    embeddings = get_model().encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def file_fingerprint(path):
+    """Size, mtime and SHA-256 of a file, used to detect a stale index"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha.hexdigest()}
+
+
+def content_key(text, audio_path=None):
+    """
+    Identity of an index entry: SHA-256 over the chunk audio (when the file
+    is available) and its transcript
+    """
+    sha = hashlib.sha256()
+    if audio_path and os.path.exists(audio_path):
+        with open(audio_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+    sha.update(b'\0')
+    sha.update(text.encode('utf-8'))
+    return sha.hexdigest()
+
+
+def text_digest(text):
+    """8-byte digest of a transcript; the index keeps these instead of the texts to spot edits"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+
+def load_meta(index_dir=DEFAULT_INDEX_DIR):
+    """Read the index metadata, or None if there is no index"""
+    meta_path = os.path.join(index_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and rename it over path"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def source_changed(meta, source_file):
+    """
+    True when source_file differs from the one the index was last synced
+    with. Size and mtime are checked first so the file is only hashed when
+    they differ.
+    """
+    if not os.path.exists(source_file):
+        return True
+    saved = meta.get("source_fingerprint") or {}
+    stat = os.stat(source_file)
+    if stat.st_size == saved.get("size") and stat.st_mtime == saved.get("mtime"):
+        return False
+    return file_fingerprint(source_file)["sha256"] != saved.get("sha256")
+
+
+def is_stale(source_file=DEFAULT_SOURCE_FILE, index_dir=DEFAULT_INDEX_DIR):
+    """True when the index is missing, was built with another model, or the source JSON changed"""
+    meta = load_meta(index_dir)
+    if meta is None or meta.get("model") != MODEL_NAME:
+        return True
+    return source_changed(meta, source_file)
+
+
+def create_index(index_dir=DEFAULT_INDEX_DIR, dtype='float32'):
+    """
+    Start an empty index in index_dir, discarding any previous one.
+    Embeddings are stored as dtype (see searchindex.quantize).
+    """
+    if dtype not in searchindex.DTYPES:
+        raise ValueError(f"Unknown embedding dtype '{dtype}', expected one of: {', '.join(searchindex.DTYPES)}")
+    os.makedirs(index_dir, exist_ok=True)
+    for filename in os.listdir(index_dir):
+        if filename.startswith(SEGMENT_PREFIX) or filename == TOMBSTONES_FILE:
+            os.remove(os.path.join(index_dir, filename))
+    searchindex.remove_backend_files(index_dir)
+    meta = {
+        "model": MODEL_NAME,
+        "dim": None,
+        "dtype": dtype,
+        "version": 0,
+        "next_segment": 1,
+        "segments": [],
+        "source": None,
+        "source_fingerprint": None,
+    }
+    write_json_atomic(os.path.join(index_dir, META_FILE), meta)
+    return meta
+
+
+def build_index(source_file=DEFAULT_SOURCE_FILE, index_dir=DEFAULT_INDEX_DIR, audio_folder=None, dtype='float32'):
+    """
+    Encode every transcript in the source JSON once and write the
+    embeddings, the id -> chunk path table and the metadata to disk
+    """
+    with open(source_file, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+
+    print(f"Encoding {len(data)} transcripts from {source_file}...")
+    create_index(index_dir, dtype)
+    index = EmbeddingIndex(index_dir)
+    index.ingest(data, audio_folder=audio_folder)
+    index.set_source(source_file)
+
+    print(f"Index with {len(data)} entries saved to: {index_dir}")
+    return index.meta
+
+
+class SegmentedMatrix:
+    """
+    Row-wise concatenation of memory-mapped segment arrays that is never
+    materialised; supports len(), shape, slicing and integer-array indexing
+    """
+
+    ndim = 2
+
+    def __init__(self, blocks, dim):
+        self.blocks = list(blocks)
+        self.dim = dim or 0
+        self.offsets = np.cumsum([0] + [len(block) for block in self.blocks])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    @property
+    def shape(self):
+        return (len(self), self.dim)
+
+    def append(self, block):
+        self.blocks.append(block)
+        self.dim = block.shape[1]
+        self.offsets = np.append(self.offsets, self.offsets[-1] + len(block))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(len(self))
+            return self.take(np.arange(start, stop))
+        return self.take(np.asarray(key))
+
+    def take(self, ids):
+        out = np.empty((len(ids), self.dim), dtype=np.float32)
+        segments = np.searchsorted(self.offsets, ids, side='right') - 1
+        for segment in np.unique(segments):
+            selected = segments == segment
+            out[selected] = self.blocks[segment][ids[selected] - self.offsets[segment]]
+        return out
+
+
+class EmbeddingIndex:
+    """
+    Transcript embeddings stored as append-only segments (memory-mapped;
+    float32, or float16 / per-row scaled int8 by meta["dtype"]) and
+    searched through one of the searchindex backends ('exact' or 'ivf').
+
+    Entries are keyed by content_key(). ingest() embeds only new or changed
+    transcripts into a new segment, remove() appends tombstones, and
+    compact() rewrites the live rows into one segment, by default on a
+    background thread once there are too many segments or dead rows.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, backend=DEFAULT_BACKEND, **backend_params):
+        self.index_dir = index_dir
+        self.backend_name = backend
+        self.backend_params = backend_params
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compact_thread = None
+        self._load()
+
+    def _path(self, filename):
+        return os.path.join(self.index_dir, filename)
+
+    def _load(self):
+        meta = load_meta(self.index_dir)
+        blocks, audio_paths, text_digests, keys, segment_starts = [], [], [], [], {}
+        for segment in meta["segments"]:
+            segment_starts[segment] = len(keys)
+            blocks.append(self._load_segment(segment))
+            with open(self._path(segment + '.jsonl'), 'r', encoding='utf-8') as file:
+                for line in file:
+                    row = json.loads(line)
+                    keys.append(row["key"])
+                    audio_paths.append(row["path"])
+                    text_digests.append(text_digest(row["text"]))
+        embeddings = SegmentedMatrix(blocks, meta["dim"])
+
+        alive = np.ones(len(keys), dtype=bool)
+        tombstones = []
+        if os.path.exists(self._path(TOMBSTONES_FILE)):
+            with open(self._path(TOMBSTONES_FILE), 'r', encoding='utf-8') as file:
+                for line in file:
+                    tombstone = json.loads(line)
+                    tombstones.append(tombstone)
+                    if tombstone["segment"] in segment_starts:
+                        alive[segment_starts[tombstone["segment"]] + tombstone["row"]] = False
+
+        # Saved backend structures are reused; otherwise build once and save them
+        backend = searchindex.create_backend(self.backend_name, **self.backend_params)
+        if not backend.load(self.index_dir, embeddings):
+            backend.build(embeddings)
+            backend.save(self.index_dir)
+
+        self.meta = meta
+        self.embeddings = embeddings
+        self.audio_paths = audio_paths
+        self.text_digests = text_digests
+        self.keys = keys
+        self.segment_starts = segment_starts
+        self.tombstones = tombstones
+        self.row_of_path = {path: row for row, path in enumerate(audio_paths) if alive[row]}
+        self.view = IndexView(backend, alive, embeddings, audio_paths, self.row_of_path)
+
+    @property
+    def backend(self):
+        return self.view[0]
+
+    @property
+    def alive(self):
+        return self.view[1]
+
+    def __len__(self):
+        return len(self.row_of_path)
+
+    @property
+    def version(self):
+        return self.meta["version"]
+
+    @property
+    def dtype(self):
+        return self.meta.get("dtype", 'float32')
+
+    def _load_segment(self, name):
+        # Memory-mapped read-only, so every process serving the index shares one copy in the page cache
+        codes = np.load(self._path(name + '.npy'), mmap_mode='r')
+        if codes.dtype == np.float32:
+            return codes
+        scales_path = self._path(name + SCALES_SUFFIX)
+        scales = np.load(scales_path, mmap_mode='r') if os.path.exists(scales_path) else None
+        return searchindex.QuantizedMatrix(codes, scales)
+
+    def _save_segment(self, name, embeddings):
+        codes, scales = searchindex.quantize(embeddings, self.dtype)
+        np.save(self._path(name + '.npy'), codes)
+        if scales is not None:
+            np.save(self._path(name + SCALES_SUFFIX), scales)
+
+    def key_of(self, path):
+        """Content key of the live entry for a chunk path, or None"""
+        with self._lock:
+            row = self.row_of_path.get(path)
+            return self.keys[row] if row is not None else None
+
+    def live_keys(self):
+        """{chunk path: content key} of every live entry"""
+        with self._lock:
+            return {path: self.keys[row] for path, row in self.row_of_path.items()}
+
+    def _save_meta(self):
+        self.meta["version"] += 1
+        write_json_atomic(self._path(META_FILE), self.meta)
+
+    def _segment_of(self, row):
+        segment = self.meta["segments"][int(np.searchsorted(self.embeddings.offsets, row, side='right')) - 1]
+        return segment, row - self.segment_starts[segment]
+
+    def _write_tombstones(self, rows):
+        if not rows:
+            return
+        records = []
+        for row in rows:
+            segment, local_row = self._segment_of(row)
+            records.append({"segment": segment, "row": int(local_row)})
+        with open(self._path(TOMBSTONES_FILE), 'a', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record) + '\n')
+        self.tombstones.extend(records)
+        alive = self.alive.copy()
+        alive[rows] = False
+        self.view = self.view._replace(alive=alive)
+
+    def _new_segment_name(self):
+        name = f"{SEGMENT_PREFIX}{self.meta['next_segment']:06d}"
+        self.meta["next_segment"] += 1
+        return name
+
+    def _write_rows(self, name, rows):
+        with open(self._path(name + '.jsonl'), 'w', encoding='utf-8') as file:
+            for key, path, text in rows:
+                file.write(json.dumps({"key": key, "path": path, "text": text}, ensure_ascii=False) + '\n')
+
+    def _read_live_rows(self, segments, segment_starts, alive):
+        for segment in segments:
+            start = segment_starts[segment]
+            with open(self._path(segment + '.jsonl'), 'r', encoding='utf-8') as file:
+                for offset, line in enumerate(file):
+                    if alive[start + offset]:
+                        row = json.loads(line)
+                        yield row["key"], row["path"], row["text"]
+
+    def ingest(self, entries, audio_folder=None, compact=True):
+        """
+        Add or update {chunk path: transcript} entries. Only entries whose
+        content key is new are embedded; a changed entry tombstones its old
+        row. Cost is proportional to len(entries), not to the index size.
+        """
+        with self._lock:
+            new_rows, replaced = [], []
+            for path, text in entries.items():
+                audio_path = os.path.join(audio_folder, path) if audio_folder else None
+                key = content_key(text, audio_path)
+                row = self.row_of_path.get(path)
+                if row is not None and self.keys[row] == key:
+                    continue
+                if row is not None:
+                    replaced.append(row)
+                new_rows.append((key, path, text))
+
+            if not new_rows:
+                return {"added": 0, "updated": 0, "unchanged": len(entries)}
+
+            segment = self._new_segment_name()
+            with metrics.stage('embed_encode'):
+                embeddings = encode([text for _, _, text in new_rows])
+            self._save_segment(segment, embeddings)
+            self._write_rows(segment, new_rows)
+            self._write_tombstones(replaced)
+
+            start = len(self.keys)
+            self.segment_starts[segment] = start
+            self.embeddings.append(self._load_segment(segment))
+            for offset, (key, path, text) in enumerate(new_rows):
+                self.keys.append(key)
+                self.audio_paths.append(path)
+                self.text_digests.append(text_digest(text))
+                self.row_of_path[path] = start + offset
+            self.backend.add(start)
+            self.view = self.view._replace(alive=np.concatenate([self.alive, np.ones(len(new_rows), dtype=bool)]))
+
+            self.meta["dim"] = self.embeddings.dim
+            self.meta["segments"].append(segment)
+            self._save_meta()
+
+        if compact:
+            self.maybe_compact()
+        return {"added": len(new_rows) - len(replaced), "updated": len(replaced),
+                "unchanged": len(entries) - len(new_rows)}
+
+    def remove(self, paths, compact=True):
+        """Tombstone the entries for the given chunk paths"""
+        with self._lock:
+            rows = [self.row_of_path.pop(path) for path in paths if path in self.row_of_path]
+            if rows:
+                self._write_tombstones(rows)
+                self._save_meta()
+        if compact:
+            self.maybe_compact()
+        return len(rows)
+
+    def set_dtype(self, dtype):
+        """
+        Store embeddings as dtype from now on. Existing segments keep their
+        storage until the next compact(), which rewrites them all.
+        """
+        if dtype not in searchindex.DTYPES:
+            raise ValueError(f"Unknown embedding dtype '{dtype}', expected one of: {', '.join(searchindex.DTYPES)}")
+        with self._lock:
+            self.meta["dtype"] = dtype
+            self._save_meta()
+
+    def set_source(self, source_file):
+        """Record source_file as the JSON this index is in sync with"""
+        with self._lock:
+            self.meta["source"] = os.path.abspath(source_file)
+            self.meta["source_fingerprint"] = file_fingerprint(source_file)
+            self._save_meta()
+
+    def sync(self, source_file, audio_folder=None):
+        """
+        Bring the index in line with a {chunk path: transcript} JSON file:
+        new or edited transcripts are ingested and missing paths removed
+        """
+        with open(source_file, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        with self._lock:
+            changed = {path: text for path, text in data.items()
+                       if path not in self.row_of_path
+                       or self.text_digests[self.row_of_path[path]] != text_digest(text)}
+            removed = [path for path in self.row_of_path if path not in data]
+        stats = self.ingest(changed, audio_folder=audio_folder, compact=False)
+        stats["removed"] = self.remove(removed, compact=False)
+        self.set_source(source_file)
+        self.maybe_compact()
+        return stats
+
+    def needs_compaction(self):
+        dead = len(self.keys) - len(self.row_of_path)
+        return len(self.meta["segments"]) > MAX_SEGMENTS or dead > MAX_DEAD_FRACTION * max(1, len(self.keys))
+
+    def maybe_compact(self):
+        """Start a background compaction if needed and none is running"""
+        if self.needs_compaction() and not (self._compact_thread and self._compact_thread.is_alive()):
+            self._compact_thread = threading.Thread(target=self.compact, daemon=True)
+            self._compact_thread.start()
+        return self._compact_thread
+
+    def compact(self, block_rows=65536):
+        """
+        Rewrite all live rows into a single segment and drop tombstones.
+        Searches and ingests keep running against the old segments while
+        the new one is written; only the final swap takes the lock.
+        """
+        with self._compact_lock, metrics.stage('index_compact'):
+            with self._lock:
+                segments = list(self.meta["segments"])
+                if not segments:
+                    return
+                total_rows = len(self.keys)
+                tombstone_count = len(self.tombstones)
+                live = np.flatnonzero(self.alive[:total_rows])
+                alive = self.alive[:total_rows].copy()
+                embeddings = self.embeddings
+                segment_starts = dict(self.segment_starts)
+                segment = self._new_segment_name()
+                dtype = self.dtype
+                self._save_meta()
+
+            # Rows are re-quantized from their float32 reading; for rows already
+            # stored at dtype this gives back the same codes and scales
+            matrix = np.lib.format.open_memmap(self._path(segment + '.npy'), mode='w+',
+                                               dtype=searchindex.DTYPES[dtype], shape=(len(live), embeddings.dim))
+            scales = None
+            if dtype == 'int8':
+                scales = np.lib.format.open_memmap(self._path(segment + SCALES_SUFFIX), mode='w+',
+                                                   dtype=np.float32, shape=(len(live),))
+            for start in range(0, len(live), block_rows):
+                codes, block_scales = searchindex.quantize(embeddings.take(live[start:start + block_rows]), dtype)
+                matrix[start:start + block_rows] = codes
+                if scales is not None:
+                    scales[start:start + block_rows] = block_scales
+            matrix.flush()
+            del matrix
+            if scales is not None:
+                scales.flush()
+                del scales
+            # Texts are streamed from the old segments' rows, which are never rewritten in place
+            self._write_rows(segment, self._read_live_rows(segments, segment_starts, alive))
+
+            with self._lock:
+                # Tombstones written during the rewrite are remapped onto the new segment
+                new_row = np.full(total_rows, -1, dtype=np.int64)
+                new_row[live] = np.arange(len(live))
+                kept = []
+                for tombstone in self.tombstones[tombstone_count:]:
+                    if tombstone["segment"] in segments:
+                        old_row = segment_starts[tombstone["segment"]] + tombstone["row"]
+                        tombstone = {"segment": segment, "row": int(new_row[old_row])}
+                    kept.append(tombstone)
+                with open(self._path(TOMBSTONES_FILE + '.tmp'), 'w', encoding='utf-8') as file:
+                    for tombstone in kept:
+                        file.write(json.dumps(tombstone) + '\n')
+                os.replace(self._path(TOMBSTONES_FILE + '.tmp'), self._path(TOMBSTONES_FILE))
+
+                self.meta["segments"] = [segment] + [s for s in self.meta["segments"] if s not in segments]
+                searchindex.remove_backend_files(self.index_dir)
+                self._save_meta()
+                self._load()
+
+            for old in segments:
+                for suffix in ('.npy', SCALES_SUFFIX, '.jsonl'):
+                    if not os.path.exists(self._path(old + suffix)):
+                        continue
+                    try:
+                        os.remove(self._path(old + suffix))
+                    except OSError as e:
+                        print(f"Could not remove {old + suffix}: {e}")
+            print(f"Compacted {len(segments)} segments into {segment} ({len(live)} live rows)")
+
+    def search(self, query, top_k=5):
+        """
+        Return [(chunk path, score), ...] for the top_k live transcripts. The
+        cost is a single query encode plus one scoring pass of the backend.
+        """
+        return self.search_embedding(encode(query), top_k)
+
+    def search_embedding(self, query_embedding, top_k=5):
+        """Like search(), for a query that is already encoded"""
+        return self.search_paths(query_embedding, top_k)[0]
+
+    def search_batch(self, queries, top_k=5):
+        """search() for a list of query texts: one batched encode, then search_paths()"""
+        if len(queries) == 0:
+            return []
+        return self.search_paths(encode(list(queries)), top_k)
+
+    def search_embeddings(self, query_embeddings, top_k=5, max_scores=MAX_BATCH_SCORES, view=None):
+        """
+        [[(row, score), ...] per query] for an (n_queries, dim) matrix. Each
+        block of queries is scored with one matrix product and a row-wise
+        top-k; blocks are sized so their score matrix stays under
+        max_scores entries however many queries are passed. Rows belong to
+        view (the current one if omitted): resolve them through the same
+        view, or use search_paths().
+        """
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        backend, alive = (view or self.view)[:2]
+        if not alive.any():
+            return [[] for _ in range(len(query_embeddings))]
+        block = max(1, max_scores // max(1, len(alive)))
+        results = []
+        for start in range(0, len(query_embeddings), block):
+            rows, scores = backend.search(query_embeddings[start:start + block], top_k, alive=alive)
+            results.extend([(int(row), float(score)) for row, score in zip(query_rows, query_scores)
+                            if row >= 0 and np.isfinite(score)] for query_rows, query_scores in zip(rows, scores))
+        return results
+
+    def search_paths(self, query_embeddings, top_k=5, max_scores=MAX_BATCH_SCORES):
+        """[[(chunk path, score), ...] per query], rows resolved from the view that scored them"""
+        view = self.view
+        return [[(view.audio_paths[row], score) for row, score in results]
+                for results in self.search_embeddings(query_embeddings, top_k, max_scores, view)]
+
+
+def get_index(source_file=DEFAULT_SOURCE_FILE, index_dir=DEFAULT_INDEX_DIR, backend=DEFAULT_BACKEND, **backend_params):
+    """
+    Return the process-wide index for index_dir, building it if it is
+    missing and syncing it incrementally if source_file changed. The source
+    is re-checked with a stat on every call, so editing the JSON takes
+    effect without a restart.
+    """
+    key = os.path.abspath(index_dir)
+    index = _indexes.get(key)
+    if index is not None and not source_changed(index.meta, source_file):
+        return index
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            meta = load_meta(index_dir)
+            if meta is None or meta.get("model") != MODEL_NAME:
+                print(f"No index in {index_dir}, building it from {source_file}")
+                build_index(source_file, index_dir)
+            index = EmbeddingIndex(index_dir, backend, **backend_params)
+            _indexes[key] = index
+        if source_changed(index.meta, source_file):
+            print(f"Index in {index_dir} is stale, syncing it with {source_file}")
+            print(f"Sync result: {index.sync(source_file)}")
+    return index
+
+
+def reload_index(source_file=DEFAULT_SOURCE_FILE, index_dir=DEFAULT_INDEX_DIR, backend=DEFAULT_BACKEND, **backend_params):
+    """Drop the cached index so the next get_index call reloads it"""
+    with _indexes_lock:
+        _indexes.pop(os.path.abspath(index_dir), None)
+    return get_index(source_file, index_dir, backend, **backend_params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and maintain the transcript embedding index")
+    parser.add_argument('command', nargs='?', default='build', choices=['build', 'sync', 'ingest', 'remove', 'compact', 'quantize'])
+    parser.add_argument('paths', nargs='*', help="JSON files to ingest, or chunk paths to remove")
+    parser.add_argument('--source', default=DEFAULT_SOURCE_FILE, help="Transcripts to index")
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR, help="Directory the index is written to")
+    parser.add_argument('--audio-folder', default=None, help="Chunk folder, so keys also hash the audio")
+    parser.add_argument('--dtype', default=None, choices=list(searchindex.DTYPES),
+                        help="Embedding storage for build (default float32) and quantize")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        # Build the index offline so queries only encode the query text
+        build_index(args.source, args.index_dir, args.audio_folder, dtype=args.dtype or 'float32')
+        return
+
+    if load_meta(args.index_dir) is None:
+        create_index(args.index_dir)
+    index = EmbeddingIndex(args.index_dir)
+    if args.command == 'sync':
+        print(index.sync(args.source, audio_folder=args.audio_folder))
+    elif args.command == 'ingest':
+        for path in args.paths:
+            with open(path, 'r', encoding='utf-8') as file:
+                print(index.ingest(json.load(file), audio_folder=args.audio_folder, compact=False))
+    elif args.command == 'remove':
+        print(f"Removed {index.remove(args.paths, compact=False)} entries")
+    elif args.command == 'quantize':
+        # Re-encode the stored embeddings at the new precision, without the model
+        if not args.dtype:
+            parser.error("quantize needs --dtype")
+        index.set_dtype(args.dtype)
+    if args.command in ('compact', 'quantize') or index.needs_compaction():
+        index.compact()
+
+if __name__ == "__main__":
+    main()
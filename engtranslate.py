@@ -1,38 +1,202 @@
+import os
 import json
-from googletrans import Translator
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import metrics
+import translators
+
+# googletrans caps a request at roughly 5000 characters
+MAX_BATCH_CHARS = 4500
+
+
+def text_key(text, src='kn', dest='en'):
+    """Cache key of one text for a language pair"""
+    return hashlib.sha256(f"{src}\0{dest}\0{text}".encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """
+    Persistent append-only JSONL cache of translations, one {"key", "text"}
+    line per translated text, keyed by text_key so re-runs only send text
+    that has not been translated before
+    """
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        with open(self.cache_file, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                # Drop a torn last line from a crash mid-write so appends start clean
+                f.truncate(data.rfind(b'\n') + 1)
+        for line in data.decode('utf-8', errors='replace').splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self.entries[entry["key"]] = entry["text"]
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put_many(self, items):
+        """Store (key, translation) pairs and persist them"""
+        lines = ''.join(json.dumps({"key": key, "text": text}, ensure_ascii=False) + '\n' for key, text in items)
+        with self._lock:
+            if self.cache_file:
+                with open(self.cache_file, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.entries.update(items)
+
+
+class TranslationStage:
+    """
+    Translate a collection of texts: identical texts are sent once, cached
+    translations are reused, the rest go out in batches (up to batch_size
+    texts and MAX_BATCH_CHARS characters) on `workers` threads with retry
+    and backoff. A batch that still fails is reported, not cached.
+    """
+
+    def __init__(self, backend=None, cache_file=None, batch_size=16, workers=4, retries=3,
+                 retry_delay=1.0, src='kn', dest='en'):
+        self.backend = backend or translators.create_backend('google')
+        self.cache = TranslationCache(cache_file)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.src = src
+        self.dest = dest
+
+    def _batches(self, texts):
+        batch, chars = [], 0
+        for text in texts:
+            if batch and (len(batch) == self.batch_size or chars + len(text) > MAX_BATCH_CHARS):
+                yield batch
+                batch, chars = [], 0
+            batch.append(text)
+            chars += len(text)
+        if batch:
+            yield batch
+
+    def _translate_batch(self, batch):
+        with metrics.stage('translate_batch'):
+            translations = translators.translate_with_retry(
+                self.backend, batch, src=self.src, dest=self.dest,
+                retries=self.retries, base_delay=self.retry_delay)
+        self.cache.put_many([(text_key(text, self.src, self.dest), translation)
+                             for text, translation in zip(batch, translations)])
+        return dict(zip(batch, translations))
+
+    def translate(self, texts):
+        """
+        Returns ({text: translation}, {text: error}) for the distinct texts
+        given; empty texts translate to themselves
+        """
+        translations, failures = {}, {}
+        pending = []
+        for text in dict.fromkeys(texts):
+            cached = self.cache.get(text_key(text, self.src, self.dest))
+            if cached is not None:
+                translations[text] = cached
+            elif not text.strip():
+                translations[text] = text
+            else:
+                pending.append(text)
+
+        batches = list(self._batches(pending))
+        print(f"{len(translations)} cached or empty, {len(pending)} to translate in {len(batches)} batches")
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            futures = {executor.submit(self._translate_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    translations.update(future.result())
+                except Exception as e:
+                    print(f"Error translating a batch of {len(futures[future])} texts: {e}")
+                    failures.update((text, str(e)) for text in futures[future])
+        return translations, failures
+
+
+def cache_path_for(output_file):
+    """Default translation cache location next to the JSON output"""
+    return os.path.splitext(output_file)[0] + '.cache.jsonl'
+
+
+def failures_path_for(output_file):
+    """Default location of the texts that could not be translated"""
+    return os.path.splitext(output_file)[0] + '.failures.json'
+
 
 # Function to translate Kannada text to English
-def translate_kannada_to_english(input_file, output_file):
-    # Initialize the Translator
-    translator = Translator()
+def translate_kannada_to_english(input_file, output_file, backend=None, cache_file=None, failures_file=None,
+                                 batch_size=16, workers=4):
+    """
+    Translate the {path: Kannada text} JSON in input_file into {path:
+    English text} in output_file. Paths whose text could not be translated
+    are left out of the output and listed in failures_file with the error;
+    running again retries only those (and any new text).
+    """
+    cache_file = cache_file or cache_path_for(output_file)
+    failures_file = failures_file or failures_path_for(output_file)
+    stage = TranslationStage(backend=backend, cache_file=cache_file, batch_size=batch_size, workers=workers)
 
     # Read the JSON input from the file
     with open(input_file, 'r', encoding='utf-8') as file:
         input_data = json.load(file)
 
-    translated_data = {}
+    start = time.perf_counter()
+    translations, errors = stage.translate(input_data.values())
 
-    # Translate each value in the JSON
+    translated_data = {}
+    failures = {}
     for audio_path, kannada_text in input_data.items():
-        try:
-            # Translate Kannada to English
-            translation = translator.translate(kannada_text, src='kn', dest='en')
-            translated_data[audio_path] = translation.text
-        except Exception as e:
-            translated_data[audio_path] = f"Error translating: {str(e)}"
+        if kannada_text in translations:
+            translated_data[audio_path] = translations[kannada_text]
+        else:
+            failures[audio_path] = {"text": kannada_text, "error": errors.get(kannada_text, "not translated")}
 
     # Write the translated data to the output file
-    with open(output_file, 'w', encoding='utf-8') as file:
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as file:
         json.dump(translated_data, file, ensure_ascii=False, indent=4)
+    os.replace(tmp_file, output_file)
+
+    if failures:
+        with open(failures_file, 'w', encoding='utf-8') as file:
+            json.dump(failures, file, ensure_ascii=False, indent=4)
+        print(f"{len(failures)} transcripts could not be translated; see {failures_file} and run again to retry")
+    elif os.path.exists(failures_file):
+        os.remove(failures_file)
 
-    print(f"Translation completed. Translated data saved to: {output_file}")
+    print(f"Translation completed in {time.perf_counter() - start:.1f}s. Translated data saved to: {output_file}")
+    return translated_data, failures
 
 def main():
-    input_file = "output.json"  # Input JSON file containing Kannada text
-    output_file = "translated_output.json"  # Output JSON file for English translation
+    parser = argparse.ArgumentParser(description="Translate Kannada transcripts to English")
+    parser.add_argument('--input', default="output.json", help="Input JSON file containing Kannada text")
+    parser.add_argument('--output', default="translated_output.json", help="Output JSON file for English translation")
+    parser.add_argument('--backend', default='google', choices=sorted(translators.BACKENDS))
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate-limit', type=float, default=None, help="Requests per second")
+    args = parser.parse_args()
+
+    backend = translators.create_backend(args.backend, rate_limit=args.rate_limit)
 
     # Translate Kannada text to English and save it
-    translate_kannada_to_english(input_file, output_file)
+    translate_kannada_to_english(args.input, args.output, backend=backend,
+                                 batch_size=args.batch_size, workers=args.workers)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,178 @@
+"""
+Bounded worker pool for slow requests (recording, recognition, search);
+a full queue raises QueueFull so the caller can answer 429.
+"""
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+import metrics
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+JOBS_FINISHED = metrics.counter('speech_jobs_finished', "Jobs finished, by kind and final state", ('kind', 'status'))
+JOB_WAIT_SECONDS = metrics.histogram('speech_job_wait_seconds', "Time jobs spent queued before a worker took them", ('kind',))
+
+
+class QueueFull(Exception):
+    """No room for another queued job"""
+
+
+class JobCancelled(Exception):
+    """Raised by a job function that noticed its cancel_event"""
+
+
+class Job:
+    """One submitted call; every state change bumps version and wakes waiters"""
+
+    def __init__(self, fn, args, kind):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.kind = kind
+        self.status = QUEUED
+        self.result = None
+        self.http_status = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.version = 0
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in FINAL_STATES
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def _update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the job's version differs from version (or timeout); returns the current version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def wait(self, timeout=None):
+        """Block until the job reaches a final state; True if it did"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.done, timeout)
+
+    def to_dict(self):
+        with self._changed:
+            info = {
+                "jobId": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "createdAt": self.created,
+                "version": self.version,
+            }
+            if self.started:
+                info["queuedMs"] = (self.started - self.created) * 1000
+            if self.finished and self.started:
+                info["runMs"] = (self.finished - self.started) * 1000
+            if self.status == DONE:
+                info["result"] = self.result
+                info["httpStatus"] = self.http_status
+            if self.error:
+                info["error"] = self.error
+            return info
+
+
+class JobQueue:
+    """
+    Run job functions fn(job, *args) -> (response body, HTTP status) on
+    `workers` threads with at most max_queued jobs waiting. Queued jobs
+    can be cancelled before they start; running ones get their
+    cancel_event set. Finished jobs are kept for keep_seconds.
+    """
+
+    def __init__(self, workers=4, max_queued=16, keep_seconds=600):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.keep_seconds = keep_seconds
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+
+    def submit(self, fn, *args, kind='job'):
+        """Queue fn(job, *args); raises QueueFull when max_queued jobs are already waiting"""
+        with self._lock:
+            self._reap()
+            if self._queued >= self.max_queued:
+                raise QueueFull(f"{self._queued} jobs already queued")
+            job = Job(fn, args, kind)
+            self._jobs[job.id] = job
+            self._queued += 1
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job, or None if unknown"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        job.cancel_event.set()
+        with self._lock:
+            if job.status == QUEUED:
+                # Frees its queue slot now; the worker skips it when it comes up
+                self._queued -= 1
+                job._update(status=CANCELLED, finished=time.time())
+                JOBS_FINISHED.inc(kind=job.kind, status=CANCELLED)
+        return job
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "maxQueued": self.max_queued, "queued": self._queued,
+                    "running": self._running, "tracked": len(self._jobs)}
+
+    def _reap(self):
+        # Forget finished jobs nobody fetched within keep_seconds (oldest first)
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.status == CANCELLED:
+                    continue
+                self._queued -= 1
+                self._running += 1
+                job._update(status=RUNNING, started=time.time())
+            JOB_WAIT_SECONDS.observe(job.started - job.created, kind=job.kind)
+
+            try:
+                body, http_status = job.fn(job, *job.args)
+                if job.cancelled:
+                    raise JobCancelled()
+                job._update(status=DONE, result=body, http_status=http_status, finished=time.time())
+            except JobCancelled:
+                job._update(status=CANCELLED, finished=time.time())
+            except Exception as e:
+                print(f"Job {job.id} ({job.kind}) failed: {e}")
+                job._update(status=FAILED, error=str(e), finished=time.time())
+            finally:
+                with self._lock:
+                    self._running -= 1
+            JOBS_FINISHED.inc(kind=job.kind, status=job.status)
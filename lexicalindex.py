@@ -0,0 +1,246 @@
+"""
+BM25 inverted index over the Kannada transcripts (output.json), and a hybrid
+search that scores its top candidates against the embedding index.
+"""
+import os
+import re
+import json
+import argparse
+import threading
+import unicodedata
+from collections import Counter
+import numpy as np
+import searchindex
+import embedindex
+
+DEFAULT_SOURCE_FILE = 'output.json'
+DEFAULT_INDEX_FILE = 'lexical_index.npz'
+FORMAT_VERSION = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Hybrid search: lexical candidates scored densely, and the weight of the
+# (max-normalised) BM25 score in the fused score
+HYBRID_CANDIDATES = 100
+HYBRID_WEIGHT = 0.5
+SEARCH_MODES = ('lexical', 'dense', 'hybrid')
+
+# Vowel signs and viramas stay inside words (a plain \w+ split cuts Kannada
+# words at every vowel sign); zero-width joiners are dropped and Kannada
+# digits read as ASCII digits
+_TOKEN = re.compile(r'[\w\u0C80-\u0CFF]+')
+_CLEANUP = {0x200C: None, 0x200D: None, **{0x0CE6 + digit: str(digit) for digit in range(10)}}
+
+# Longest first; a suffix is only stripped if at least MIN_STEM code points remain
+KANNADA_SUFFIXES = sorted([
+    'ಗಳನ್ನು', 'ಗಳಲ್ಲಿ', 'ಗಳಿಗೆ', 'ಗಳಿಂದ', 'ಗಳದ್ದು', 'ಗಳು', 'ಗಳ',
+    'ವನ್ನು', 'ಯನ್ನು', 'ನನ್ನು', 'ನ್ನು',
+    'ದಲ್ಲಿ', 'ಯಲ್ಲಿ', 'ನಲ್ಲಿ', 'ಲ್ಲಿ',
+    'ದಿಂದ', 'ಯಿಂದ', 'ನಿಂದ', 'ಇಂದ',
+    'ಕ್ಕೆ', 'ವಿಗೆ', 'ಯಿಗೆ', 'ನಿಗೆ', 'ಗೆ',
+    'ದ್ದು', 'ವು',
+], key=len, reverse=True)
+MIN_STEM = 2
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def stem(token):
+    """Strip one common Kannada case/plural suffix"""
+    for suffix in KANNADA_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    """Kannada-aware terms of a transcript or query"""
+    text = unicodedata.normalize('NFC', text).casefold().translate(_CLEANUP)
+    return [stem(token) for token in (match.strip('_') for match in _TOKEN.findall(text)) if token]
+
+
+class LexicalIndex:
+    """
+    BM25 over {chunk path: transcript}. Term t's postings are
+    docs[starts[t]:starts[t + 1]] with their BM25 weights in weights[...].
+    """
+
+    def __init__(self, paths, vocabulary, starts, docs, weights, source_fingerprint=None):
+        self.paths = paths
+        self.vocabulary = vocabulary
+        self.starts = starts
+        self.docs = docs
+        self.weights = weights
+        self.source_fingerprint = source_fingerprint or {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def version(self):
+        return self.source_fingerprint.get("sha256")
+
+    @classmethod
+    def build(cls, data, k1=K1, b=B, source_fingerprint=None):
+        """Index {chunk path: text}"""
+        paths = list(data)
+        vocabulary = {}
+        term_docs, term_tfs, lengths = [], [], np.zeros(len(paths), dtype=np.float32)
+        for doc, path in enumerate(paths):
+            counts = Counter(tokenize(data[path]))
+            lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                if term_id == len(term_docs):
+                    term_docs.append([])
+                    term_tfs.append([])
+                term_docs[term_id].append(doc)
+                term_tfs[term_id].append(tf)
+
+        df = np.array([len(docs) for docs in term_docs], dtype=np.int64)
+        starts = np.zeros(len(df) + 1, dtype=np.int64)
+        np.cumsum(df, out=starts[1:])
+        docs = np.fromiter((doc for docs in term_docs for doc in docs), dtype=np.int32, count=int(starts[-1]))
+        tfs = np.fromiter((tf for tfs in term_tfs for tf in tfs), dtype=np.float32, count=int(starts[-1]))
+
+        # weight = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg len))
+        idf = np.log1p((len(paths) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()) if len(paths) else 0.0, 1.0))
+        weights = np.repeat(idf, df) * tfs * (k1 + 1) / (tfs + norm[docs])
+        return cls(paths, vocabulary, starts, docs, weights.astype(np.float32), source_fingerprint)
+
+    def save(self, index_file):
+        """Write the index to index_file (.npz) atomically"""
+        meta = {"format": FORMAT_VERSION, "source_fingerprint": self.source_fingerprint,
+                "paths": self.paths, "vocabulary": list(self.vocabulary)}
+        tmp_path = index_file + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+                     starts=self.starts, docs=self.docs, weights=self.weights)
+        os.replace(tmp_path, index_file)
+
+    @classmethod
+    def load(cls, index_file):
+        """The saved index, or None if it is missing or in an older format"""
+        if not os.path.exists(index_file):
+            return None
+        with np.load(index_file) as saved:
+            meta = json.loads(saved['meta'].tobytes().decode('utf-8'))
+            if meta.get("format") != FORMAT_VERSION:
+                return None
+            vocabulary = {term: term_id for term_id, term in enumerate(meta["vocabulary"])}
+            return cls(meta["paths"], vocabulary, saved['starts'], saved['docs'], saved['weights'],
+                       meta["source_fingerprint"])
+
+    def scores(self, query):
+        """(doc ids, BM25 scores) of every document sharing a term with the query"""
+        term_ids = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not term_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        slices = [slice(self.starts[term_id], self.starts[term_id + 1]) for term_id in term_ids]
+        docs = np.concatenate([self.docs[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        matched, inverse = np.unique(docs, return_inverse=True)
+        return matched, np.bincount(inverse, weights=weights).astype(np.float32)
+
+    def search(self, query, top_k=5):
+        """[(chunk path, score), ...] best first"""
+        matched, scores = self.scores(query)
+        if len(matched) == 0:
+            return []
+        order, best = searchindex.top_k(scores, top_k)
+        return [(self.paths[matched[i]], float(score)) for i, score in zip(order[0], best[0])]
+
+
+def build_lexical_index(source_file=DEFAULT_SOURCE_FILE, index_file=DEFAULT_INDEX_FILE):
+    with open(source_file, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    print(f"Indexing {len(data)} transcripts from {source_file}...")
+    index = LexicalIndex.build(data, source_fingerprint=embedindex.file_fingerprint(source_file))
+    index.save(index_file)
+    print(f"Lexical index with {len(index)} entries and {len(index.vocabulary)} terms saved to: {index_file}")
+    return index
+
+
+def get_lexical_index(source_file=DEFAULT_SOURCE_FILE, index_file=DEFAULT_INDEX_FILE):
+    """
+    The process-wide lexical index of source_file, loaded from index_file
+    and rebuilt whenever the source changes; None if there is no source
+    """
+    if not os.path.exists(source_file):
+        return None
+    key = os.path.abspath(index_file)
+    index = _indexes.get(key)
+    meta = {"source_fingerprint": index.source_fingerprint} if index else None
+    if index is not None and not embedindex.source_changed(meta, source_file):
+        return index
+    with _indexes_lock:
+        index = _indexes.get(key) or LexicalIndex.load(index_file)
+        if index is None or embedindex.source_changed({"source_fingerprint": index.source_fingerprint}, source_file):
+            index = build_lexical_index(source_file, index_file)
+        _indexes[key] = index
+    return index
+
+
+def fuse(lexical_scores, dense_scores, weight=HYBRID_WEIGHT):
+    """weight * BM25 / max BM25 + (1 - weight) * cosine similarity"""
+    lexical_scores = np.asarray(lexical_scores, dtype=np.float32)
+    top = lexical_scores.max() if len(lexical_scores) else 0.0
+    lexical_part = lexical_scores / top if top > 0 else lexical_scores
+    return weight * lexical_part + (1 - weight) * np.asarray(dense_scores, dtype=np.float32)
+
+
+def hybrid_search(lexical, index, query, query_embedding, top_k=5, candidates=HYBRID_CANDIDATES, weight=HYBRID_WEIGHT):
+    """
+    [(chunk path, fused score), ...] best first. The lexical top
+    `candidates` are scored against the query embedding and fused; chunks
+    missing from the embedding index keep only their lexical part. When
+    fewer than top_k chunks share a term with the query, the rest come
+    from a full dense search.
+    """
+    found = lexical.search(query, candidates)
+    results = []
+    if found:
+        # Rows and vectors from one view, so a compaction cannot renumber them in between
+        view = index.view
+        paths = [path for path, _ in found]
+        rows = [view.row_of_path.get(path) for path in paths]
+        dense = np.zeros(len(paths), dtype=np.float32)
+        present = [i for i, row in enumerate(rows) if row is not None and row < len(view.alive) and view.alive[row]]
+        if present:
+            dense[present] = view.embeddings.take(np.array([rows[i] for i in present])) @ query_embedding
+        fused = fuse([score for _, score in found], dense, weight)
+        order = np.argsort(-fused, kind='stable')[:top_k]
+        results = [(paths[i], float(fused[i])) for i in order]
+    if len(results) < top_k:
+        seen = {path for path, _ in results}
+        for path, score in index.search_embedding(query_embedding, top_k=top_k + len(results)):
+            if path not in seen and len(results) < top_k:
+                seen.add(path)
+                results.append((path, (1 - weight) * score))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', nargs='?', default='build', choices=['build', 'search', 'tokenize'])
+    parser.add_argument('query', nargs='?', help="Query text for search / tokenize")
+    parser.add_argument('--source', default=DEFAULT_SOURCE_FILE, help="Kannada transcripts to index")
+    parser.add_argument('--index-file', default=DEFAULT_INDEX_FILE)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_lexical_index(args.source, args.index_file)
+    elif args.command == 'tokenize':
+        print(' '.join(tokenize(args.query or '')))
+    else:
+        index = get_lexical_index(args.source, args.index_file)
+        for path, score in index.search(args.query or '', args.top_k):
+            print(f"{score:8.3f}  {path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,57 @@
+import os
 import json
-import numpy as np
-from sentence_transformers import SentenceTransformer, util
+import threading
+import corpus
+import embedindex
 
-# Function to process query and find relevant audio files
-def find_relevant_audio_files(input_file, query, top_k=3):
-    # Load the pre-trained sentence-transformers model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-
-    # Load the JSON file
-    with open(input_file, 'r', encoding='utf-8') as file:
-        data = json.load(file)
+# Corpus stores by file, opened once and shared by every call
+_stores = {}
+_stores_lock = threading.Lock()
 
-    # Extract audio paths and corresponding text
-    audio_paths = list(data.keys())
-    sentences = list(data.values())
+# Function to get the shared corpus store of corpus_file
+def get_corpus_store(corpus_file):
+    """The CorpusStore of corpus_file, or None if there is none"""
+    if not corpus_file or not os.path.exists(corpus_file):
+        return None
+    store = _stores.get(corpus_file)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(corpus_file)
+            if store is None:
+                store = _stores[corpus_file] = corpus.CorpusStore(corpus_file)
+    return store
 
-    # Compute sentence embeddings for the sentences and query
-    sentence_embeddings = model.encode(sentences, convert_to_tensor=True)
-    query_embedding = model.encode(query, convert_to_tensor=True)
+# Function to process query and find relevant audio files
+def find_relevant_audio_files(input_file, query, top_k=3, corpus_file=corpus.DEFAULT_CORPUS_FILE):
+    return find_relevant_audio_files_batch(input_file, [query], top_k, corpus_file)[0]
 
-    # Compute cosine similarity between query and sentences
-    similarities = util.pytorch_cos_sim(query_embedding, sentence_embeddings)
+# Function to find relevant audio files for many queries at once
+def find_relevant_audio_files_batch(input_file, queries, top_k=3, corpus_file=corpus.DEFAULT_CORPUS_FILE):
+    """
+    One {chunk path: English transcript} dict per query. The queries are
+    encoded in one batched call and scored with one matrix product per
+    block (EmbeddingIndex.search_embeddings); the index and model stay loaded
+    between calls.
+    """
+    # Load the prebuilt transcript index (rebuilt only if input_file changed)
+    index = embedindex.get_index(input_file)
+    # Rows are resolved through the view that scored them, even if a compaction swaps it meanwhile
+    view = index.view
+    found = index.search_embeddings(embedindex.encode(list(queries)), top_k, view=view) if queries else []
+    paths = {view.audio_paths[row] for results in found for row, _ in results}
 
-    # Find the top_k most relevant sentences
-    top_results = np.argsort(similarities[0].cpu().numpy())[::-1][:top_k]
+    # Only the returned chunks are read, from the corpus store when there is one
+    texts = corpus.lookup_texts(paths, 'english', get_corpus_store(corpus_file), input_file)
 
     # Prepare the output with top results
-    relevant_audio = {}
-    for idx in top_results:
-        relevant_audio[audio_paths[idx]] = sentences[idx]
-
-    return relevant_audio
+    relevant = []
+    for results in found:
+        relevant_audio = {}
+        for index_row, _ in results:
+            path = view.audio_paths[index_row]
+            relevant_audio[path] = texts.get(path)
+        relevant.append(relevant_audio)
+    return relevant
 
 # Main function
 def main():
@@ -0,0 +1,356 @@
+"""
+End-to-end ingest (split -> transcribe -> translate -> embed) as a chain of
+thread pools joined by bounded queues.
+"""
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import corpus
+import audiochunk
+import embedindex
+import recognizers
+import translators
+import waveform
+import wavcache
+import virtualchunks
+from convertaudio import AudioTranscriber
+from engtranslate import TranslationStage, cache_path_for, failures_path_for
+from transcriptjournal import TranscriptionJournal, journal_path_for
+
+_DONE = object()
+
+
+class Stage:
+    """
+    `workers` threads taking items (or batches of up to batch_size items)
+    from inbox, passing them to fn and putting everything fn yields on
+    outbox. The last worker to see the end of the input forwards it.
+    """
+
+    def __init__(self, name, fn, inbox, outbox=None, workers=1, batch_size=1, batch_wait=0.2):
+        self.name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self.started = None
+        self.finished = None
+        self._running = workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _next_batch(self):
+        item = self.inbox.get()
+        if item is _DONE:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self.inbox.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _DONE:
+                # Leave the end marker for the sibling workers
+                self.inbox.put(_DONE)
+                break
+            batch.append(item)
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                self.inbox.put(_DONE)
+                break
+            start = time.perf_counter()
+            produced = 0
+            try:
+                for result in self.fn(batch):
+                    if self.outbox is not None:
+                        self.outbox.put(result)
+                    produced += 1
+            except Exception as e:
+                print(f"[{self.name}] error: {e}")
+                with self._lock:
+                    self.errors += 1
+            with self._lock:
+                self.items_in += len(batch)
+                self.items_out += produced
+                self.busy += time.perf_counter() - start
+
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            self.finished = time.perf_counter()
+            if self.outbox is not None:
+                self.outbox.put(_DONE)
+
+    def start(self):
+        self.started = time.perf_counter()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def sample_depth(self):
+        depth = self.inbox.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        return depth
+
+    def report(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        rate = self.items_in / elapsed if elapsed > 0 else 0.0
+        return (f"{self.name:<10} in {self.items_in:>6}  out {self.items_out:>6}  {rate:8.2f}/s  "
+                f"max queue {self.max_depth:>4}  "
+                f"busy {self.busy:7.1f}s  errors {self.errors}")
+
+
+class IngestPipeline:
+    """
+    Wire the four stages together for one run. Transcriptions go through a
+    TranscriptionJournal and translations through the translation cache,
+    so re-running after an interruption only redoes unfinished chunks.
+    """
+
+    def __init__(self, chunk_folder='audio_chunks_database', output_file='output.json',
+                 translated_file='translated_output.json', index_dir=embedindex.DEFAULT_INDEX_DIR,
+                 transcriber=None, translation_stage=None, chunk_duration_ms=30000,
+                 split_workers=2, transcribe_workers=8, translate_workers=2, embed_workers=1,
+                 translate_batch=16, embed_batch=64, queue_size=64, corpus_file=corpus.DEFAULT_CORPUS_FILE,
+                 peaks_folder=waveform.PEAKS_FOLDER, preview_folder=None, virtual=False,
+                 manifest_file=virtualchunks.DEFAULT_MANIFEST_FILE, wav_cache_dir=wavcache.DEFAULT_CACHE_DIR):
+        self.chunk_folder = chunk_folder
+        self.peaks_folder = peaks_folder
+        self.preview_folder = preview_folder
+        self.output_file = output_file
+        self.translated_file = translated_file
+        self.index_dir = index_dir
+        self.transcriber = transcriber or AudioTranscriber()
+        self.translation_stage = translation_stage or TranslationStage(cache_file=cache_path_for(translated_file))
+        self.chunk_duration_ms = chunk_duration_ms
+        self.manifest = virtualchunks.ChunkManifest(manifest_file) if virtual else None
+        self.wav_cache_dir = wav_cache_dir
+        # Content hashes, since re-splitting rewrites the chunk files
+        self.journal = TranscriptionJournal(journal_path_for(output_file), match='hash')
+        if embedindex.load_meta(index_dir) is None:
+            embedindex.create_index(index_dir)
+        self.index = embedindex.EmbeddingIndex(index_dir)
+        self.corpus = corpus.CorpusStore(corpus_file) if corpus_file else None
+
+        self.transcripts = {}
+        self.translations = {}
+        self.failures = {}
+        self.chunk_sources = {}
+        self._results_lock = threading.Lock()
+
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(4)]
+        self.stages = [
+            Stage('split', self._split, self.queues[0], self.queues[1], workers=split_workers),
+            Stage('transcribe', self._transcribe, self.queues[1], self.queues[2], workers=transcribe_workers),
+            Stage('translate', self._translate, self.queues[2], self.queues[3], workers=translate_workers,
+                  batch_size=translate_batch),
+            Stage('embed', self._embed, self.queues[3], workers=embed_workers, batch_size=embed_batch),
+        ]
+
+    def _split(self, batch):
+        for file_path, output_dir in batch:
+            relative = os.path.relpath(output_dir, self.chunk_folder)
+            peaks_dir = os.path.join(self.peaks_folder, relative) if self.peaks_folder else None
+            if self.manifest is not None:
+                yield from self._plan_virtual(file_path, relative, peaks_dir)
+                continue
+            preview_dir = os.path.join(self.preview_folder, relative) if self.preview_folder else None
+            chunks = audiochunk.iter_chunks_streaming(file_path, self.chunk_duration_ms, output_dir,
+                                                      peaks_dir, preview_dir)
+            for number, (chunk_path, seconds) in enumerate(chunks):
+                start_ms = number * self.chunk_duration_ms
+                with self._results_lock:
+                    self.chunk_sources[chunk_path] = (file_path, start_ms, start_ms + round(seconds * 1000))
+                yield chunk_path
+
+    def _plan_virtual(self, file_path, relative, peaks_dir):
+        plan = virtualchunks.plan_source(file_path, self.chunk_duration_ms, relative, self.wav_cache_dir, peaks_dir)
+        for key in self.manifest.add(plan):
+            chunk = self.manifest.get(key)
+            chunk_path = os.path.join(self.chunk_folder, key)
+            with self._results_lock:
+                self.chunk_sources[chunk_path] = (file_path, round(chunk["start"] * 1000), round(chunk["end"] * 1000))
+            yield chunk_path
+
+    def _transcribe(self, batch):
+        for chunk_path in batch:
+            key = os.path.relpath(chunk_path, self.chunk_folder)
+            virtual = self.manifest is not None and key in self.manifest
+            identity = self.manifest.identity(key) if virtual else None
+            if self.journal.is_done(chunk_path, identity):
+                text = self.journal.text(chunk_path)
+            else:
+                if virtual:
+                    text = self.transcriber.transcribe_samples(self.manifest.samples(key), self.manifest.rate)
+                else:
+                    text = self.transcriber.transcribe_audio(chunk_path)
+                if not text:
+                    continue
+                self.journal.record(chunk_path, text, identity)
+            with self._results_lock:
+                self.transcripts[key] = text
+            yield key, text
+
+    def _translate(self, batch):
+        translations, errors = self.translation_stage.translate([text for _, text in batch])
+        for key, text in batch:
+            if text in translations:
+                yield key, translations[text]
+            else:
+                with self._results_lock:
+                    self.failures[key] = {"text": text, "error": errors.get(text, "not translated")}
+
+    def _embed(self, batch):
+        entries = dict(batch)
+        self.index.ingest(entries, audio_folder=self.chunk_folder, compact=False)
+        with self._results_lock:
+            self.translations.update(entries)
+            rows = []
+            for key, english in entries.items():
+                _, start_ms, end_ms = self.chunk_sources.get(os.path.join(self.chunk_folder, key),
+                                                             (None, None, None))
+                # The stem, as import_json derives it from the chunk name
+                source_file = corpus.parse_chunk_name(key)[0]
+                rows.append({"chunk_id": key, "source_file": source_file, "start_ms": start_ms, "end_ms": end_ms,
+                             "kannada": self.transcripts.get(key), "english": english,
+                             "embedding_key": self.index.key_of(key)})
+        if self.corpus is not None:
+            self.corpus.upsert(rows)
+        yield from entries
+
+    def _monitor(self, stop, interval):
+        while not stop.wait(interval):
+            print(" | ".join(f"{stage.name} {stage.items_in}/{stage.sample_depth()}q" for stage in self.stages))
+
+    def _write_json(self, path, updates):
+        data = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        data.update(updates)
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=4)
+        os.replace(tmp_file, path)
+
+    def run(self, input_folder, report_interval=5.0):
+        """Push every supported file under input_folder through the stages"""
+        started = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+        stop = threading.Event()
+        monitor = threading.Thread(target=self._monitor, args=(stop, report_interval), daemon=True)
+        monitor.start()
+
+        for root, dirs, files in os.walk(input_folder):
+            dirs.sort()
+            for file in sorted(files):
+                if file.lower().endswith(audiochunk.SUPPORTED_FORMATS):
+                    output_dir = os.path.join(self.chunk_folder, os.path.relpath(root, input_folder))
+                    self.queues[0].put((os.path.join(root, file), output_dir))
+        self.queues[0].put(_DONE)
+
+        for stage in self.stages:
+            stage.join()
+        stop.set()
+        monitor.join()
+        if self.manifest is not None:
+            self.manifest.save()
+
+        # Same files the separate scripts produce. Syncing against the merged
+        # JSON also picks up chunks from earlier runs missing from the index;
+        # chunks embedded above are unchanged and are not encoded again.
+        self._write_json(self.output_file, self.transcripts)
+        self._write_json(self.translated_file, self.translations)
+        failures_file = failures_path_for(self.translated_file)
+        if self.failures:
+            with open(failures_file, 'w', encoding='utf-8') as file:
+                json.dump(self.failures, file, ensure_ascii=False, indent=4)
+        elif os.path.exists(failures_file):
+            os.remove(failures_file)
+        self.index.sync(self.translated_file, audio_folder=self.chunk_folder)
+        compaction = self.index.maybe_compact()
+        if compaction is not None:
+            compaction.join()
+
+        elapsed = time.perf_counter() - started
+        print(f"Pipeline finished in {elapsed:.1f}s: {len(self.transcripts)} transcribed, "
+              f"{len(self.translations)} embedded, {len(self.failures)} translation failures")
+        for stage in self.stages:
+            print(stage.report())
+        return {
+            "seconds": elapsed,
+            "transcribed": len(self.transcripts),
+            "embedded": len(self.translations),
+            "failures": len(self.failures),
+            "stages": {stage.name: {"in": stage.items_in, "out": stage.items_out, "errors": stage.errors,
+                                    "busy": stage.busy, "max_queue": stage.max_depth,
+                                    "seconds": stage.finished - stage.started} for stage in self.stages},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default='data', help="Folder of source recordings")
+    parser.add_argument('--chunks', default='audio_chunks_database', help="Folder the chunks are written to")
+    parser.add_argument('--output', default='output.json', help="Kannada transcripts")
+    parser.add_argument('--translated', default='translated_output.json', help="English translations")
+    parser.add_argument('--index-dir', default=embedindex.DEFAULT_INDEX_DIR)
+    parser.add_argument('--corpus', default=corpus.DEFAULT_CORPUS_FILE, help="Corpus store to update")
+    parser.add_argument('--peaks', default=waveform.PEAKS_FOLDER, help="Folder for waveform peaks ('' to skip)")
+    parser.add_argument('--previews', default=None, metavar='FOLDER',
+                        help="Also encode low-bitrate previews into FOLDER (needs ffmpeg)")
+    parser.add_argument('--virtual', action='store_true',
+                        help="Record chunks in the manifest instead of writing chunk files")
+    parser.add_argument('--manifest', default=virtualchunks.DEFAULT_MANIFEST_FILE, help="Virtual chunk manifest")
+    parser.add_argument('--wav-cache', default=wavcache.DEFAULT_CACHE_DIR, help="Decoded copies of the recordings")
+    parser.add_argument('--chunk-ms', type=int, default=30000)
+    parser.add_argument('--split-workers', type=int, default=2)
+    parser.add_argument('--transcribe-workers', type=int, default=8)
+    parser.add_argument('--translate-workers', type=int, default=2)
+    parser.add_argument('--embed-workers', type=int, default=1)
+    parser.add_argument('--translate-batch', type=int, default=16)
+    parser.add_argument('--embed-batch', type=int, default=64)
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--recognizer', default='google', choices=sorted(recognizers.BACKENDS))
+    parser.add_argument('--translator', default='google', choices=sorted(translators.BACKENDS))
+    parser.add_argument('--report-interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    transcriber = AudioTranscriber(backend=recognizers.create_backend(args.recognizer))
+    translation_stage = TranslationStage(backend=translators.create_backend(args.translator),
+                                         cache_file=cache_path_for(args.translated))
+    pipeline = IngestPipeline(args.chunks, args.output, args.translated, args.index_dir,
+                              transcriber=transcriber, translation_stage=translation_stage,
+                              chunk_duration_ms=args.chunk_ms, split_workers=args.split_workers,
+                              transcribe_workers=args.transcribe_workers,
+                              translate_workers=args.translate_workers, embed_workers=args.embed_workers,
+                              translate_batch=args.translate_batch, embed_batch=args.embed_batch,
+                              queue_size=args.queue_size, corpus_file=args.corpus,
+                              peaks_folder=args.peaks, preview_folder=args.previews, virtual=args.virtual,
+                              manifest_file=args.manifest, wav_cache_dir=args.wav_cache)
+    pipeline.run(args.input, report_interval=args.report_interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import time
+import random
+import threading
+import speech_recognition as sr
+import metrics
+
+RETRIES = metrics.counter('speech_recognition_retries', "Recognition requests retried after a RequestError")
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` calls per second, bursts up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class GoogleBackend:
+    """Google Web Speech API through speech_recognition"""
+
+    name = 'google'
+
+    def __init__(self, language='kn-IN', rate_limit=None):
+        self.language = language
+        self.recognizer = sr.Recognizer()
+        self.limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    def recognize(self, audio_data):
+        return self.recognizer.recognize_google(audio_data, language=self.language)
+
+
+class StubBackend:
+    """
+    Offline stand-in for benchmarking: sleeps for `latency` (+/- jitter)
+    seconds, fails with sr.RequestError at `failure_rate`, and returns a
+    deterministic transcript
+    """
+
+    name = 'stub'
+
+    def __init__(self, latency=0.5, jitter=0.0, failure_rate=0.0, rate_limit=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.limiter = RateLimiter(rate_limit) if rate_limit else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def recognize(self, audio_data):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.failure_rate
+        time.sleep(delay)
+        if fail:
+            raise sr.RequestError("stub backend failure")
+        seconds = len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width)
+        return f"stub transcript {seconds:.2f}s"
+
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def create_backend(name='google', **params):
+    """Instantiate a recognizer backend by name, e.g. create_backend('stub', latency=0.2)"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown recognizer backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**params)
+
+
+def recognize_with_retry(backend, audio_data, retries=3, base_delay=1.0, max_delay=30.0):
+    """
+    Call backend.recognize under its rate limiter, retrying sr.RequestError
+    with exponential backoff and full jitter. sr.UnknownValueError is not
+    retried.
+    """
+    for attempt in range(retries + 1):
+        if backend.limiter:
+            backend.limiter.acquire()
+        try:
+            return backend.recognize(audio_data)
+        except sr.RequestError as e:
+            if attempt == retries:
+                raise
+            RETRIES.inc()
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"Recognition request failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
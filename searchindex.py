@@ -0,0 +1,323 @@
+import os
+import numpy as np
+
+
+def top_k(scores, k):
+    """
+    Row-wise top-k of a (n_queries, n_rows) score matrix using argpartition,
+    so only the k winners are sorted. Returns (indices, scores), best first.
+    """
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+# Storage precisions for embedding matrices; see quantize()
+DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+
+# Quantized rows are widened to float32 this many at a time while scoring
+QUANTIZED_BLOCK_ROWS = 16384
+
+
+def quantize(embeddings, dtype):
+    """
+    (codes, scales) for storing float32 rows at dtype. int8 is symmetric
+    per row: row ~= codes * scale with scale = max|row| / 127; scales is
+    None for float32 and float16.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dtype == 'float32':
+        return embeddings, None
+    if dtype == 'float16':
+        return embeddings.astype(np.float16), None
+    if dtype == 'int8':
+        scales = np.abs(embeddings).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        codes = np.rint(embeddings / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown embedding dtype '{dtype}', expected one of: {', '.join(DTYPES)}")
+
+
+class QuantizedMatrix:
+    """
+    float16 or per-row scaled int8 codes (normally memory-mapped) that read
+    back as float32 rows. scores() works on the codes a block at a time and
+    applies the int8 scales to the dot products, so the full-precision
+    matrix is never materialised.
+    """
+
+    ndim = 2
+
+    def __init__(self, codes, scales=None):
+        self.codes = codes
+        self.scales = scales
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __getitem__(self, key):
+        rows = np.asarray(self.codes[key], dtype=np.float32)
+        if self.scales is not None:
+            rows *= np.asarray(self.scales[key], dtype=np.float32)[..., None]
+        return rows
+
+    def scores(self, queries, block_rows=QUANTIZED_BLOCK_ROWS):
+        """queries @ rows.T"""
+        out = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), block_rows):
+            stop = start + block_rows
+            out[:, start:stop] = queries @ np.asarray(self.codes[start:stop], dtype=np.float32).T
+            if self.scales is not None:
+                out[:, start:stop] *= self.scales[start:stop]
+        return out
+
+
+def inner_products(embeddings, queries):
+    """queries @ embeddings.T, one block at a time for segmented storage"""
+    blocks = getattr(embeddings, 'blocks', [embeddings])
+    if not blocks:
+        return np.empty((len(queries), 0), dtype=np.float32)
+    return np.concatenate([block.scores(queries) if isinstance(block, QuantizedMatrix) else queries @ np.asarray(block).T
+                           for block in blocks], axis=1)
+
+
+def apply_mask(scores, alive):
+    """
+    Knock out dead rows. Rows beyond len(alive) were appended after the
+    mask was taken and are not visible yet.
+    """
+    if alive is None:
+        return scores
+    visible = min(len(alive), scores.shape[1])
+    scores[:, :visible][:, ~alive[:visible]] = -np.inf
+    scores[:, visible:] = -np.inf
+    return scores
+
+
+class ExactIndex:
+    """Brute-force inner product over every row with argpartition top-k"""
+
+    name = 'exact'
+    files = ()
+
+    def __init__(self):
+        self.embeddings = None
+
+    def build(self, embeddings):
+        self.embeddings = embeddings
+
+    def save(self, index_dir):
+        pass
+
+    def load(self, index_dir, embeddings):
+        self.embeddings = embeddings
+        return True
+
+    def add(self, start_row):
+        """Rows from start_row on were appended to the shared embeddings"""
+        pass
+
+    def search(self, queries, k, alive=None):
+        """
+        Return (indices, scores), each of shape (n_queries, k). Rows where
+        alive is False score -inf.
+        """
+        queries = np.atleast_2d(queries)
+        if self.embeddings is None or len(self.embeddings) == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        return top_k(apply_mask(inner_products(self.embeddings, queries), alive), k)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: rows are clustered with spherical k-means and a
+    query only scans the rows of its nprobe closest clusters.
+
+    nlist   number of clusters (default about 4 * sqrt(rows))
+    nprobe  clusters scanned per query; raise it for recall, lower it for latency
+    """
+
+    name = 'ivf'
+    CENTROIDS_FILE = 'ivf_centroids.npy'
+    OFFSETS_FILE = 'ivf_offsets.npy'
+    IDS_FILE = 'ivf_ids.npy'
+    files = (CENTROIDS_FILE, OFFSETS_FILE, IDS_FILE)
+
+    def __init__(self, nlist=None, nprobe=8, train_iters=10, train_sample=100000, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.train_sample = train_sample
+        self.seed = seed
+        self.embeddings = None
+        self.centroids = None
+        self.list_offsets = None
+        self.list_ids = None
+        # (ids, clusters) of rows added after the lists were built, swapped as one tuple
+        self.extra = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    def _train(self, embeddings):
+        rng = np.random.default_rng(self.seed)
+        n = len(embeddings)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        sample_ids = rng.choice(n, size=min(n, max(self.train_sample, nlist)), replace=False)
+        sample = np.asarray(embeddings[np.sort(sample_ids)], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(self.train_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            # Per-cluster sums via one sort and reduceat instead of np.add.at
+            order = np.argsort(assign, kind='stable')
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums = np.zeros_like(centroids)
+            sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+            # Re-seed empty clusters from random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+        return centroids.astype(np.float32)
+
+    def _assign(self, embeddings, block=65536):
+        assign = np.empty(len(embeddings), dtype=np.int64)
+        for start in range(0, len(embeddings), block):
+            rows = np.asarray(embeddings[start:start + block], dtype=np.float32)
+            assign[start:start + block] = np.argmax(rows @ self.centroids.T, axis=1)
+        return assign
+
+    def build(self, embeddings):
+        self.embeddings = embeddings
+        if len(embeddings) == 0:
+            self.centroids = np.empty((0, embeddings.shape[1] if embeddings.ndim == 2 else 0), dtype=np.float32)
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            self.list_ids = np.empty(0, dtype=np.int64)
+            return
+        self.centroids = self._train(embeddings)
+        self.build_lists(np.arange(len(embeddings), dtype=np.int64), self._assign(embeddings))
+
+    def build_lists(self, ids, assign):
+        """Lay out ids contiguously by cluster (CSR offsets + ids)"""
+        order = np.argsort(assign, kind='stable')
+        self.list_ids = ids[order]
+        counts = np.bincount(assign, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.extra = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    def _list_assign(self):
+        return np.repeat(np.arange(len(self.centroids)), np.diff(self.list_offsets))
+
+    def add(self, start_row):
+        """
+        Assign rows appended from start_row on to the trained clusters,
+        without retraining; cost is proportional to the new rows only
+        """
+        if self.centroids is None or len(self.centroids) == 0:
+            self.build(self.embeddings)
+            return
+        new_ids = np.arange(start_row, len(self.embeddings), dtype=np.int64)
+        if len(new_ids) == 0:
+            return
+        extra_ids, extra_assign = self.extra
+        self.extra = (np.concatenate([extra_ids, new_ids]),
+                      np.concatenate([extra_assign, self._assign(self.embeddings[start_row:])]))
+
+    def save(self, index_dir):
+        extra_ids, extra_assign = self.extra
+        if len(extra_ids):
+            # Fold added rows into the saved lists
+            self.build_lists(np.concatenate([self.list_ids, extra_ids]),
+                             np.concatenate([self._list_assign(), extra_assign]))
+        np.save(os.path.join(index_dir, self.CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(index_dir, self.OFFSETS_FILE), self.list_offsets)
+        np.save(os.path.join(index_dir, self.IDS_FILE), self.list_ids)
+
+    def load(self, index_dir, embeddings):
+        """Load saved clusters; False if they are missing or do not match embeddings"""
+        paths = [os.path.join(index_dir, f) for f in self.files]
+        if not all(os.path.exists(p) for p in paths):
+            return False
+        centroids, offsets, ids = (np.load(p, mmap_mode='r') for p in paths)
+        if len(ids) > len(embeddings) or (self.nlist and len(centroids) != self.nlist):
+            return False
+        self.embeddings = embeddings
+        self.centroids = np.asarray(centroids)
+        self.list_offsets = np.asarray(offsets)
+        self.list_ids = ids
+        self.extra = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        # Rows appended since the lists were saved
+        self.add(len(ids))
+        return True
+
+    def search(self, queries, k, alive=None):
+        """
+        Return (indices, scores), each of shape (n_queries, k); -1 pads short
+        results. Rows where alive is False are skipped.
+        """
+        queries = np.atleast_2d(queries).astype(np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if self.embeddings is None or len(self.embeddings) == 0:
+            return indices[:, :0], scores[:, :0]
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes, _ = top_k(queries @ self.centroids.T, nprobe)
+        extra_ids, extra_assign = self.extra
+        for qi, query in enumerate(queries):
+            candidates = np.concatenate([
+                self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes[qi]
+            ] + [extra_ids[np.isin(extra_assign, probes[qi])]])
+            if alive is not None:
+                candidates = candidates[candidates < len(alive)]
+                candidates = candidates[alive[candidates]]
+            if len(candidates) == 0:
+                continue
+            candidates.sort()
+            cand_scores = np.asarray(self.embeddings[candidates]) @ query
+            best, best_scores = top_k(cand_scores, k)
+            indices[qi, :best.shape[1]] = candidates[best[0]]
+            scores[qi, :best.shape[1]] = best_scores[0]
+        width = int((indices >= 0).sum(axis=1).max()) if len(queries) else 0
+        return indices[:, :width], scores[:, :width]
+
+
+BACKENDS = {
+    ExactIndex.name: ExactIndex,
+    IVFIndex.name: IVFIndex,
+}
+
+
+def remove_backend_files(index_dir):
+    """Delete saved backend structures, e.g. after the embeddings were rebuilt"""
+    for backend in BACKENDS.values():
+        for filename in backend.files:
+            path = os.path.join(index_dir, filename)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def create_backend(name='exact', **params):
+    """Instantiate a search backend by name, e.g. create_backend('ivf', nprobe=16)"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown search backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**params)
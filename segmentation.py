@@ -0,0 +1,163 @@
+"""
+Vectorised silence segmentation over a PCM array, matching pydub.silence
+but returning sample offsets instead of copied segments.
+"""
+import numpy as np
+
+_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def segment_to_array(audio_segment):
+    """(frames, channels) view of a pydub AudioSegment's raw PCM"""
+    dtype = _DTYPES.get(audio_segment.sample_width)
+    if dtype is None:
+        raise ValueError(f"Unsupported sample width: {audio_segment.sample_width}")
+    samples = np.frombuffer(audio_segment.raw_data, dtype=dtype)
+    return samples.reshape(-1, audio_segment.channels)
+
+
+def to_mono(samples):
+    """Average the channels of a (frames, channels) array, keeping its dtype"""
+    frames = _as_frames(samples)
+    if frames.shape[1] == 1:
+        return frames[:, 0]
+    return frames.mean(axis=1).astype(frames.dtype)
+
+
+def _as_frames(samples):
+    samples = np.asarray(samples)
+    return samples.reshape(-1, 1) if samples.ndim == 1 else samples
+
+
+def max_amplitude(samples):
+    """pydub's max_possible_amplitude for the array's sample width"""
+    return float(2 ** (np.asarray(samples).dtype.itemsize * 8 - 1))
+
+
+def length_ms(n_frames, sample_rate):
+    """Length in ms exactly as pydub's len(AudioSegment) rounds it"""
+    return round(1000 * (n_frames / sample_rate))
+
+
+def ms_to_frame(ms, sample_rate):
+    """Frame offset of a millisecond position, truncated like pydub's frame_count"""
+    return (np.asarray(ms, dtype=np.int64) * sample_rate) // 1000
+
+
+def dbfs(samples):
+    """Loudness of the whole array in dBFS (pydub's AudioSegment.dBFS)"""
+    frames = _as_frames(samples)
+    if frames.size == 0:
+        return -float('inf')
+    rms = int(np.sqrt(np.mean(np.square(frames, dtype=np.float64))))
+    if rms == 0:
+        return -float('inf')
+    return 20 * np.log10(rms / max_amplitude(frames))
+
+
+def ms_energy(samples, sample_rate, block_frames=1 << 22):
+    """
+    Cumulative sum of squared samples (over all channels) at every
+    millisecond boundary of the pydub grid, computed block by block to
+    bound memory on long recordings. Integer arithmetic keeps window sums
+    exact. Returns (cumulative energy with a leading 0, length in ms).
+    """
+    frames = _as_frames(samples)
+    n_frames = len(frames)
+    n_ms = length_ms(n_frames, sample_rate)
+    bounds = np.minimum(ms_to_frame(np.arange(n_ms + 1), sample_rate), n_frames)
+
+    cumulative = np.zeros(n_ms + 1, dtype=np.int64)
+    running = 0
+    for start in range(0, n_frames, block_frames):
+        stop = min(n_frames, start + block_frames)
+        block = frames[start:stop].astype(np.int64)
+        block_cumulative = np.concatenate([[0], np.cumsum((block * block).sum(axis=1))])
+        # Boundaries that fall inside this block
+        lo = np.searchsorted(bounds, start, side='left')
+        hi = np.searchsorted(bounds, stop, side='right')
+        cumulative[lo:hi] = running + block_cumulative[bounds[lo:hi] - start]
+        running += int(block_cumulative[-1])
+    return cumulative, n_ms
+
+
+def detect_silence(samples, sample_rate, min_silence_len=1000, silence_thresh=-16, seek_step=1):
+    """Silent [start_ms, end_ms] ranges, as pydub.silence.detect_silence returns them"""
+    frames = _as_frames(samples)
+    cumulative, seg_len = ms_energy(frames, sample_rate)
+    if seg_len < min_silence_len:
+        return []
+
+    threshold = 10 ** (silence_thresh / 20) * max_amplitude(frames)
+    last_slice_start = seg_len - min_silence_len
+    starts = np.arange(0, last_slice_start + 1, seek_step, dtype=np.int64)
+    if last_slice_start % seek_step:
+        starts = np.append(starts, last_slice_start)
+
+    # Every window's RMS from the cumulative energy; counts include the zero
+    # padding pydub adds when the last window runs past the data
+    ends = starts + min_silence_len
+    counts = (ms_to_frame(ends, sample_rate) - ms_to_frame(starts, sample_rate)) * frames.shape[1]
+    sums = (cumulative[ends] - cumulative[starts]).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rms = np.floor(np.sqrt(np.where(counts > 0, sums / counts, 0.0)))
+    silence_starts = starts[rms <= threshold]
+    if len(silence_starts) == 0:
+        return []
+
+    # Merge runs of silent windows into ranges (pydub's continuity/gap rule)
+    gaps = np.diff(silence_starts)
+    breaks = np.flatnonzero((gaps != seek_step) & (gaps > min_silence_len))
+    range_starts = np.concatenate([[silence_starts[0]], silence_starts[breaks + 1]])
+    range_ends = np.concatenate([silence_starts[breaks], [silence_starts[-1]]]) + min_silence_len
+    return [[int(s), int(e)] for s, e in zip(range_starts, range_ends)]
+
+
+def detect_nonsilent(samples, sample_rate, min_silence_len=1000, silence_thresh=-16, seek_step=1):
+    """Non-silent [start_ms, end_ms] ranges, as pydub.silence.detect_nonsilent returns them"""
+    silent_ranges = detect_silence(samples, sample_rate, min_silence_len, silence_thresh, seek_step)
+    len_seg = length_ms(len(_as_frames(samples)), sample_rate)
+    if not silent_ranges:
+        return [[0, len_seg]]
+    if silent_ranges[0][0] == 0 and silent_ranges[0][1] == len_seg:
+        return []
+
+    prev_end = 0
+    nonsilent_ranges = []
+    for start, end in silent_ranges:
+        nonsilent_ranges.append([prev_end, start])
+        prev_end = end
+    if silent_ranges[-1][1] != len_seg:
+        nonsilent_ranges.append([prev_end, len_seg])
+    if nonsilent_ranges[0] == [0, 0]:
+        nonsilent_ranges.pop(0)
+    return nonsilent_ranges
+
+
+def split_ranges_ms(samples, sample_rate, min_silence_len=1000, silence_thresh=-16, keep_silence=100, seek_step=1):
+    """The [start_ms, end_ms] windows pydub.silence.split_on_silence would cut out"""
+    len_seg = length_ms(len(_as_frames(samples)), sample_rate)
+    if isinstance(keep_silence, bool):
+        keep_silence = len_seg if keep_silence else 0
+
+    ranges = [[start - keep_silence, end + keep_silence]
+              for start, end in detect_nonsilent(samples, sample_rate, min_silence_len, silence_thresh, seek_step)]
+    # Overlapping padding is split evenly between neighbours
+    for current, following in zip(ranges, ranges[1:]):
+        if following[0] < current[1]:
+            current[1] = (current[1] + following[0]) // 2
+            following[0] = current[1]
+    return [[max(start, 0), min(end, len_seg)] for start, end in ranges]
+
+
+def split_on_silence(samples, sample_rate, min_silence_len=1000, silence_thresh=-16, keep_silence=100, seek_step=1):
+    """
+    Sample offsets (start, end) of the chunks pydub.silence.split_on_silence
+    would return; samples[start:end] is the chunk, no audio is copied
+    """
+    ranges = split_ranges_ms(samples, sample_rate, min_silence_len, silence_thresh, keep_silence, seek_step)
+    if not ranges:
+        return np.empty((0, 2), dtype=np.int64)
+    n_frames = len(_as_frames(samples))
+    offsets = ms_to_frame(np.array(ranges, dtype=np.int64), sample_rate)
+    return np.minimum(offsets, n_frames)
@@ -0,0 +1,103 @@
+import os
+import json
+import hashlib
+import threading
+
+
+def file_identity(path, match='stat'):
+    """
+    What a journal entry is matched on: size + mtime ('stat'), or the
+    SHA-256 of the file contents ('hash') when mtimes are unreliable
+    """
+    stat = os.stat(path)
+    identity = {"size": stat.st_size}
+    if match == 'hash':
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        identity["sha256"] = sha.hexdigest()
+    else:
+        identity["mtime"] = stat.st_mtime
+    return identity
+
+
+class TranscriptionJournal:
+    """
+    Append-only JSONL journal of finished transcriptions, flushed and
+    fsynced after every file so a crash loses at most the file in flight.
+    Each line is {"path", "size", "mtime" or "sha256", "text"}; later lines
+    for the same path win.
+    """
+
+    def __init__(self, journal_file, match='stat'):
+        self.journal_file = journal_file
+        self.match = match
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                # Drop a torn last line from a crash mid-write so appends start clean
+                f.truncate(data.rfind(b'\n') + 1)
+        for line in data.decode('utf-8', errors='replace').splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self.entries[entry["path"]] = entry
+
+    def is_done(self, audio_path, identity=None):
+        """
+        True if audio_path is journaled and unchanged since. identity
+        replaces file_identity for entries without a file of their own
+        (virtual chunks, see virtualchunks.ChunkManifest.identity)
+        """
+        entry = self.entries.get(audio_path)
+        if entry is None:
+            return False
+        identity = identity or file_identity(audio_path, self.match)
+        return all(entry.get(key) == value for key, value in identity.items())
+
+    def text(self, audio_path):
+        entry = self.entries.get(audio_path)
+        return entry["text"] if entry else None
+
+    def record(self, audio_path, text, identity=None):
+        entry = dict(identity or file_identity(audio_path, self.match), path=audio_path, text=text)
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[audio_path] = entry
+
+    def compact(self, output_file, audio_paths=None):
+        """
+        Write the {path: text} JSON that engtranslate.py consumes, in the
+        order of audio_paths (all journaled paths, sorted, if omitted)
+        """
+        if audio_paths is None:
+            audio_paths = sorted(self.entries)
+        transcriptions = {}
+        for audio_path in audio_paths:
+            text = self.text(audio_path)
+            if text:
+                transcriptions[audio_path] = text
+
+        tmp_file = output_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(transcriptions, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_file, output_file)
+        return transcriptions
+
+
+def journal_path_for(output_file):
+    """Default journal location next to the JSON output"""
+    return os.path.splitext(output_file)[0] + '.journal.jsonl'
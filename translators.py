@@ -0,0 +1,107 @@
+import time
+import random
+import threading
+import metrics
+from recognizers import RateLimiter
+
+RETRIES = metrics.counter('speech_translation_retries', "Translation batches retried after a TranslationError")
+
+
+class TranslationError(Exception):
+    """A translation request failed"""
+
+
+class GoogleBackend:
+    """
+    Google Translate through googletrans. googletrans sends one request per
+    list item, so a batch is joined into one request with a newline between
+    texts and the reply split on newlines; if the reply does not come back
+    with one line per text (or a text has newlines of its own), the batch
+    is sent text by text instead.
+    """
+
+    name = 'google'
+    SEPARATOR = '\n'
+
+    def __init__(self, rate_limit=None):
+        from googletrans import Translator
+        self.translator = Translator()
+        self.limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    def translate(self, texts, src='kn', dest='en'):
+        texts = list(texts)
+        try:
+            if len(texts) > 1 and not any(self.SEPARATOR in text for text in texts):
+                joined = self.translator.translate(self.SEPARATOR.join(texts), src=src, dest=dest).text
+                lines = joined.split(self.SEPARATOR)
+                if len(lines) == len(texts):
+                    return [line.strip() for line in lines]
+            return [self.translator.translate(text, src=src, dest=dest).text for text in texts]
+        except Exception as e:
+            raise TranslationError(str(e)) from e
+
+
+class StubBackend:
+    """
+    Offline stand-in for tests and benchmarks: sleeps for `latency` (+/-
+    jitter) seconds per batch, fails with TranslationError at
+    `failure_rate`, and returns a deterministic "translation" of each text
+    """
+
+    name = 'stub'
+
+    def __init__(self, latency=0.2, jitter=0.0, failure_rate=0.0, rate_limit=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.limiter = RateLimiter(rate_limit) if rate_limit else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+
+    def translate(self, texts, src='kn', dest='en'):
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.failure_rate
+        time.sleep(delay)
+        if fail:
+            raise TranslationError("stub backend failure")
+        return [f"[{src}->{dest}] {text}" for text in texts]
+
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def create_backend(name='google', **params):
+    """Instantiate a translator backend by name, e.g. create_backend('stub', latency=0.1)"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown translator backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**params)
+
+
+def translate_with_retry(backend, texts, src='kn', dest='en', retries=3, base_delay=1.0, max_delay=30.0):
+    """
+    Translate one batch under the backend's rate limiter, retrying
+    TranslationError with exponential backoff and full jitter
+    """
+    for attempt in range(retries + 1):
+        if backend.limiter:
+            backend.limiter.acquire()
+        try:
+            translations = backend.translate(texts, src=src, dest=dest)
+            if len(translations) != len(texts):
+                raise TranslationError(f"Expected {len(texts)} translations, got {len(translations)}")
+            return translations
+        except TranslationError as e:
+            if attempt == retries:
+                raise
+            RETRIES.inc()
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"Translation request failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
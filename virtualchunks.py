@@ -0,0 +1,191 @@
+"""
+Virtual chunks: (source, sample offset, length) references into one decoded
+copy of each recording, recorded in a manifest instead of exported files.
+"""
+import os
+import json
+import wave
+import argparse
+import threading
+from pathlib import Path
+import numpy as np
+import waveform
+import wavcache
+
+# {"format", "rate", "sources": {path: {"pcm", "sha256", "frames", "dataOffset", "chunkMs"}},
+#  "chunks": {chunk key, as split_audio would name the file: [source path, sample offset, length]}}
+DEFAULT_MANIFEST_FILE = 'chunk_manifest.json'
+FORMAT_VERSION = 1
+
+
+def chunk_key(relative_dir, stem, number):
+    """Key of a source's chunk `number` (from 1), as split_audio names the file"""
+    return os.path.normpath(os.path.join(relative_dir, f"{stem}_chunk_{number}.wav"))
+
+
+def pcm_layout(pcm_path):
+    """(frames, byte offset of the sample data) of a target-format WAV"""
+    with open(pcm_path, 'rb') as file:
+        with wave.open(file, 'rb') as wav:
+            frames = wav.getnframes()
+            # wave stops reading right after the data chunk header
+            data_offset = file.tell()
+    return frames, data_offset
+
+
+# Function to plan the virtual chunks of one recording
+def plan_source(file_path, chunk_duration_ms, relative_dir='.', cache_dir=wavcache.DEFAULT_CACHE_DIR, peaks_dir=None):
+    """
+    Decode file_path into the conversion cache (a cache hit if it was
+    decoded before) and cut it on the same millisecond grid as
+    make_chunks. Returns {"source", "entry", "chunks", "seconds"} for
+    ChunkManifest.add; runs in worker processes, so it touches no
+    manifest. With peaks_dir, each chunk's waveform peaks are written as
+    the split modes do.
+    """
+    pcm_path, _ = wavcache.convert(file_path, cache_dir)
+    frames, data_offset = pcm_layout(pcm_path)
+    rate = wavcache.TARGET_RATE
+    stem = Path(file_path).stem
+
+    chunks = {}
+    samples = None
+    if peaks_dir:
+        samples = np.memmap(pcm_path, dtype='<i2', mode='r', offset=data_offset, shape=(frames,))
+    number = 0
+    while True:
+        start = number * chunk_duration_ms * rate // 1000
+        end = min((number + 1) * chunk_duration_ms * rate // 1000, frames)
+        if start >= frames:
+            break
+        number += 1
+        key = chunk_key(relative_dir, stem, number)
+        chunks[key] = [file_path, int(start), int(end - start)]
+        if samples is not None:
+            waveform.save_peaks(samples[start:end], rate,
+                                os.path.join(peaks_dir, Path(key).stem + waveform.PEAKS_SUFFIX))
+
+    entry = {"pcm": pcm_path, "sha256": wavcache.source_hash(file_path), "frames": frames,
+             "dataOffset": data_offset, "chunkMs": chunk_duration_ms}
+    return {"source": file_path, "entry": entry, "chunks": chunks, "seconds": frames / rate}
+
+
+class ChunkManifest:
+    """
+    The manifest of virtual chunks, with memory-mapped reads of their
+    samples. Safe to share between threads; call save() to persist.
+    """
+
+    def __init__(self, manifest_file=DEFAULT_MANIFEST_FILE):
+        self.manifest_file = manifest_file
+        self.rate = wavcache.TARGET_RATE
+        self.sources = {}
+        self.chunks = {}
+        self._maps = {}
+        self._lock = threading.Lock()
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get("format") == FORMAT_VERSION:
+                self.rate = data["rate"]
+                self.sources = data["sources"]
+                self.chunks = data["chunks"]
+        # Sources are named by content hash outside the manifest, so URLs never carry their paths
+        self._source_ids = {entry["sha256"]: source for source, entry in self.sources.items()}
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __contains__(self, key):
+        return os.path.normpath(key) in self.chunks
+
+    def save(self):
+        """Write the manifest atomically"""
+        with self._lock:
+            data = {"format": FORMAT_VERSION, "rate": self.rate, "sources": self.sources, "chunks": self.chunks}
+            tmp_file = self.manifest_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as file:
+                json.dump(data, file, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_file, self.manifest_file)
+
+    def add(self, plan):
+        """Record a plan_source result, replacing the source's earlier chunks"""
+        with self._lock:
+            source = plan["source"]
+            if source in self.sources:
+                for key in [key for key, ref in self.chunks.items() if ref[0] == source]:
+                    del self.chunks[key]
+            self.sources[source] = plan["entry"]
+            self._source_ids[plan["entry"]["sha256"]] = source
+            self.chunks.update(plan["chunks"])
+        return list(plan["chunks"])
+
+    def get(self, key):
+        """
+        {"source", "sourceId", "pcm", "offset", "length", "start", "end"} of
+        a chunk (seconds for start/end), or None
+        """
+        ref = self.chunks.get(os.path.normpath(key))
+        if ref is None:
+            return None
+        source, offset, length = ref
+        entry = self.sources[source]
+        return {"source": source, "sourceId": entry["sha256"], "pcm": entry["pcm"], "offset": offset,
+                "length": length, "start": offset / self.rate, "end": (offset + length) / self.rate}
+
+    def source_entry(self, source_id):
+        """Manifest entry of the source with that id (its content hash), or None"""
+        source = self._source_ids.get(source_id)
+        return self.sources.get(source) if source is not None else None
+
+    def identity(self, key):
+        """What a transcription journal matches a virtual chunk on, in place of its file's stat or hash"""
+        source, offset, length = self.chunks[os.path.normpath(key)]
+        return {"size": length * wavcache.TARGET_SAMPLE_WIDTH,
+                "sha256": f"{self.sources[source]['sha256']}:{offset}:{length}"}
+
+    def _map(self, source):
+        samples = self._maps.get(source)
+        if samples is None:
+            entry = self.sources[source]
+            samples = np.memmap(entry["pcm"], dtype='<i2', mode='r', offset=entry["dataOffset"],
+                                shape=(entry["frames"],))
+            with self._lock:
+                self._maps[source] = samples
+        return samples
+
+    def samples(self, key):
+        """int16 mono samples of a chunk (a view of the memory-mapped PCM copy)"""
+        source, offset, length = self.chunks[os.path.normpath(key)]
+        return self._map(source)[offset:offset + length]
+
+
+def build_manifest(input_folder, chunk_duration_ms, manifest_file=DEFAULT_MANIFEST_FILE,
+                   cache_dir=wavcache.DEFAULT_CACHE_DIR, peaks_base_dir=None):
+    """Plan every supported file under input_folder into the manifest (see audiochunk.process_audio_folder)"""
+    import audiochunk
+    return audiochunk.process_audio_folder(input_folder, chunk_duration_ms, None, virtual=True,
+                                           manifest_file=manifest_file, wav_cache_dir=cache_dir,
+                                           peaks_base_dir=peaks_base_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['build', 'show'])
+    parser.add_argument('target', help="Folder of recordings (build) or a chunk key (show)")
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST_FILE)
+    parser.add_argument('--chunk-ms', type=int, default=30000)
+    parser.add_argument('--cache-dir', default=wavcache.DEFAULT_CACHE_DIR)
+    parser.add_argument('--peaks', default=waveform.PEAKS_FOLDER, help="Folder for waveform peaks ('' to skip)")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_manifest(args.target, args.chunk_ms, args.manifest, args.cache_dir, args.peaks or None)
+    else:
+        chunk = ChunkManifest(args.manifest).get(args.target)
+        if chunk is None:
+            raise SystemExit(f"No virtual chunk {args.target} in {args.manifest}")
+        print(json.dumps(chunk, indent=4))
+
+if __name__ == "__main__":
+    main()
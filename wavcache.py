@@ -0,0 +1,205 @@
+"""
+Content-addressed cache of recordings converted to 16 kHz mono 16-bit WAV,
+keyed by the SHA-256 of the source and the target format.
+"""
+import os
+import wave
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pydub import AudioSegment
+from pydub.utils import mediainfo
+from transcriptjournal import file_identity
+
+# Anchored to the project folder rather than the working directory, and
+# kept out of the data folders, which are walked for audio files; set
+# WAV_CACHE_DIR to put it elsewhere
+DEFAULT_CACHE_DIR = os.environ.get('WAV_CACHE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wav_cache')
+TARGET_RATE = 16000
+TARGET_CHANNELS = 1
+TARGET_SAMPLE_WIDTH = 2
+# Part of every cache key, so changing the target never reuses old outputs
+TARGET_FORMAT = f"{TARGET_RATE}hz-mono-s16"
+WAV_HEADER_BYTES = 44
+
+# Source hashes of this process, keyed by (path, size, mtime): a file is
+# read to hash it at most once per run unless it changes
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+def source_hash(path):
+    """SHA-256 of the file contents"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    sha = _hashes.get(key)
+    if sha is None:
+        sha = file_identity(path, 'hash')["sha256"]
+        with _hashes_lock:
+            _hashes[key] = sha
+    return sha
+
+
+def cache_path(sha, cache_dir=DEFAULT_CACHE_DIR):
+    return os.path.join(cache_dir, sha[:2], f"{sha}-{TARGET_FORMAT}.wav")
+
+
+def read_flac_duration(path):
+    """Duration from the FLAC STREAMINFO block, or None if it is not FLAC"""
+    with open(path, 'rb') as file:
+        header = file.read(4 + 4 + 18)
+    if len(header) < 26 or header[:4] != b'fLaC' or header[4] & 0x7F != 0:
+        return None
+    info = int.from_bytes(header[18:26], 'big')
+    rate = info >> 44
+    total_samples = info & ((1 << 36) - 1)
+    return total_samples / rate if rate and total_samples else None
+
+
+def probe_duration(path):
+    """Length in seconds from the file headers, without decoding the audio"""
+    if path.lower().endswith('.wav'):
+        try:
+            with wave.open(path, 'rb') as wav:
+                return wav.getnframes() / float(wav.getframerate())
+        except (wave.Error, EOFError):
+            pass  # Not PCM WAV (e.g. WAVE_FORMAT_EXTENSIBLE); ask ffprobe
+    duration = read_flac_duration(path)
+    if duration is not None:
+        return duration
+    # ffprobe only reads the headers
+    info = mediainfo(path)
+    if 'duration' not in info:
+        raise ValueError(f"Could not read the duration of {path}")
+    return float(info['duration'])
+
+
+def is_target_wav(path):
+    """True if path is a complete WAV already in the target format"""
+    try:
+        with wave.open(path, 'rb') as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != \
+                    (TARGET_RATE, TARGET_CHANNELS, TARGET_SAMPLE_WIDTH):
+                return False
+            data_bytes = wav.getnframes() * TARGET_CHANNELS * TARGET_SAMPLE_WIDTH
+    except (wave.Error, EOFError, OSError):
+        return False
+    # A truncated file still has the header of the complete one
+    return os.path.getsize(path) >= WAV_HEADER_BYTES + data_bytes
+
+
+def _write_target_wav(input_path, tmp_path):
+    if input_path.lower().endswith('.wav'):
+        try:
+            audio = AudioSegment.from_wav(input_path)
+        except Exception:
+            audio = None  # Not PCM WAV; let ffmpeg decode it
+        if audio is not None:
+            audio = audio.set_channels(TARGET_CHANNELS).set_frame_rate(TARGET_RATE).set_sample_width(TARGET_SAMPLE_WIDTH)
+            audio.export(tmp_path, format='wav')
+            return
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', input_path, '-f', 'wav',
+         '-acodec', 'pcm_s16le', '-ac', str(TARGET_CHANNELS), '-ar', str(TARGET_RATE), tmp_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not convert {input_path}: {result.stderr.decode(errors='replace').strip()}")
+
+
+# Function to get the recognizer WAV of a recording, converting it only on a cache miss
+def convert(input_path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Returns (path of the target-format WAV, status), status being 'source'
+    (the input is already in the target format), 'hit' or 'converted'
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+    if input_path.lower().endswith('.wav') and is_target_wav(input_path):
+        return input_path, 'source'
+    output_path = cache_path(source_hash(input_path), cache_dir)
+    if is_target_wav(output_path):
+        return output_path, 'hit'
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # A unique temp name, so concurrent conversions of the same content never share a file
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(output_path))
+    os.close(fd)
+    try:
+        _write_target_wav(input_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path, 'converted'
+
+
+def _convert_task(task):
+    input_path, cache_dir = task
+    started = time.perf_counter()
+    output_path, status = convert(input_path, cache_dir)
+    return {"file": input_path, "output": output_path, "status": status,
+            "seconds": probe_duration(output_path), "elapsed": time.perf_counter() - started}
+
+
+# Function to convert many recordings, spread over a process pool
+def convert_many(paths, cache_dir=DEFAULT_CACHE_DIR, workers=1):
+    """
+    Convert every path (cache hits are only hashed and checked). Returns
+    {input path: result dict with "output", "status", "seconds"}, with
+    "output" None and an "error" for files that failed.
+    """
+    tasks = [(path, cache_dir) for path in paths]
+    results = {}
+
+    def failed(path, error):
+        print(f"Error converting {path}: {error}")
+        results[path] = {"file": path, "output": None, "status": 'error', "error": str(error)}
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_convert_task, task): task[0] for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    failed(futures[future], e)
+    else:
+        for task in tasks:
+            try:
+                results[task[0]] = _convert_task(task)
+            except Exception as e:
+                failed(task[0], e)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="Audio file or folder")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--clear', action='store_true', help="Delete the cache before converting")
+    args = parser.parse_args()
+
+    if args.clear and os.path.isdir(args.cache_dir):
+        shutil.rmtree(args.cache_dir)
+    if os.path.isdir(args.input):
+        paths = [os.path.join(root, file) for root, _, files in sorted(os.walk(args.input)) for file in sorted(files)]
+    else:
+        paths = [args.input]
+
+    started = time.perf_counter()
+    results = convert_many(paths, args.cache_dir, args.workers)
+    elapsed = time.perf_counter() - started
+    counts = {}
+    for result in results.values():
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    audio_seconds = sum(result.get("seconds", 0.0) for result in results.values())
+    print(f"{len(results)} files ({audio_seconds:.0f}s of audio) in {elapsed:.2f}s: "
+          + ', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+if __name__ == "__main__":
+    main()
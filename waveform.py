@@ -0,0 +1,166 @@
+"""
+Waveform peaks (int8 min/max pairs small enough to return inline with
+search results) and optional low-bitrate previews for audio chunks.
+"""
+import os
+import wave
+import base64
+import struct
+import argparse
+import subprocess
+import numpy as np
+import segmentation
+
+PEAKS_FOLDER = 'waveform_peaks'
+PREVIEW_FOLDER = 'chunk_previews'
+PEAKS_PER_SECOND = 50
+PEAKS_SUFFIX = '.peaks'
+PREVIEW_FORMAT = 'mp3'
+PREVIEW_BITRATE = '32k'
+
+# Peaks file: header '<4sBxxxIII' (magic, version, sample rate, samples per
+# peak, number of peaks), then int8 min, max, min, max, ... (full scale 127).
+# Files mirror the chunk folder layout under PEAKS_FOLDER / PREVIEW_FOLDER.
+MAGIC = b'PEAK'
+VERSION = 1
+_HEADER = struct.Struct('<4sBxxxIII')
+
+
+def compute_peaks(samples, sample_rate, peaks_per_second=PEAKS_PER_SECOND):
+    """
+    (n, 2) int8 array of per-window [min, max] of a (frames,) or
+    (frames, channels) PCM array, scaled so full scale is 127, and the
+    window length in samples
+    """
+    mono = segmentation.to_mono(samples)
+    samples_per_peak = max(1, sample_rate // peaks_per_second)
+    if len(mono) == 0:
+        return np.zeros((0, 2), dtype=np.int8), samples_per_peak
+    starts = np.arange(0, len(mono), samples_per_peak)
+    pairs = np.stack([np.minimum.reduceat(mono, starts), np.maximum.reduceat(mono, starts)], axis=1)
+    scaled = pairs.astype(np.float32) * (127 / segmentation.max_amplitude(mono))
+    # Round away from zero so quiet but non-silent windows stay visible
+    scaled = np.sign(scaled) * np.ceil(np.abs(scaled))
+    return np.clip(scaled, -127, 127).astype(np.int8), samples_per_peak
+
+
+def encode_peaks(peaks, sample_rate, samples_per_peak):
+    return _HEADER.pack(MAGIC, VERSION, sample_rate, samples_per_peak, len(peaks)) + peaks.tobytes()
+
+
+def decode_peaks(data):
+    """(peaks (n, 2) int8, sample rate, samples per peak) from encode_peaks output"""
+    magic, version, sample_rate, samples_per_peak, count = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a peaks file")
+    peaks = np.frombuffer(data, dtype=np.int8, count=count * 2, offset=_HEADER.size).reshape(count, 2)
+    return peaks, sample_rate, samples_per_peak
+
+
+def pcm_to_array(data, sample_width, channels, signed_8bit=False):
+    """
+    (frames, channels) signed array of raw PCM bytes. 8-bit WAV data is
+    unsigned; pydub's raw_data is already signed, so pass signed_8bit for
+    it. 24-bit samples are widened to int32 (full scale kept).
+    """
+    if sample_width == 3:
+        # Put each 3-byte sample in the top of an int32, which keeps its sign
+        padded = np.zeros((len(data) // 3, 4), dtype=np.uint8)
+        padded[:, 1:] = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        samples = padded.view('<i4').ravel()
+    elif sample_width not in segmentation._DTYPES:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    elif sample_width == 1 and not signed_8bit:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 128).astype(np.int8)
+    else:
+        samples = np.frombuffer(data, dtype=segmentation._DTYPES[sample_width])
+    return samples.reshape(-1, channels)
+
+
+def read_wav(path):
+    """(frames, channels) PCM array and sample rate of a WAV file"""
+    with wave.open(path, 'rb') as wav:
+        data = wav.readframes(wav.getnframes())
+        return pcm_to_array(data, wav.getsampwidth(), wav.getnchannels()), wav.getframerate()
+
+
+def derived_path(chunk_path, chunk_folder, folder, suffix):
+    """Path under folder mirroring chunk_path's place under chunk_folder"""
+    relative = os.path.relpath(chunk_path, chunk_folder)
+    return os.path.join(folder, os.path.splitext(relative)[0] + suffix)
+
+
+def save_peaks(samples, sample_rate, peaks_path, peaks_per_second=PEAKS_PER_SECOND):
+    """Compute the peaks of PCM already in memory and write them to peaks_path"""
+    peaks, samples_per_peak = compute_peaks(samples, sample_rate, peaks_per_second)
+    os.makedirs(os.path.dirname(peaks_path) or '.', exist_ok=True)
+    with open(peaks_path, 'wb') as f:
+        f.write(encode_peaks(peaks, sample_rate, samples_per_peak))
+    return peaks_path
+
+
+def encode_preview(chunk_path, preview_path, bitrate=PREVIEW_BITRATE):
+    """Mono low-bitrate re-encode of a chunk through ffmpeg (format from preview_path's extension)"""
+    os.makedirs(os.path.dirname(preview_path) or '.', exist_ok=True)
+    subprocess.run(['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', chunk_path,
+                    '-ac', '1', '-b:a', bitrate, preview_path],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return preview_path
+
+
+# Function to produce the peaks (and optionally the preview) of a chunk file
+def process_chunk(chunk_path, chunk_folder, peaks_folder=PEAKS_FOLDER, preview_folder=None):
+    try:
+        samples, rate = read_wav(chunk_path)
+        save_peaks(samples, rate, derived_path(chunk_path, chunk_folder, peaks_folder, PEAKS_SUFFIX))
+        if preview_folder:
+            encode_preview(chunk_path, derived_path(chunk_path, chunk_folder, preview_folder, '.' + PREVIEW_FORMAT))
+        return True
+    except Exception as e:
+        print(f"Error making waveform data for {chunk_path}: {e}")
+        return False
+
+
+def load_inline_peaks(peaks_path):
+    """Peaks file as the JSON-friendly dict returned with search results, or None"""
+    if not os.path.exists(peaks_path):
+        return None
+    with open(peaks_path, 'rb') as f:
+        data = f.read()
+    peaks, sample_rate, samples_per_peak = decode_peaks(data)
+    return {
+        "peaks": base64.b64encode(peaks.tobytes()).decode('ascii'),
+        "peaksPerSecond": sample_rate / samples_per_peak,
+        "duration": len(peaks) * samples_per_peak / sample_rate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', default='audio_chunks_database', help="Chunk folder")
+    parser.add_argument('--peaks', default=PEAKS_FOLDER, help="Folder the peaks files are written to")
+    parser.add_argument('--previews', action='store_true', help="Also write low-bitrate previews (needs ffmpeg)")
+    parser.add_argument('--preview-folder', default=PREVIEW_FOLDER)
+    parser.add_argument('--force', action='store_true', help="Redo chunks whose peaks are up to date")
+    args = parser.parse_args()
+
+    done = skipped = failed = 0
+    for root, dirs, files in os.walk(args.chunks):
+        dirs.sort()
+        for file in sorted(files):
+            if not file.lower().endswith('.wav'):
+                continue
+            chunk_path = os.path.join(root, file)
+            peaks_path = derived_path(chunk_path, args.chunks, args.peaks, PEAKS_SUFFIX)
+            if not args.force and os.path.exists(peaks_path) \
+                    and os.path.getmtime(peaks_path) >= os.path.getmtime(chunk_path):
+                skipped += 1
+                continue
+            if process_chunk(chunk_path, args.chunks, args.peaks, args.preview_folder if args.previews else None):
+                done += 1
+            else:
+                failed += 1
+    print(f"Waveform data written for {done} chunks ({skipped} up to date, {failed} failed)")
+
+if __name__ == "__main__":
+    main()